@@ -0,0 +1,168 @@
+# acciones_masivas.py
+# Acciones administrativas sobre muchas solicitudes o tickets a la vez
+# (desde el dashboard, la lista de tickets o la CLI).
+#
+# Nada de cargar objetos del ORM uno por uno: cada lote de TAMANO_LOTE filas
+# es un SELECT de ids (paginado por clave, bloqueando solo ese lote), un
+# UPDATE ... WHERE id IN (...) y un INSERT multi-fila en la bitácora. Cada
+# lote se confirma por separado para no mantener transacciones largas. Los
+# UPDATE incrementan 'version', así los formularios abiertos detectan el
+# cambio (concurrencia optimista), y los contadores, la carga de los agentes
+# y el SLA se actualizan igual que en las acciones individuales.
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, exists
+
+from asignacion import ajustar_cargas, ESTADOS_CON_CARGA
+from eventos import registrar_transiciones, ENTIDAD_SOLICITUD, ENTIDAD_TICKET
+from filtros import consulta_solicitudes
+from models import db, SolicitudAyuda, TicketSoporte, Respuesta, Usuario, EstadoSolicitud, EstadoTicket, RolUsuario
+from sla import registrar_cierres
+
+TAMANO_LOTE = 500
+
+# Acción -> roles que pueden ejecutarla (las mismas reglas que las rutas individuales)
+PERMISOS = {
+    'estado_solicitudes': {RolUsuario.ADMIN},
+    'cerrar_tickets': {RolUsuario.ADMIN, RolUsuario.SOPORTE},
+    'reasignar_tickets': {RolUsuario.ADMIN},
+}
+
+# Estados a los que se puede mover una solicitud en bloque
+ESTADOS_MASIVOS_SOLICITUD = (EstadoSolicitud.EN_PROCESO, EstadoSolicitud.RESUELTO)
+
+
+class AccionNoPermitida(Exception):
+    """El usuario no tiene el rol requerido para la acción masiva."""
+
+
+def verificar_permiso(usuario, accion):
+    if usuario is None or usuario.rol not in PERMISOS[accion]:
+        raise AccionNoPermitida(f"No tienes permisos para '{accion}'.")
+
+
+def _por_lotes(consulta, columna_id, tamano_lote):
+    """
+    Recorre 'consulta' por lotes de ids crecientes (paginación por clave, sin
+    OFFSET) bloqueando solo las filas del lote. Cada lote se entrega dentro de
+    su transacción; quien llama hace el UPDATE y este generador el commit.
+    """
+    ultimo = 0
+    while True:
+        filas = db.session.execute(
+            consulta.where(columna_id > ultimo)
+            .order_by(columna_id)
+            .limit(tamano_lote)
+            .with_for_update(of=columna_id.table)
+        ).all()
+        if not filas:
+            return
+        ultimo = filas[-1][0]
+        yield filas
+        db.session.commit()
+
+
+def cambiar_estado_solicitudes(usuario, nuevo_estado, filtros=None, ids=None, tamano_lote=TAMANO_LOTE):
+    """
+    Pasa a 'nuevo_estado' las solicitudes indicadas por 'ids' o que cumplen
+    los 'filtros' del dashboard (filtros.py). Devuelve cuántas cambiaron.
+    """
+    verificar_permiso(usuario, 'estado_solicitudes')
+    if nuevo_estado not in ESTADOS_MASIVOS_SOLICITUD:
+        raise ValueError(f"Estado no permitido en acciones masivas: {nuevo_estado}")
+
+    columnas = (SolicitudAyuda.id_solicitud, SolicitudAyuda.id_usuario, SolicitudAyuda.estado)
+    if filtros is not None:
+        # Mismo WHERE/JOIN que el dashboard, sin su ORDER BY ni sus columnas
+        consulta = consulta_solicitudes(filtros).with_only_columns(*columnas, maintain_column_froms=True).order_by(None)
+    else:
+        consulta = select(*columnas)
+    if ids is not None:
+        consulta = consulta.where(SolicitudAyuda.id_solicitud.in_(ids))
+    consulta = consulta.where(SolicitudAyuda.estado != nuevo_estado)
+
+    total = 0
+    for filas in _por_lotes(consulta, SolicitudAyuda.id_solicitud, tamano_lote):
+        db.session.execute(
+            update(SolicitudAyuda)
+            .where(SolicitudAyuda.id_solicitud.in_([fila[0] for fila in filas]))
+            .values(estado=nuevo_estado, version=SolicitudAyuda.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        registrar_transiciones(ENTIDAD_SOLICITUD, filas, nuevo_estado, usuario)
+        total += len(filas)
+    return total
+
+
+def condicion_tickets_inactivos(dias, ahora=None):
+    """Tickets sin cerrar creados hace más de 'dias' y sin respuestas en ese lapso."""
+    corte = (ahora or datetime.utcnow()) - timedelta(days=dias)
+    return (
+        TicketSoporte.fecha_creacion < corte,
+        ~exists().where(Respuesta.id_ticket == TicketSoporte.id_ticket, Respuesta.fecha >= corte),
+    )
+
+
+def cerrar_tickets(usuario, ids=None, condiciones=(), tamano_lote=TAMANO_LOTE):
+    """Cierra los tickets indicados (ids y/o condiciones extra). Devuelve cuántos se cerraron."""
+    verificar_permiso(usuario, 'cerrar_tickets')
+    consulta = select(
+        TicketSoporte.id_ticket, TicketSoporte.id_usuario, TicketSoporte.estado,
+        TicketSoporte.id_asignado_a, TicketSoporte.fecha_creacion,
+    ).where(TicketSoporte.estado != EstadoTicket.CERRADO, *condiciones)
+    if ids is not None:
+        consulta = consulta.where(TicketSoporte.id_ticket.in_(ids))
+
+    total = 0
+    for filas in _por_lotes(consulta, TicketSoporte.id_ticket, tamano_lote):
+        fecha = datetime.utcnow()
+        db.session.execute(
+            update(TicketSoporte)
+            .where(TicketSoporte.id_ticket.in_([fila[0] for fila in filas]))
+            .values(estado=EstadoTicket.CERRADO, fecha_cierre=fecha, id_cerrado_por=usuario.id_usuario,
+                    version=TicketSoporte.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        registrar_transiciones(ENTIDAD_TICKET, filas, EstadoTicket.CERRADO, usuario)
+        registrar_cierres([fila[4] for fila in filas], usuario, fecha)
+        total += len(filas)
+    return total
+
+
+def reasignar_tickets(usuario, id_destino, ids=None, id_origen=None, tamano_lote=TAMANO_LOTE):
+    """
+    Asigna a 'id_destino' (None = pool compartido) los tickets abiertos o en
+    proceso indicados por 'ids' y/o que hoy tiene 'id_origen'. Devuelve cuántos se movieron.
+    """
+    verificar_permiso(usuario, 'reasignar_tickets')
+    if id_destino is not None:
+        destino = db.session.get(Usuario, id_destino)
+        if destino is None or destino.rol != RolUsuario.SOPORTE:
+            raise ValueError("El destino debe ser un agente de SOPORTE.")
+
+    consulta = select(TicketSoporte.id_ticket, TicketSoporte.id_asignado_a).where(
+        TicketSoporte.estado.in_(ESTADOS_CON_CARGA))
+    if id_destino is not None:
+        consulta = consulta.where((TicketSoporte.id_asignado_a != id_destino) | TicketSoporte.id_asignado_a.is_(None))
+    else:
+        consulta = consulta.where(TicketSoporte.id_asignado_a.isnot(None))
+    if ids is not None:
+        consulta = consulta.where(TicketSoporte.id_ticket.in_(ids))
+    if id_origen is not None:
+        consulta = consulta.where(TicketSoporte.id_asignado_a == id_origen)
+
+    total = 0
+    for filas in _por_lotes(consulta, TicketSoporte.id_ticket, tamano_lote):
+        db.session.execute(
+            update(TicketSoporte)
+            .where(TicketSoporte.id_ticket.in_([fila[0] for fila in filas]))
+            .values(id_asignado_a=id_destino, version=TicketSoporte.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        deltas = {id_destino: len(filas)}
+        for _, anterior in filas:
+            deltas[anterior] = deltas.get(anterior, 0) - 1
+        ajustar_cargas(deltas)
+        total += len(filas)
+    return total
@@ -0,0 +1,168 @@
+# adjuntos.py
+# Fotos adjuntas a solicitudes y tickets.
+#
+# - Las subidas se copian a disco por bloques (nunca se cargan completas en
+#   memoria) mientras se calcula su SHA-256.
+# - El almacenamiento es por contenido: <UPLOAD_FOLDER>/ab/cd/<sha256>. Si dos
+#   personas suben la misma foto, el archivo se guarda una sola vez.
+# - Las versiones reducidas (miniatura y "reducida" para móviles) se generan en
+#   un pool de PROCESOS, fuera del request. Mientras no existan se sirve el
+#   original.
+# - Pillow es opcional: sin Pillow no se generan versiones reducidas.
+
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow no instalado: se sirven solo los originales
+    Image = None
+
+log = logging.getLogger(__name__)
+
+TAMANO_BLOQUE = 64 * 1024
+
+# Variante -> lado máximo en píxeles
+VARIANTES = {
+    'miniatura': 320,
+    'reducida': 1600,
+}
+
+# Firmas (magic bytes) de los formatos aceptados -> tipo MIME
+FIRMAS_IMAGEN = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+_pool = None
+
+
+class AdjuntoInvalido(ValueError):
+    """El archivo no es una imagen aceptada o supera el tamaño permitido."""
+
+
+def _tipo_imagen(cabecera):
+    for firma, tipo in FIRMAS_IMAGEN:
+        if cabecera.startswith(firma):
+            return tipo
+    if cabecera[:4] == b'RIFF' and cabecera[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def ruta_original(carpeta, sha256):
+    return os.path.join(carpeta, sha256[:2], sha256[2:4], sha256)
+
+
+def ruta_variante(carpeta, sha256, variante):
+    return os.path.join(carpeta, 'variantes', variante, sha256[:2], f"{sha256}.jpg")
+
+
+def guardar_stream(stream, carpeta, max_bytes):
+    """
+    Copia 'stream' a disco por bloques calculando el SHA-256. Devuelve
+    (sha256, tipo_mime, tamano). Lanza AdjuntoInvalido si no es una imagen o
+    supera 'max_bytes'.
+    """
+    carpeta_tmp = os.path.join(carpeta, 'tmp')
+    os.makedirs(carpeta_tmp, exist_ok=True)
+
+    digest = hashlib.sha256()
+    tamano = 0
+    tipo = None
+    fd, ruta_tmp = tempfile.mkstemp(dir=carpeta_tmp)
+    try:
+        with os.fdopen(fd, 'wb') as destino:
+            while True:
+                bloque = stream.read(TAMANO_BLOQUE)
+                if not bloque:
+                    break
+                if tipo is None:
+                    tipo = _tipo_imagen(bloque)
+                    if tipo is None:
+                        raise AdjuntoInvalido("Solo se aceptan imágenes JPEG, PNG, GIF o WEBP.")
+                tamano += len(bloque)
+                if tamano > max_bytes:
+                    raise AdjuntoInvalido(f"El archivo supera el máximo de {max_bytes // (1024 * 1024)} MB.")
+                digest.update(bloque)
+                destino.write(bloque)
+
+        if tamano == 0:
+            raise AdjuntoInvalido("El archivo está vacío.")
+
+        sha256 = digest.hexdigest()
+        final = ruta_original(carpeta, sha256)
+        if os.path.exists(final):
+            os.remove(ruta_tmp)  # ya teníamos este contenido
+        else:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.replace(ruta_tmp, final)
+        return sha256, tipo, tamano
+    except BaseException:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        raise
+
+
+def generar_variante(origen, destino, lado):
+    """Se ejecuta en el pool de procesos: escribe la versión JPEG reducida."""
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    fd, ruta_tmp = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.jpg')
+    os.close(fd)
+    try:
+        with Image.open(origen) as imagen:
+            imagen.thumbnail((lado, lado))
+            imagen.convert('RGB').save(ruta_tmp, 'JPEG', quality=80, optimize=True)
+        os.replace(ruta_tmp, destino)
+    finally:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+    return destino
+
+
+def _pool_procesos(max_workers):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max_workers)
+    return _pool
+
+
+def _registrar_fallo(sha256, variante):
+    def revisar(futuro):
+        # Nadie espera estos futuros: sin esto el error se perdería en silencio
+        if futuro.cancelled():
+            return
+        error = futuro.exception()
+        if error is not None:
+            log.error("No se pudo generar la variante '%s' de %s", variante, sha256,
+                      exc_info=(type(error), error, error.__traceback__))
+    return revisar
+
+
+def encolar_variantes(carpeta, sha256, max_workers=2):
+    """Pide al pool las versiones reducidas que aún no existen (no bloquea)."""
+    if Image is None:
+        return []
+    origen = ruta_original(carpeta, sha256)
+    futuros = []
+    for variante, lado in VARIANTES.items():
+        destino = ruta_variante(carpeta, sha256, variante)
+        if not os.path.exists(destino):
+            futuro = _pool_procesos(max_workers).submit(generar_variante, origen, destino, lado)
+            futuro.add_done_callback(_registrar_fallo(sha256, variante))
+            futuros.append(futuro)
+    return futuros
+
+
+def archivo_para_servir(carpeta, sha256, variante=None):
+    """Ruta de la variante pedida si ya existe; si no, la del original."""
+    if variante in VARIANTES:
+        ruta = ruta_variante(carpeta, sha256, variante)
+        if os.path.exists(ruta):
+            return ruta, 'image/jpeg'
+    return ruta_original(carpeta, sha256), None
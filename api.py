@@ -0,0 +1,308 @@
+# api.py
+# API JSON compacta (/api/v1/...) para clientes con poco ancho de banda
+# (voluntarios con 2G en zonas rurales). Espeja las vistas de lectura:
+# dashboard, mis_tickets, ver_ticket, ver_solicitud y perfil.
+#
+# - '?campos=id,estado' elige los campos; también achica el SELECT.
+# - ETag fuerte calculado de (id, version) de las filas más los campos
+#   pedidos, sin serializar nada. Con 'If-None-Match' igual se responde 304
+#   sin cuerpo y con el mismo ETag (sufijo de codificación incluido): un
+#   cliente que sondea no descarga nada si no hubo cambios.
+# - Las listas van por páginas con cursor ('?despues=' / '?antes='), como el
+#   dashboard: nunca se lee la tabla entera para armar la respuesta.
+# - El cuerpo va en JSON sin espacios y comprimido con brotli o gzip según
+#   'Accept-Encoding' (brotli es opcional: sin el paquete solo gzip).
+#
+# Los usuarios se devuelven por id (id_usuario, id_asignado_a), no por
+# nombre: así cada representación depende solo de filas con 'version'.
+
+import gzip
+import hashlib
+import json
+from datetime import date, datetime
+from enum import Enum
+from functools import wraps
+
+from flask import jsonify, request
+from flask_login import current_user
+from sqlalchemy import select
+
+from filtros import ORDENES_SOLICITUD, cursor_de
+from listas import FilasPerezosas
+from models import db, SolicitudAyuda, TicketSoporte, Respuesta, Adjunto
+
+try:
+    import brotli
+except ImportError:  # brotli no instalado: solo gzip
+    brotli = None
+
+VERSION_API = 'v1'
+
+# Cuerpos más chicos que esto no se comprimen (la cabecera gzip no compensa)
+MINIMO_COMPRIMIR = 256
+
+# Campo de la API -> columna
+CAMPOS_SOLICITUD = {
+    'id': SolicitudAyuda.id_solicitud,
+    'version': SolicitudAyuda.version,
+    'estado': SolicitudAyuda.estado,
+    'prioridad': SolicitudAyuda.prioridad,
+    'tipo_desastre': SolicitudAyuda.tipo_desastre,
+    'fecha_desastre': SolicitudAyuda.fecha_desastre,
+    'ubicacion': SolicitudAyuda.ubicacion,
+    'personas_afectadas': SolicitudAyuda.personas_afectadas,
+    'descripcion': SolicitudAyuda.descripcion,
+    'fecha_creacion': SolicitudAyuda.fecha_creacion,
+    'id_usuario': SolicitudAyuda.id_usuario,
+}
+
+CAMPOS_TICKET = {
+    'id': TicketSoporte.id_ticket,
+    'version': TicketSoporte.version,
+    'asunto': TicketSoporte.asunto,
+    'estado': TicketSoporte.estado,
+    'descripcion': TicketSoporte.descripcion,
+    'fecha_creacion': TicketSoporte.fecha_creacion,
+    'fecha_cierre': TicketSoporte.fecha_cierre,
+    'id_solicitud': TicketSoporte.id_solicitud,
+    'id_usuario': TicketSoporte.id_usuario,
+    'id_asignado_a': TicketSoporte.id_asignado_a,
+}
+
+# Campos por defecto de las listas (lo que muestran dashboard.html y mis_tickets.html)
+LISTA_SOLICITUDES = ('id', 'version', 'estado', 'prioridad', 'tipo_desastre', 'fecha_desastre',
+                     'ubicacion', 'personas_afectadas', 'fecha_creacion', 'id_usuario')
+LISTA_TICKETS = ('id', 'version', 'asunto', 'estado', 'fecha_creacion', 'id_usuario', 'id_asignado_a')
+
+# En el detalle, además de las columnas, se pueden pedir estas colecciones
+COLECCIONES_SOLICITUD = ('adjuntos',)
+COLECCIONES_TICKET = ('respuestas', 'adjuntos')
+
+
+class CamposInvalidos(Exception):
+    """'?campos=' pide algo que el recurso no tiene."""
+
+
+def api_login_requerido(vista):
+    """Como login_required, pero responde 401 en JSON en vez de redirigir al login."""
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify(error="Se requiere iniciar sesión"), 401
+        return vista(*args, **kwargs)
+    return envoltura
+
+
+def leer_campos(disponibles, por_defecto):
+    """Campos pedidos en '?campos=' (en el orden de 'disponibles'); 'por_defecto' si no viene."""
+    texto = request.args.get('campos')
+    if not texto:
+        return tuple(por_defecto)
+    pedidos = {campo.strip() for campo in texto.split(',') if campo.strip()}
+    desconocidos = pedidos - set(disponibles)
+    if desconocidos:
+        raise CamposInvalidos(f"Campos desconocidos: {', '.join(sorted(desconocidos))}. "
+                              f"Disponibles: {', '.join(disponibles)}")
+    return tuple(campo for campo in disponibles if campo in pedidos)
+
+
+def _valor(valor):
+    if isinstance(valor, Enum):
+        return valor.name
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+def _columnas(mapa, campos):
+    """id y version siempre (para el ETag) + las columnas de los campos pedidos."""
+    nombres = ['id', 'version'] + [campo for campo in campos if campo not in ('id', 'version')]
+    return nombres, [mapa[nombre] for nombre in nombres]
+
+
+def _filas_a_dicts(nombres, filas, campos):
+    return [{campo: _valor(fila[nombres.index(campo)]) for campo in campos} for fila in filas]
+
+
+def calcular_etag(*partes):
+    """ETag fuerte a partir de ids, versiones y campos pedidos."""
+    resumen = hashlib.blake2b(repr((VERSION_API,) + partes).encode('utf-8'), digest_size=16)
+    return f"{VERSION_API}-{resumen.hexdigest()}"
+
+
+def _codificacion():
+    disponibles = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(disponibles)
+
+
+def _coincide(etag):
+    """
+    ETag (con su sufijo de codificación) que el cliente ya tiene de esta
+    representación, según If-None-Match; None si no tiene ninguno.
+    """
+    if_none_match = request.if_none_match
+    for sufijo in ('', '-br', '-gzip'):
+        if if_none_match.contains(f"{etag}{sufijo}"):
+            return f"{etag}{sufijo}"
+    return None
+
+
+def respuesta_json(app, datos, etag):
+    """
+    304 si el cliente ya tiene 'etag'; si no, el JSON compacto y comprimido.
+    El sufijo -gzip/-br del ETag distingue las codificaciones (un ETag
+    fuerte identifica bytes exactos).
+    """
+    guardado = _coincide(etag)
+    if guardado:
+        # El 304 lleva el mismo ETag (con sufijo) que el 200 que el cliente guardó
+        respuesta = app.response_class(status=304)
+        etag = guardado
+    else:
+        cuerpo = json.dumps(datos, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        codificacion = _codificacion() if len(cuerpo) >= MINIMO_COMPRIMIR else None
+        if codificacion == 'br':
+            cuerpo = brotli.compress(cuerpo, quality=5)
+        elif codificacion == 'gzip':
+            cuerpo = gzip.compress(cuerpo, compresslevel=6, mtime=0)  # mismos bytes para el mismo ETag
+        respuesta = app.response_class(cuerpo, mimetype='application/json')
+        if codificacion:
+            respuesta.headers['Content-Encoding'] = codificacion
+            etag = f"{etag}-{codificacion}"
+    respuesta.set_etag(etag)
+    respuesta.headers['Vary'] = 'Accept-Encoding, Cookie'
+    # Privado y siempre revalidado: el navegador guarda la copia, pero la usa solo tras un 304
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+
+# ----------------------------------------------------------------------
+# Representaciones (los permisos los revisan las rutas de app.py)
+# ----------------------------------------------------------------------
+
+def lista_solicitudes(consulta, campos, por_pagina, filtros):
+    """
+    Página del dashboard. 'consulta' es la de filtros.consulta_pagina (con la
+    fila extra). 'siguiente' y 'anterior' son los cursores para '?despues='
+    y '?antes=' (null si no hay más filas en ese sentido).
+    """
+    nombres, columnas = _columnas(CAMPOS_SOLICITUD, campos)
+    orden = ORDENES_SOLICITUD[filtros['orden']]
+    consulta = consulta.with_only_columns(*columnas, orden, maintain_column_froms=True)
+    pagina = FilasPerezosas(db.session.execute(consulta).all(), lambda fila: fila,
+                            limite=por_pagina, invertir=bool(filtros['antes']))
+    filas = list(pagina)
+    hay_anterior = bool(filtros['despues']) or (bool(filtros['antes']) and pagina.hay_siguiente)
+    hay_siguiente = bool(filtros['antes']) or pagina.hay_siguiente
+    anterior = cursor_de(filtros, filas[0][-1], filas[0][0]) if filas and hay_anterior else None
+    siguiente = cursor_de(filtros, filas[-1][-1], filas[-1][0]) if filas and hay_siguiente else None
+    etag = calcular_etag('solicitudes', campos, anterior, siguiente, [tuple(fila[:2]) for fila in filas])
+    datos = {'solicitudes': _filas_a_dicts(nombres, filas, campos), 'anterior': anterior, 'siguiente': siguiente,
+             'hay_siguiente': hay_siguiente}
+    return datos, etag
+
+
+def leer_pagina_tickets(args):
+    """'?despues=<id>' / '?antes=<id>' de la lista de tickets -> (despues, antes); None si no viene o no es válido."""
+    despues = args.get('despues', type=int)
+    antes = args.get('antes', type=int) if despues is None else None
+    return despues, antes
+
+
+def lista_tickets(consulta, campos, por_pagina=None, despues=None, antes=None):
+    """
+    mis_tickets / mi_cola. 'consulta' es un select(TicketSoporte) ya filtrado
+    y ordenado. Con 'por_pagina' (solo para consultas ordenadas por id_ticket
+    descendente, como mis_tickets) va por páginas con cursor, igual que
+    lista_solicitudes: 'despues' / 'antes' son ids de ticket y se lee una
+    fila de más para saber si hay otra página.
+    """
+    nombres, columnas = _columnas(CAMPOS_TICKET, campos)
+    consulta = consulta.with_only_columns(*columnas, maintain_column_froms=True)
+    if por_pagina is None:
+        filas = db.session.execute(consulta).all()
+        etag = calcular_etag('tickets', campos, [tuple(fila[:2]) for fila in filas])
+        return {'tickets': _filas_a_dicts(nombres, filas, campos)}, etag
+
+    if despues is not None:
+        consulta = consulta.where(TicketSoporte.id_ticket < despues)
+    elif antes is not None:
+        # Hacia atrás: se recorre al revés y FilasPerezosas lo vuelve a invertir
+        consulta = consulta.where(TicketSoporte.id_ticket > antes).order_by(None).order_by(TicketSoporte.id_ticket)
+    pagina = FilasPerezosas(db.session.execute(consulta.limit(por_pagina + 1)).all(), lambda fila: fila,
+                            limite=por_pagina, invertir=antes is not None)
+    filas = list(pagina)
+    hay_anterior = despues is not None or (antes is not None and pagina.hay_siguiente)
+    hay_siguiente = antes is not None or pagina.hay_siguiente
+    anterior = str(filas[0][0]) if filas and hay_anterior else None
+    siguiente = str(filas[-1][0]) if filas and hay_siguiente else None
+    etag = calcular_etag('tickets', campos, anterior, siguiente, [tuple(fila[:2]) for fila in filas])
+    datos = {'tickets': _filas_a_dicts(nombres, filas, campos), 'anterior': anterior, 'siguiente': siguiente,
+             'hay_siguiente': hay_siguiente}
+    return datos, etag
+
+
+def _adjuntos(condicion):
+    filas = db.session.execute(
+        select(Adjunto.id_adjunto, Adjunto.tipo_mime, Adjunto.tamano).where(condicion).order_by(Adjunto.id_adjunto)
+    ).all()
+    return [{'id': id_adjunto, 'tipo_mime': tipo, 'tamano': tamano} for id_adjunto, tipo, tamano in filas]
+
+
+def detalle_solicitud(solicitud, campos):
+    """ver_solicitud. Los adjuntos no se editan: cuentan sus ids."""
+    datos = {campo: _valor(getattr(solicitud, CAMPOS_SOLICITUD[campo].key)) for campo in campos
+             if campo in CAMPOS_SOLICITUD}
+    partes = ['solicitud', campos, solicitud.id_solicitud, solicitud.version]
+    if 'adjuntos' in campos:
+        datos['adjuntos'] = _adjuntos(Adjunto.id_solicitud == solicitud.id_solicitud)
+        partes.append([adjunto['id'] for adjunto in datos['adjuntos']])
+    return datos, calcular_etag(*partes)
+
+
+def detalle_ticket(ticket, campos):
+    """ver_ticket. Las respuestas y adjuntos solo se agregan o borran: cuentan sus ids."""
+    datos = {campo: _valor(getattr(ticket, CAMPOS_TICKET[campo].key)) for campo in campos
+             if campo in CAMPOS_TICKET}
+    partes = ['ticket', campos, ticket.id_ticket, ticket.version]
+    if 'respuestas' in campos:
+        filas = db.session.execute(
+            select(Respuesta.id_respuesta, Respuesta.id_usuario, Respuesta.mensaje, Respuesta.fecha)
+            .where(Respuesta.id_ticket == ticket.id_ticket)
+            .order_by(Respuesta.id_respuesta)
+        ).all()
+        datos['respuestas'] = [
+            {'id': id_respuesta, 'id_usuario': id_usuario, 'mensaje': mensaje, 'fecha': _valor(fecha)}
+            for id_respuesta, id_usuario, mensaje, fecha in filas
+        ]
+        partes.append([respuesta['id'] for respuesta in datos['respuestas']])
+    if 'adjuntos' in campos:
+        datos['adjuntos'] = _adjuntos(Adjunto.id_ticket == ticket.id_ticket)
+        partes.append([adjunto['id'] for adjunto in datos['adjuntos']])
+    return datos, calcular_etag(*partes)
+
+
+def perfil_usuario(usuario):
+    """
+    perfil. 'usuarios' no tiene columna version: el ETag sale del contenido,
+    que es una sola fila más sus contadores.
+    """
+    contadores = usuario.contadores
+    datos = {
+        'id': usuario.id_usuario,
+        'cedula': usuario.cedula,
+        'nombre': usuario.nombre,
+        'apellido': usuario.apellido,
+        'email': usuario.email,
+        'telefono': usuario.telefono,
+        'direccion': usuario.direccion,
+        'municipio': usuario.municipio,
+        'rol': usuario.rol.name,
+        'contadores': {
+            'solicitudes_pendientes': contadores.solicitudes_pendientes if contadores else 0,
+            'solicitudes_en_proceso': contadores.solicitudes_en_proceso if contadores else 0,
+            'tickets_abiertos': contadores.tickets_abiertos if contadores else 0,
+            'respuestas_sin_leer': contadores.respuestas_sin_leer if contadores else 0,
+        },
+    }
+    return datos, calcular_etag('perfil', datos)
@@ -1,12 +1,36 @@
 #RenaceHogaresVfinal
-from flask import Flask, render_template, request, redirect, url_for, session, flash, abort
+from flask import Flask, render_template, request, redirect, url_for, session, flash, abort, jsonify, send_file, send_from_directory
+import click
+import os
 from flask_login import login_user, logout_user, login_required, current_user, LoginManager
 from flask_migrate import Migrate
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
 from flask_bcrypt import Bcrypt  #  Importa Flask-Bcrypt aquí
-from models import db, Usuario, SolicitudAyuda, TicketSoporte, Respuesta, EstadoTicket, EstadoSolicitud, RolUsuario
+from models import db, Usuario, SolicitudAyuda, TicketSoporte, Respuesta, EstadoTicket, EstadoSolicitud, RolUsuario, Adjunto
 from datetime import datetime
-from forms import ResponderForm
+from forms import ResponderForm, validar_solicitud, validar_ticket, normalizar_prioridad
+from filtros import leer_filtros, consulta_pagina, cursor_de, ORDENES_SOLICITUD, PRIORIDADES, POR_PAGINA
+from api import (api_login_requerido, leer_campos, respuesta_json, lista_solicitudes, lista_tickets,
+                 leer_pagina_tickets, detalle_solicitud, detalle_ticket, perfil_usuario, CamposInvalidos,
+                 CAMPOS_SOLICITUD, CAMPOS_TICKET, LISTA_SOLICITUDES, LISTA_TICKETS, COLECCIONES_SOLICITUD, COLECCIONES_TICKET)
+from acciones_masivas import (cambiar_estado_solicitudes, cerrar_tickets, reasignar_tickets,
+                             condicion_tickets_inactivos, AccionNoPermitida, ESTADOS_MASIVOS_SOLICITUD)
+from asignacion import asignar_ticket, consulta_cola, rebalancear
+from db_config import uri_base_de_datos, opciones_motor, init_motor
+from contadores import registrar_respuesta, marcar_leido, reparar_contadores
+from perfilado import init_perfilado, listar_perfiles
+from reportes import (leer_parametros, solicitar_reporte, estado_reporte, reportes_recientes,
+                      ruta_artefacto, ParametrosInvalidos, FORMATOS)
+from listas import FilasPerezosas, render_lista, FILAS_POR_LOTE
+from migracion_online import RELLENOS, ejecutar_relleno, progreso_relleno, TAMANO_LOTE, PAUSA_SEGUNDOS
+from sincronizacion import aplicar_lote, delta_desde, leer_cursor, LoteInvalido
+from adjuntos import guardar_stream, encolar_variantes, archivo_para_servir, AdjuntoInvalido, VARIANTES
+from sla import registrar_primera_respuesta, registrar_cierre, registrar_reapertura, reporte_sla, reconstruir_metricas
+from eventos import (cambiar_estado, registrar_creacion, registrar_eliminacion, historial,
+                     reproducir, diferencias_con_tablas, decodificar_estado, ENTIDADES)
 # PRIMERO creas la app
 app = Flask(__name__)
 app.secret_key = "clave_super_secreta"
@@ -14,20 +38,45 @@ app.secret_key = "clave_super_secreta"
 # LUEGO inicializas Bcrypt (después de crear la app)
 bcrypt = Bcrypt(app)
 
-app.config["SQLALCHEMY_DATABASE_URI"] = "mysql+pymysql://root:@localhost/proyecto_ayuda"
+# Driver, pool y calentamiento por variables de entorno (DATABASE_URI, DB_DRIVER, DB_POOL_*), ver db_config.py
+app.config["SQLALCHEMY_DATABASE_URI"] = uri_base_de_datos("mysql+pymysql://root:@localhost/proyecto_ayuda")
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = opciones_motor(app.config["SQLALCHEMY_DATABASE_URI"])
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Fotos adjuntas (ver adjuntos.py)
+app.config["UPLOAD_FOLDER"] = os.environ.get("RENACE_UPLOAD_FOLDER", os.path.join(app.root_path, "uploads"))
+app.config["ADJUNTOS_MAX_BYTES"] = 20 * 1024 * 1024  # por archivo
+app.config["MAX_CONTENT_LENGTH"] = 100 * 1024 * 1024  # por petición
+
+# Reportes municipales: se generan en un pool de procesos y se guardan aquí (ver reportes.py)
+app.config["REPORTES_DIR"] = os.environ.get("RENACE_REPORTES_DIR", os.path.join(app.root_path, "reportes"))
+app.config["REPORTES_WORKERS"] = int(os.environ.get("RENACE_REPORTES_WORKERS", "2"))
+# Segundos sin latido tras los que un reporte en proceso (o en cola) se da por interrumpido
+app.config["REPORTES_SIN_LATIDO"] = int(os.environ.get("RENACE_REPORTES_SIN_LATIDO", "120"))
+app.config["REPORTES_ESPERA_EN_COLA"] = int(os.environ.get("RENACE_REPORTES_ESPERA_EN_COLA", "1800"))
+
 # Inicializar correctamente
 db.init_app(app)
+init_motor(app, db)
 migrate = Migrate(app, db)
+
+# Perfilado bajo demanda (cabecera X-Perfilar de un ADMIN o 1 de cada N), ver perfilado.py
+init_perfilado(app)
 #=============================================================
 #BORRAR CACHE
+# Rutas que fijan su propia caché (archivos inmutables por contenido y la
+# API JSON, que revalida con ETag; ver api.py)
+ENDPOINTS_CON_CACHE = {'servir_adjunto', 'api_solicitudes', 'api_solicitud', 'api_tickets', 'api_mi_cola',
+                       'api_ticket', 'api_perfil'}
+
 @app.after_request
 def add_header(response):
     """
     Agrega cabeceras para evitar que el navegador guarde páginas en caché.
     Esto previene que usuarios puedan volver atrás después de cerrar sesión.
     """
+    if request.endpoint in ENDPOINTS_CON_CACHE:
+        return response
     response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '-1'
@@ -70,6 +119,119 @@ def is_soporte(usuario):
     # CORREGIDO: Ahora verifica tanto ADMIN como SOPORTE
     return usuario.rol in [RolUsuario.ADMIN, RolUsuario.SOPORTE]
 
+def buscar_solicitud_editable(id_solicitud):
+    """Solicitud del usuario actual (o cualquiera si es ADMIN); 404 si no existe."""
+    consulta = SolicitudAyuda.query.filter_by(id_solicitud=id_solicitud)
+    if current_user.rol != RolUsuario.ADMIN:
+        consulta = consulta.filter_by(id_usuario=current_user.id_usuario)
+    return consulta.first_or_404()
+
+# ======================
+# CONCURRENCIA OPTIMISTA (columna 'version' en SolicitudAyuda y TicketSoporte)
+# ======================
+class ConflictoVersion(Exception):
+    """El registro cambió desde que se abrió el formulario."""
+
+
+def verificar_version(obj):
+    """
+    Compare-and-swap: la 'version' enviada por el formulario debe ser la actual.
+    Si otra transacción confirma después de esta verificación, el UPDATE
+    (WHERE version = ...) no afecta filas y SQLAlchemy lanza StaleDataError.
+    Un formulario sin 'version' (o con un valor inválido) cuenta como conflicto:
+    no se puede saber sobre qué versión se hizo el cambio.
+    """
+    enviada = request.form.get('version', type=int)
+    if enviada is None or enviada != obj.version:
+        raise ConflictoVersion()
+
+
+def avisar_conflicto(descripcion):
+    db.session.rollback()
+    flash(f"{descripcion} fue modificado por otra persona mientras lo editabas. "
+          "Revisa los cambios actuales y vuelve a intentarlo.", "warning")
+
+# ======================
+# CONVERSIÓN DE FILAS A DICTS PARA LAS PLANTILLAS
+# (compartidas por las vistas síncronas y las del modo ASGI en asgi.py)
+# ======================
+def solicitud_para_html(sol, nombre=None, apellido=None):
+    """Fila del dashboard; 'nombre'/'apellido' son del creador (vienen del JOIN)."""
+    # Nombre del creador (útil para que ADMIN sepa quién creó la solicitud)
+    nombre_creador = f"{nombre} {apellido}" if nombre else "Usuario desconocido"
+    return {
+        "id": sol.id_solicitud,
+        "tipo_desastre": sol.tipo_desastre,
+        "fecha_desastre": sol.fecha_desastre,
+        "direccion_afectada": sol.ubicacion,
+        "personas_afectadas": sol.personas_afectadas,
+        "prioridad": sol.prioridad,
+        "descripcion_danos": sol.descripcion,
+        "estado": sol.estado.name.capitalize().replace('_', ' '),
+        "fecha_solicitud": getattr(sol, "fecha_creacion", datetime.now()),
+        "creador_nombre": nombre_creador  # Nombre del usuario que creó la solicitud
+    }
+
+
+def fila_dashboard(filtros):
+    """Convierte una fila de consulta_pagina para dashboard.html, con el cursor de paginación."""
+    columna = ORDENES_SOLICITUD[filtros['orden']]
+
+    def convertir(fila):
+        solicitud = solicitud_para_html(*fila)
+        solicitud['cursor'] = cursor_de(filtros, getattr(fila[0], columna.key), fila[0].id_solicitud)
+        return solicitud
+    return convertir
+
+
+def detalle_solicitud_para_html(solicitud):
+    """Datos de ver_solicitud.html."""
+    return {
+        'id': solicitud.id_solicitud,
+        'tipo_desastre': solicitud.tipo_desastre,
+        'fecha_desastre': solicitud.fecha_desastre,
+        'ubicacion': solicitud.ubicacion,
+        'personas_afectadas': solicitud.personas_afectadas,
+        'prioridad': solicitud.prioridad,
+        'descripcion': solicitud.descripcion,
+        'estado': solicitud.estado.name.capitalize().replace('_', ' ')
+    }
+
+
+def ticket_para_html(ticket):
+    """Fila de mis_tickets.html (requiere 'creador_ticket' y 'asignado_a' cargados o cargables)."""
+    # Obtener el nombre del creador
+    nombre_creador = (
+        ticket.creador_ticket.nombre_completo if hasattr(ticket, "creador_ticket") and ticket.creador_ticket
+        else f"ID Usuario: {ticket.id_usuario}"
+    )
+    return {
+        "id_ticket": ticket.id_ticket,
+        "asunto": ticket.asunto,
+        "estado": ticket.estado.name.capitalize().replace("_", " "),
+        "creador_nombre": nombre_creador,
+        "asignado_nombre": ticket.asignado_a.nombre_completo if ticket.asignado_a else None,
+        "fecha_creacion": ticket.fecha_creacion  # Agregar fecha para mostrarla
+    }
+
+def novedades_ticket(ticket, respuestas_nuevas):
+    """Payload JSON de /live/ticket: estado actual y respuestas posteriores al cursor."""
+    return {
+        "id_ticket": ticket.id_ticket,
+        "estado": ticket.estado.name,
+        "respuestas": [
+            {
+                "id": r.id_respuesta,
+                "id_usuario": r.id_usuario,
+                "mensaje": r.mensaje,
+                "fecha": r.fecha.isoformat() if r.fecha else None,
+            }
+            for r in respuestas_nuevas
+        ],
+        # Cursor para la siguiente consulta (?desde=)
+        "ultima": respuestas_nuevas[-1].id_respuesta if respuestas_nuevas else None,
+    }
+
 # =================================================================
 # FUNCIÓN DE CONTEXTO (IMPORTANTE): INYECTA 'current_user' GLOBALMENTE
 # ESTO SOLUCIONA EL ERROR: 'current_user' is undefined
@@ -161,37 +323,30 @@ def login():
 @login_required
 def dashboard():
     # Flask-Login ya sabe quién está autenticado → current_user
-    
-    # Si el usuario es ADMIN, ve todas las solicitudes
-    if current_user.rol == RolUsuario.ADMIN:
-        solicitudes_query = SolicitudAyuda.query.order_by(SolicitudAyuda.id_solicitud.desc()).all()
-    else:
-        # Los usuarios normales ven solo sus propias solicitudes
-        solicitudes_query = SolicitudAyuda.query.filter_by(id_usuario=current_user.id_usuario).order_by(SolicitudAyuda.id_solicitud.desc()).all()
-
-    solicitudes_para_html = []
-    for sol in solicitudes_query:
-        # Obtener el nombre del creador (útil para que ADMIN sepa quién creó la solicitud)
-        creador = Usuario.query.get(sol.id_usuario)
-        nombre_creador = f"{creador.nombre} {creador.apellido}" if creador else "Usuario desconocido"
-        
-        solicitudes_para_html.append({
-            "id": sol.id_solicitud,
-            "tipo_desastre": sol.tipo_desastre,
-            "fecha_desastre": sol.fecha_desastre,
-            "direccion_afectada": sol.ubicacion,
-            "personas_afectadas": sol.personas_afectadas,
-            "prioridad": sol.prioridad,
-            "descripcion_danos": sol.descripcion,
-            "estado": sol.estado.name.capitalize().replace('_', ' '),
-            "fecha_solicitud": getattr(sol, "fecha_creacion", datetime.now()),
-            "creador_nombre": nombre_creador  # Nombre del usuario que creó la solicitud
-        })
-
-    return render_template(
+    # Filtros y orden por query string (?estado=&prioridad=&orden=...), ver filtros.py
+    filtros = leer_filtros(request.args)
+
+    # Si el usuario es ADMIN, ve todas las solicitudes;
+    # los usuarios normales ven solo sus propias solicitudes
+    id_usuario = None if current_user.rol == RolUsuario.ADMIN else current_user.id_usuario
+
+    # Una sola consulta: filtros + ORDER BY de lista blanca + nombre del creador (JOIN).
+    # Se ejecuta y convierte mientras se envía la página (listas.py);
+    # la fila extra solo indica si hay otra página.
+    consulta = consulta_pagina(filtros, id_usuario=id_usuario).execution_options(yield_per=FILAS_POR_LOTE)
+    solicitudes = FilasPerezosas(lambda: db.session.execute(consulta), fila_dashboard(filtros),
+                                 limite=POR_PAGINA, invertir=bool(filtros['antes']))
+
+    return render_lista(
+        app,
         "dashboard.html",
         nombre=current_user.nombre,  # Usamos Flask-Login, no la sesión manual
-        solicitudes=solicitudes_para_html
+        solicitudes=solicitudes,
+        filtros=filtros,
+        estados=list(EstadoSolicitud),
+        estados_masivos=ESTADOS_MASIVOS_SOLICITUD,
+        prioridades=PRIORIDADES,
+        ordenes=list(ORDENES_SOLICITUD)
     )
 # ======================
 #   VER SOLICITUD
@@ -205,22 +360,13 @@ def ver_solicitud(id):
     id_usuario = current_user.id_usuario
 
     # Buscar la solicitud y asegurarse de que pertenezca al usuario logueado
+    # (el ADMIN puede ver cualquiera, igual que en el dashboard)
     # Usamos .first_or_404() para manejar el error de forma elegante
-    solicitud = SolicitudAyuda.query.filter_by(id_solicitud=id, id_usuario=current_user.id_usuario).first_or_404()
+    solicitud = buscar_solicitud_editable(id)
     
     # Crear un objeto amigable para pasar al HTML
-    data_solicitud = {
-        'id': solicitud.id_solicitud,
-        'tipo_desastre': solicitud.tipo_desastre,
-        'fecha_desastre': solicitud.fecha_desastre,
-        'ubicacion': solicitud.ubicacion,
-        'personas_afectadas': solicitud.personas_afectadas,
-        'prioridad': solicitud.prioridad,
-        'descripcion': solicitud.descripcion,
-        'estado': solicitud.estado.name.capitalize().replace('_', ' ')
-    }
-
-    return render_template("ver_solicitud.html", solicitud=data_solicitud)
+    return render_template("ver_solicitud.html", solicitud=detalle_solicitud_para_html(solicitud),
+                           adjuntos=solicitud.adjuntos)
 
 
 # ======================
@@ -235,34 +381,50 @@ def editar_solicitud(id):
     id_usuario = current_user.id_usuario
 
     # 1. Buscar la solicitud y verificar permisos y estado
-    solicitud = SolicitudAyuda.query.filter_by(id_solicitud=id, id_usuario=current_user.id_usuario).first_or_404()
+    solicitud = buscar_solicitud_editable(id)
+    es_admin = current_user.rol == RolUsuario.ADMIN
 
     # CORREGIDO: Comprobar el estado del ENUM EstadoSolicitud.PENDIENTE
-    if solicitud.estado != EstadoSolicitud.PENDIENTE:
+    # (el ADMIN puede editar en cualquier estado para gestionar el proceso)
+    if solicitud.estado != EstadoSolicitud.PENDIENTE and not es_admin:
         flash(f"La solicitud #{id} no se puede editar porque está en estado '{solicitud.estado.name.capitalize().replace('_', ' ')}'. Solo se permiten cambios en estado Pendiente.", "warning")
         return redirect(url_for("ver_solicitud", id=id))
 
     if request.method == "POST":
         # 2. PROCESAR EL FORMULARIO DE EDICIÓN
         try:
-            # Obtener y validar datos
-            solicitud.tipo_desastre = request.form.get("tipo_desastre")
-            fecha_desastre_str = request.form.get("fecha_desastre")
-            solicitud.ubicacion = request.form.get("direccion_afectada") 
-            personas_afectadas_str = request.form.get("personas_afectadas")
-            solicitud.prioridad = request.form.get("prioridad")
-            solicitud.descripcion = request.form.get("descripcion_danos") 
-            
-            # Conversión de datos
-            solicitud.fecha_desastre = datetime.strptime(fecha_desastre_str, '%Y-%m-%d').date()
-            solicitud.personas_afectadas = int(personas_afectadas_str)
+            verificar_version(solicitud)
+
+            # Sin autoflush: los contadores se actualizan con UPDATE en SQL y
+            # escribirían la solicitud a medio editar; así se guarda en un solo
+            # UPDATE ... WHERE version = ... al hacer commit.
+            with db.session.no_autoflush:
+                # Obtener y validar datos
+                solicitud.tipo_desastre = request.form.get("tipo_desastre")
+                fecha_desastre_str = request.form.get("fecha_desastre")
+                solicitud.ubicacion = request.form.get("direccion_afectada")
+                personas_afectadas_str = request.form.get("personas_afectadas")
+                solicitud.prioridad = normalizar_prioridad(request.form.get("prioridad"))
+                solicitud.descripcion = request.form.get("descripcion_danos")
+
+                # Conversión de datos
+                solicitud.fecha_desastre = datetime.strptime(fecha_desastre_str, '%Y-%m-%d').date()
+                solicitud.personas_afectadas = int(personas_afectadas_str)
+
+                # Solo el ADMIN cambia el estado; la transición queda en la bitácora
+                nuevo_estado = request.form.get("estado")
+                if es_admin and nuevo_estado:
+                    cambiar_estado(solicitud, EstadoSolicitud[nuevo_estado], current_user)
 
             # 3. Guardar cambios
             db.session.commit()
             flash(f"Solicitud #{id} actualizada exitosamente ✅", "success")
             return redirect(url_for("ver_solicitud", id=id))
-        
-        except ValueError:
+
+        except (ConflictoVersion, StaleDataError):
+            avisar_conflicto(f"La solicitud #{id}")
+            return redirect(url_for("editar_solicitud", id=id))
+        except (ValueError, KeyError):
             db.session.rollback()
             flash("Error en el formato de la fecha o el número de personas.", "danger")
             return redirect(url_for("editar_solicitud", id=id))
@@ -283,10 +445,12 @@ def editar_solicitud(id):
         'personas_afectadas': solicitud.personas_afectadas,
         'prioridad': solicitud.prioridad,
         'descripcion_danos': solicitud.descripcion,
-        'estado': solicitud.estado.name.capitalize().replace('_', ' ')
+        'estado': solicitud.estado.name.capitalize().replace('_', ' '),
+        'estado_codigo': solicitud.estado.name,
+        'version': solicitud.version
     }
 
-    return render_template("editar_solicitud.html", solicitud=data_solicitud)
+    return render_template("editar_solicitud.html", solicitud=data_solicitud, estados=list(EstadoSolicitud))
 
 #=============
 #Elimina Solicitud
@@ -308,6 +472,7 @@ def eliminar_solicitud(id_solicitud):
     
 
     try:
+        registrar_eliminacion(solicitud, current_user)
         db.session.delete(solicitud)
         db.session.commit()
         flash(f"Solicitud #{id_solicitud} eliminada exitosamente ✅", "success")
@@ -331,49 +496,22 @@ def nueva_solicitud():
     id_usuario = current_user.id_usuario
 
     if request.method == "POST":
-        # 1. Obtener todos los campos del formulario, USANDO LOS NOMBRES EXACTOS DEL HTML
-        tipo_desastre = request.form.get("tipo_desastre")
-        fecha_desastre_str = request.form.get("fecha_desastre") 
-        direccion_afectada = request.form.get("direccion_afectada") 
-        personas_afectadas_str = request.form.get("personas_afectadas")
-        prioridad = request.form.get("prioridad")
-        descripcion_danos = request.form.get("descripcion_danos")
-        
-
-        # 2. Validación de campos obligatorios 
-        if (not tipo_desastre or tipo_desastre.strip() == "") or \
-           (not fecha_desastre_str or fecha_desastre_str.strip() == "") or \
-           (not direccion_afectada or direccion_afectada.strip() == "") or \
-           (not descripcion_danos or descripcion_danos.strip() == ""):
-           
-           flash("Por favor completa los campos obligatorios marcados (*).", "danger")
-           return redirect(url_for("nueva_solicitud")) 
-
-        try:
-            # 3. CONVERSIÓN DE FECHA
-            fecha_desastre_obj = datetime.strptime(fecha_desastre_str, '%Y-%m-%d').date()
-            
-            # 4. CONVERSIÓN DE ENTEROS
-            personas_afectadas = int(personas_afectadas_str) if personas_afectadas_str and personas_afectadas_str.isdigit() else None
-
-        except ValueError:
-            flash("Error en el formato de la fecha o el número de personas. Asegúrate de que las personas afectadas sea un número entero.", "danger")
+        # 1-4. Campos obligatorios y conversiones (reglas compartidas con la API de sync, ver forms.py)
+        campos, error = validar_solicitud(request.form)
+        if error:
+            flash(error, "danger")
             return redirect(url_for("nueva_solicitud"))
 
-        # 5. Insertar en la tabla SolicitudAyuda, mapeando los nombres del formulario
+        # 5. Insertar en la tabla SolicitudAyuda
         nueva_solicitud = SolicitudAyuda(
             id_usuario=id_usuario,
-            descripcion=descripcion_danos, 
-            ubicacion=direccion_afectada, 
-            tipo_desastre=tipo_desastre,
-            fecha_desastre=fecha_desastre_obj, 
-            personas_afectadas=personas_afectadas,
-            prioridad=prioridad,
             # Aseguramos el Estado por defecto
-            estado=EstadoSolicitud.PENDIENTE
+            estado=EstadoSolicitud.PENDIENTE,
+            **campos
         )
 
         db.session.add(nueva_solicitud)
+        registrar_creacion(nueva_solicitud, current_user)
         db.session.commit()
 
         flash("Solicitud de ayuda enviada exitosamente ✅", "success")
@@ -397,65 +535,192 @@ def crear_ticket():
     id_usuario = current_user.id_usuario
 
     if request.method == 'POST':
-        asunto = request.form['asunto']
-        descripcion = request.form['descripcion']
+        # Mismas reglas que los tickets de la API de sync (forms.py)
+        campos, error = validar_ticket(request.form, id_usuario)
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('crear_ticket', id_solicitud=request.form.get('id_solicitud') or None))
 
         # Usamos el constructor asumiendo la estructura de columna del modelo original,
         # pero pasándole el objeto ENUM correcto, que es lo que hace SQLAlchemy.
         # Si tu base de datos espera un ID, el ORM de SQLAlchemy lo manejará.
         nuevo_ticket = TicketSoporte(
             id_usuario=current_user.id_usuario,
-            asunto=asunto,
-            descripcion=descripcion,
-            estado=EstadoTicket.ABIERTO  # Pasamos el objeto ENUM
+            estado=EstadoTicket.ABIERTO,  # Pasamos el objeto ENUM
+            **campos
         )
 
+        # Agente de soporte con menos carga (asignacion.py); si el ticket viene
+        # de una solicitud, se prefieren los especialistas en su tipo de desastre
+        asignar_ticket(nuevo_ticket)
         db.session.add(nuevo_ticket)
+        registrar_creacion(nuevo_ticket, current_user)
         db.session.commit()
 
         flash("Tu ticket de soporte ha sido creado exitosamente.", "success")
         return redirect(url_for('mis_tickets'))
 
-    # Esta ruta debería apuntar a la plantilla crear_ticket.html
-    return render_template('crear_ticket.html')
+    # Solicitudes propias que se pueden relacionar con el ticket (opcional)
+    solicitudes = (
+        SolicitudAyuda.query
+        .filter_by(id_usuario=id_usuario)
+        .order_by(SolicitudAyuda.id_solicitud.desc())
+        .all()
+    )
+    return render_template('crear_ticket.html', solicitudes=solicitudes,
+                           id_solicitud=request.args.get('id_solicitud', type=int))
 
 #======================
 # VER TODOS TICKETS SOPORTE (CORREGIDA)
 #=======================
+def consulta_mis_tickets():
+    """SELECT de la lista de tickets (la comparten la vista HTML y la API)."""
+    consulta = select(TicketSoporte).order_by(TicketSoporte.id_ticket.desc())
+    # Si el usuario es ADMIN o SOPORTE, ve todos los tickets;
+    # los usuarios normales ven solo sus propios tickets
+    if current_user.rol not in [RolUsuario.ADMIN, RolUsuario.SOPORTE]:
+        consulta = consulta.where(TicketSoporte.id_usuario == current_user.id_usuario)
+    return consulta
+
+
 @app.route('/tickets')
 @login_required
 def mis_tickets():
-    # Si el usuario es ADMIN o SOPORTE, ve todos los tickets
-    if current_user.rol in [RolUsuario.ADMIN, RolUsuario.SOPORTE]:
-        tickets = TicketSoporte.query.order_by(TicketSoporte.id_ticket.desc()).all()
-    else:
-        # Los usuarios normales ven solo sus propios tickets
-        tickets = (
-            TicketSoporte.query
-            .filter_by(id_usuario=current_user.id_usuario)
-            .order_by(TicketSoporte.id_ticket.desc())
-            .all()
-        )
+    # Creador y agente asignado en la misma consulta (los muestra cada fila)
+    consulta = consulta_mis_tickets().options(
+        joinedload(TicketSoporte.creador_ticket), joinedload(TicketSoporte.asignado_a)
+    )
+
+    # Cursor del servidor: los tickets se leen por lotes y se convierten
+    # mientras se envía la página, sin armar la lista completa (listas.py)
+    consulta = consulta.execution_options(yield_per=FILAS_POR_LOTE)
+    tickets = FilasPerezosas(lambda: db.session.scalars(consulta), ticket_para_html)
+    return render_lista(app, "mis_tickets.html", tickets=tickets,
+                        agentes=agentes_para_reasignar())
+
+#======================
+# MI COLA (tickets asignados al agente de SOPORTE)
+#=======================
+@app.route('/tickets/mi_cola')
+@login_required
+def mi_cola():
+    if not is_soporte(current_user):
+        abort(403)
+    # Una sola consulta por índice (id_asignado_a, estado, fecha_creacion)
+    consulta = consulta_cola(current_user.id_usuario).execution_options(yield_per=FILAS_POR_LOTE)
+    tickets = FilasPerezosas(lambda: db.session.scalars(consulta), ticket_para_html)
+    return render_lista(app, "mis_tickets.html", tickets=tickets, cola=True,
+                        agentes=agentes_para_reasignar())
+
+
+#======================
+# ACCIONES MASIVAS (UPDATE por lotes, ver acciones_masivas.py)
+#=======================
+def consulta_agentes_para_reasignar():
+    """SELECT de los agentes de SOPORTE del selector de reasignación (la comparte asgi.py)."""
+    return select(Usuario).filter_by(rol=RolUsuario.SOPORTE).order_by(Usuario.nombre, Usuario.apellido)
+
+
+def agentes_para_reasignar():
+    """Agentes de SOPORTE para el selector de reasignación (solo lo ve el ADMIN)."""
+    if current_user.rol != RolUsuario.ADMIN:
+        return []
+    return db.session.scalars(consulta_agentes_para_reasignar()).all()
+
+
+def ids_del_formulario():
+    """Ids marcados en la lista (checkbox 'ids'); ignora valores no numéricos."""
+    return [int(valor) for valor in request.form.getlist('ids') if valor.isdigit()]
+
+
+def respuesta_masiva(total, mensaje, destino):
+    """JSON con la cantidad afectada para clientes de API; flash + redirect para el HTML."""
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'afectados': total})
+    flash(mensaje, "success" if total else "info")
+    return redirect(destino)
+
+
+@app.route('/admin/solicitudes/masivo', methods=['POST'])
+@login_required
+def solicitudes_masivo():
+    # Los filtros del dashboard viajan en el query string de la acción
+    volver = url_for('dashboard', **request.args.to_dict())
+    try:
+        nuevo_estado = EstadoSolicitud[request.form.get('estado', '')]
+    except KeyError:
+        flash("Estado no válido para la acción masiva.", "warning")
+        return redirect(volver)
+
+    alcance = request.form.get('alcance', 'seleccion')
+    ids = ids_del_formulario()
+    if alcance != 'filtro' and not ids:
+        flash("Marca al menos una solicitud.", "warning")
+        return redirect(volver)
 
-    # Preparar los datos para la plantilla
-    tickets_para_html = []
-    for ticket in tickets:
-        # Obtener el nombre del creador
-        nombre_creador = (
-            ticket.creador_ticket.nombre_completo if hasattr(ticket, "creador_ticket") and ticket.creador_ticket
-            else f"ID Usuario: {ticket.id_usuario}"
+    try:
+        total = cambiar_estado_solicitudes(
+            current_user, nuevo_estado,
+            filtros=leer_filtros(request.args) if alcance == 'filtro' else None,
+            ids=None if alcance == 'filtro' else ids,
         )
+    except AccionNoPermitida:
+        abort(403)
+    except ValueError as e:
+        flash(str(e), "warning")
+        return redirect(volver)
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error en la acción masiva (los lotes ya confirmados se mantienen): {e}", "danger")
+        return redirect(volver)
+
+    etiqueta = nuevo_estado.name.capitalize().replace('_', ' ')
+    return respuesta_masiva(total, f"{total} solicitud(es) pasaron a '{etiqueta}'.", volver)
 
-        tickets_para_html.append({
-            "id_ticket": ticket.id_ticket,
-            "asunto": ticket.asunto,
-            "estado": ticket.estado.name.capitalize().replace("_", " "),
-            "creador_nombre": nombre_creador,
-            "fecha_creacion": ticket.fecha_creacion  # Agregar fecha para mostrarla
-        })
 
-    # Renderizar la plantilla con los datos listos
-    return render_template("mis_tickets.html", tickets=tickets_para_html)
+@app.route('/tickets/masivo', methods=['POST'])
+@login_required
+def tickets_masivo():
+    volver = request.form.get('volver') if request.form.get('volver') in ('cola',) else None
+    volver = url_for('mi_cola') if volver else url_for('mis_tickets')
+    accion = request.form.get('accion')
+    ids = ids_del_formulario()
+
+    try:
+        if accion == 'cerrar':
+            if not ids:
+                flash("Marca al menos un ticket.", "warning")
+                return redirect(volver)
+            total = cerrar_tickets(current_user, ids=ids)
+            mensaje = f"{total} ticket(s) cerrado(s)."
+        elif accion == 'cerrar_inactivos':
+            dias = request.form.get('dias', type=int)
+            if not dias or dias < 1:
+                flash("Indica cuántos días de inactividad.", "warning")
+                return redirect(volver)
+            total = cerrar_tickets(current_user, condiciones=condicion_tickets_inactivos(dias))
+            mensaje = f"{total} ticket(s) sin actividad en {dias} día(s) cerrado(s)."
+        elif accion == 'reasignar':
+            if not ids:
+                flash("Marca al menos un ticket.", "warning")
+                return redirect(volver)
+            id_destino = request.form.get('id_agente', type=int)
+            total = reasignar_tickets(current_user, id_destino, ids=ids)
+            mensaje = f"{total} ticket(s) reasignado(s)."
+        else:
+            flash("Acción masiva desconocida.", "warning")
+            return redirect(volver)
+    except AccionNoPermitida:
+        abort(403)
+    except ValueError as e:
+        flash(str(e), "warning")
+        return redirect(volver)
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error en la acción masiva (los lotes ya confirmados se mantienen): {e}", "danger")
+        return redirect(volver)
+
+    return respuesta_masiva(total, mensaje, volver)
 
 # ======================
 #   DETALLES DE TICKET (ver_ticket.html) (CORREGIDA)
@@ -468,6 +733,10 @@ def ver_ticket(id_ticket):
         flash('Ticket no encontrado.', 'danger')
         return redirect(url_for('dashboard', tab='tickets'))
         
+    # El creador ve el ticket: sus respuestas sin leer pasan a leídas (badge)
+    if request.method == 'GET' and marcar_leido(ticket, current_user.id_usuario):
+        db.session.commit()
+
     # 1. Instanciar el formulario de respuesta
     form = ResponderForm()
 
@@ -488,16 +757,23 @@ def ver_ticket(id_ticket):
                     fecha=datetime.utcnow()
                 )
                 db.session.add(nueva_respuesta)
-                
-                # Regla de Negocio: Si un SOPORTE responde a un ticket ABIERTO,
-                # cámbialo a EN_PROCESO para indicar que está siendo atendido.
-                if current_user.rol == RolUsuario.SOPORTE and ticket.estado == EstadoTicket.ABIERTO:
-                    ticket.estado = EstadoTicket.EN_PROCESO
+                # Sin autoflush: el ticket se escribe una sola vez, en el commit
+                with db.session.no_autoflush:
+                    registrar_primera_respuesta(ticket, current_user, nueva_respuesta.fecha)
+                    registrar_respuesta(ticket, current_user.id_usuario)
+
+                    # Regla de Negocio: Si un SOPORTE responde a un ticket ABIERTO,
+                    # cámbialo a EN_PROCESO para indicar que está siendo atendido.
+                    if current_user.rol == RolUsuario.SOPORTE and ticket.estado == EstadoTicket.ABIERTO:
+                        cambiar_estado(ticket, EstadoTicket.EN_PROCESO, current_user)
                 
                 db.session.commit()
                 flash('Respuesta enviada correctamente.', 'success')
                 # PRG Pattern: Redirigir después de POST exitoso
                 return redirect(url_for('ver_ticket', id_ticket=ticket.id_ticket))
+            except StaleDataError:
+                avisar_conflicto(f"El ticket #{id_ticket}")
+                return redirect(url_for('ver_ticket', id_ticket=id_ticket))
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error al enviar respuesta: {str(e)}', 'danger')
@@ -511,6 +787,256 @@ def ver_ticket(id_ticket):
         form=form
     )
 
+#===========================
+# FOTOS ADJUNTAS (solicitudes y tickets)
+#===========================
+def puede_ver_ticket(ticket):
+    """El creador del ticket o ADMIN/SOPORTE."""
+    return ticket.id_usuario == current_user.id_usuario or is_soporte(current_user)
+
+
+def _entidad_para_adjuntar(entidad, id_entidad):
+    """Devuelve (solicitud, ticket) según la entidad, verificando permisos (404 si no)."""
+    if entidad == 'solicitud':
+        return buscar_solicitud_editable(id_entidad), None
+    if entidad == 'ticket':
+        ticket = db.session.get(TicketSoporte, id_entidad)
+        if not ticket or not puede_ver_ticket(ticket):
+            abort(404)
+        return None, ticket
+    abort(404)
+
+
+def guardar_adjunto(stream, nombre, solicitud=None, ticket=None):
+    """Copia el archivo a disco por bloques y crea el Adjunto (sin commit)."""
+    carpeta = app.config["UPLOAD_FOLDER"]
+    sha256, tipo, tamano = guardar_stream(stream, carpeta, app.config["ADJUNTOS_MAX_BYTES"])
+
+    # El mismo archivo en la misma entidad no se duplica
+    existente = Adjunto.query.filter_by(
+        sha256=sha256,
+        id_solicitud=solicitud.id_solicitud if solicitud else None,
+        id_ticket=ticket.id_ticket if ticket else None,
+    ).first()
+    if existente:
+        return existente
+
+    adjunto = Adjunto(
+        sha256=sha256,
+        solicitud=solicitud,
+        ticket=ticket,
+        id_usuario=current_user.id_usuario,
+        nombre_original=(nombre or '')[:255] or None,
+        tipo_mime=tipo,
+        tamano=tamano,
+    )
+    db.session.add(adjunto)
+    # Miniatura y versión reducida en el pool de procesos (no bloquea la respuesta)
+    encolar_variantes(carpeta, sha256)
+    return adjunto
+
+
+@app.route('/<any(solicitud, ticket):entidad>/<int:id_entidad>/adjuntos', methods=['POST'])
+@login_required
+def subir_adjuntos(entidad, id_entidad):
+    """Formulario HTML (multipart). Werkzeug pasa a disco los archivos grandes."""
+    solicitud, ticket = _entidad_para_adjuntar(entidad, id_entidad)
+    destino = (url_for('ver_solicitud', id=id_entidad) if solicitud
+               else url_for('ver_ticket', id_ticket=id_entidad))
+
+    archivos = [f for f in request.files.getlist('fotos') if f and f.filename]
+    if not archivos:
+        flash("Selecciona al menos una foto.", "warning")
+        return redirect(destino)
+
+    try:
+        for archivo in archivos:
+            guardar_adjunto(archivo.stream, archivo.filename, solicitud=solicitud, ticket=ticket)
+        db.session.commit()
+        flash(f"{len(archivos)} foto(s) adjuntada(s) correctamente ✅", "success")
+    except AdjuntoInvalido as e:
+        db.session.rollback()
+        flash(str(e), "danger")
+    return redirect(destino)
+
+
+@app.route('/api/adjuntos/<any(solicitud, ticket):entidad>/<int:id_entidad>', methods=['PUT'])
+@login_required
+def subir_adjunto_stream(entidad, id_entidad):
+    """
+    Subida cruda para apps/conexiones lentas: el cuerpo de la petición ES la
+    imagen y se lee por bloques desde request.stream. Nombre en X-Nombre-Archivo.
+    """
+    solicitud, ticket = _entidad_para_adjuntar(entidad, id_entidad)
+    try:
+        adjunto = guardar_adjunto(request.stream, request.headers.get('X-Nombre-Archivo'),
+                                  solicitud=solicitud, ticket=ticket)
+        db.session.commit()
+    except AdjuntoInvalido as e:
+        db.session.rollback()
+        return jsonify(error=str(e)), 400
+    return jsonify(
+        id=adjunto.id_adjunto,
+        sha256=adjunto.sha256,
+        tamano=adjunto.tamano,
+        url=url_for('servir_adjunto', id_adjunto=adjunto.id_adjunto),
+    ), 201
+
+
+@app.route('/adjuntos/<int:id_adjunto>', defaults={'variante': None})
+@app.route('/adjuntos/<int:id_adjunto>/<variante>')
+@login_required
+def servir_adjunto(id_adjunto, variante):
+    """
+    Sirve el archivo con soporte de Range (descargas reanudables) y caché
+    larga: el contenido de un sha256 nunca cambia.
+    """
+    adjunto = db.session.get(Adjunto, id_adjunto)
+    if not adjunto or (variante is not None and variante not in VARIANTES):
+        abort(404)
+    if adjunto.id_solicitud:
+        buscar_solicitud_editable(adjunto.id_solicitud)
+    elif not adjunto.ticket or not puede_ver_ticket(adjunto.ticket):
+        abort(404)
+
+    ruta, tipo_variante = archivo_para_servir(app.config["UPLOAD_FOLDER"], adjunto.sha256, variante)
+    if not os.path.exists(ruta):
+        abort(404)
+    es_variante = tipo_variante is not None
+    response = send_file(
+        ruta,
+        mimetype=tipo_variante or adjunto.tipo_mime,
+        conditional=True,  # Range / If-None-Match
+        etag=f"{adjunto.sha256}-{variante}" if es_variante else adjunto.sha256,
+        max_age=31536000,
+    )
+    # Privado (fotos de usuarios) pero inmutable; si aún no hay variante se
+    # sirve el original sin caché larga para que luego se pida la reducida.
+    if variante is None or es_variante:
+        response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+#===========================
+# SINCRONIZACIÓN POR LOTES (agentes de campo sin conexión)
+#===========================
+@app.route('/api/sync', methods=['POST'])
+@login_required
+def api_sync():
+    """
+    Recibe {"cursor": "...", "solicitudes": [...], "tickets": [...]} donde cada
+    registro trae su 'clave' de idempotencia (y los tickets, opcionalmente,
+    'id_solicitud' o 'clave_solicitud'). Inserta el lote en una sola
+    transacción y devuelve el resultado por registro + el delta del servidor.
+    """
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        return jsonify(error="Se esperaba un objeto JSON"), 400
+
+    try:
+        leer_cursor(datos.get('cursor'))  # validar antes de escribir nada
+        resultados = aplicar_lote(current_user, datos)
+        db.session.commit()
+    except LoteInvalido as e:
+        db.session.rollback()
+        return jsonify(error=str(e)), 400
+    except IntegrityError:
+        # Otra sincronización concurrente insertó las mismas claves: el
+        # cliente reintenta y esos registros vendrán como 'duplicado'
+        db.session.rollback()
+        return jsonify(error="Conflicto de sincronización, reintenta."), 409
+
+    delta, cursor = delta_desde(current_user, datos.get('cursor'))
+    return jsonify(resultados=resultados, delta=delta, cursor=cursor)
+
+#===========================
+# API JSON v1 (clientes con poco ancho de banda, ver api.py)
+#===========================
+@app.errorhandler(CamposInvalidos)
+def campos_invalidos(e):
+    return jsonify(error=str(e)), 400
+
+
+@app.route('/api/v1/solicitudes')
+@api_login_requerido
+def api_solicitudes():
+    """Mismo contenido que el dashboard: mismos filtros, orden y paginación."""
+    filtros = leer_filtros(request.args)
+    id_usuario = None if current_user.rol == RolUsuario.ADMIN else current_user.id_usuario
+    campos = leer_campos(tuple(CAMPOS_SOLICITUD), LISTA_SOLICITUDES)
+    datos, etag = lista_solicitudes(consulta_pagina(filtros, id_usuario=id_usuario), campos, POR_PAGINA, filtros)
+    return respuesta_json(app, datos, etag)
+
+
+@app.route('/api/v1/solicitudes/<int:id_solicitud>')
+@api_login_requerido
+def api_solicitud(id_solicitud):
+    solicitud = buscar_solicitud_editable(id_solicitud)
+    campos = leer_campos(tuple(CAMPOS_SOLICITUD) + COLECCIONES_SOLICITUD,
+                         tuple(CAMPOS_SOLICITUD) + COLECCIONES_SOLICITUD)
+    return respuesta_json(app, *detalle_solicitud(solicitud, campos))
+
+
+@app.route('/api/v1/tickets')
+@api_login_requerido
+def api_tickets():
+    """Como mis_tickets, por páginas de POR_PAGINA ('?despues=' / '?antes=' con el id de ticket)."""
+    campos = leer_campos(tuple(CAMPOS_TICKET), LISTA_TICKETS)
+    despues, antes = leer_pagina_tickets(request.args)
+    return respuesta_json(app, *lista_tickets(consulta_mis_tickets(), campos, POR_PAGINA, despues, antes))
+
+
+@app.route('/api/v1/tickets/mi_cola')
+@api_login_requerido
+def api_mi_cola():
+    if not is_soporte(current_user):
+        abort(403)
+    campos = leer_campos(tuple(CAMPOS_TICKET), LISTA_TICKETS)
+    return respuesta_json(app, *lista_tickets(consulta_cola(current_user.id_usuario), campos))
+
+
+@app.route('/api/v1/tickets/<int:id_ticket>')
+@api_login_requerido
+def api_ticket(id_ticket):
+    ticket = db.session.get(TicketSoporte, id_ticket)
+    if not ticket or not puede_ver_ticket(ticket):
+        abort(404)
+    # Igual que ver_ticket: al abrirlo, las respuestas quedan leídas
+    if marcar_leido(ticket, current_user.id_usuario):
+        db.session.commit()
+    campos = leer_campos(tuple(CAMPOS_TICKET) + COLECCIONES_TICKET, tuple(CAMPOS_TICKET) + COLECCIONES_TICKET)
+    return respuesta_json(app, *detalle_ticket(ticket, campos))
+
+
+@app.route('/api/v1/perfil')
+@api_login_requerido
+def api_perfil():
+    return respuesta_json(app, *perfil_usuario(current_user))
+
+#===========================
+# NOVEDADES DEL TICKET (actualización en vivo)
+#===========================
+@app.route('/live/ticket/<int:id_ticket>')
+@login_required
+def live_ticket(id_ticket):
+    """
+    Devuelve el estado y las respuestas nuevas (id > ?desde=) de un ticket.
+    En modo ASGI (asgi.py) esta misma ruta hace long-polling con ?espera=.
+    """
+    ticket = db.session.get(TicketSoporte, id_ticket)
+    if not ticket or (ticket.id_usuario != current_user.id_usuario and not is_soporte(current_user)):
+        abort(404)
+
+    desde = request.args.get('desde', 0, type=int)
+    nuevas = (
+        Respuesta.query
+        .filter(Respuesta.id_ticket == id_ticket, Respuesta.id_respuesta > desde)
+        .order_by(Respuesta.id_respuesta)
+        .all()
+    )
+    return jsonify(novedades_ticket(ticket, nuevas))
+
 #===========================
 #actualizar_ticket (CORREGIDA)
 #===========================
@@ -540,49 +1066,69 @@ def actualizar_ticket(id_ticket):
         flash('No tienes permiso para actualizar este ticket.', 'danger')
         return redirect(url_for('ver_ticket', id_ticket=id_ticket))
 
+    # Los avisos se muestran solo si el commit sale bien; ante un conflicto
+    # se descartan y queda únicamente la advertencia.
+    avisos = []
     try:
-        # 1. Manejar Respuesta
-        if mensaje and mensaje.strip():
-            # Permitir respuesta si el ticket está abierto o si el usuario es Soporte
-            if ticket.estado == EstadoTicket.CERRADO and not es_soporte_user:
-                 flash("No se pueden enviar respuestas a un ticket cerrado (solo Soporte puede reabrirlo).", "danger")
-            else:
-                nueva_respuesta = Respuesta(
-                    id_ticket=id_ticket,
-                    id_usuario=usuario_actual.id_usuario, 
-                    mensaje=mensaje,
-                    fecha=datetime.utcnow()
-                )
-                db.session.add(nueva_respuesta)
-                
-                # Regla de negocio: Si alguien responde a un ticket cerrado/pendiente, se marca como ABIERTO
-                if ticket.estado != EstadoTicket.ABIERTO:
-                     ticket.estado = EstadoTicket.ABIERTO
-                     
-                flash('Mensaje enviado exitosamente.', 'success')
-
-        # 2. Manejar Acciones de Estado (Solo para Soporte)
-        if es_soporte_user:
-            if accion == 'cerrar':
-                if ticket.estado != EstadoTicket.CERRADO:
-                    ticket.estado = EstadoTicket.CERRADO
-                    flash(f'Ticket #{id_ticket} cerrado correctamente.', 'info')
+        verificar_version(ticket)
+
+        # Sin autoflush: contadores, SLA y cargas se actualizan con UPDATE en
+        # SQL y escribirían el ticket a medio cambiar. Así el ticket se guarda
+        # en un solo UPDATE ... WHERE version = ... al hacer commit.
+        with db.session.no_autoflush:
+            # 1. Manejar Respuesta
+            if mensaje and mensaje.strip():
+                # Permitir respuesta si el ticket está abierto o si el usuario es Soporte
+                if ticket.estado == EstadoTicket.CERRADO and not es_soporte_user:
+                     avisos.append(("No se pueden enviar respuestas a un ticket cerrado (solo Soporte puede reabrirlo).", "danger"))
                 else:
-                    flash('El ticket ya estaba cerrado.', 'warning')
-                    
-            elif accion == 'reabrir':
-                if ticket.estado == EstadoTicket.CERRADO:
-                    ticket.estado = EstadoTicket.ABIERTO 
-                    flash(f'Ticket #{id_ticket} reabierto correctamente.', 'info')
-                else:
-                    flash('El ticket no está cerrado para reabrirlo.', 'warning')
+                    nueva_respuesta = Respuesta(
+                        id_ticket=id_ticket,
+                        id_usuario=usuario_actual.id_usuario,
+                        mensaje=mensaje,
+                        fecha=datetime.utcnow()
+                    )
+                    db.session.add(nueva_respuesta)
+                    registrar_respuesta(ticket, usuario_actual.id_usuario)
+                    if es_soporte_user:
+                        registrar_primera_respuesta(ticket, usuario_actual, nueva_respuesta.fecha)
+
+                    # Regla de negocio: Si alguien responde a un ticket cerrado/pendiente, se marca como ABIERTO
+                    if ticket.estado != EstadoTicket.ABIERTO:
+                         if ticket.estado == EstadoTicket.CERRADO:
+                             registrar_reapertura(ticket)
+                         cambiar_estado(ticket, EstadoTicket.ABIERTO, usuario_actual)
+
+                    avisos.append(('Mensaje enviado exitosamente.', 'success'))
+
+            # 2. Manejar Acciones de Estado (Solo para Soporte)
+            if es_soporte_user:
+                if accion == 'cerrar':
+                    if ticket.estado != EstadoTicket.CERRADO:
+                        registrar_cierre(ticket, usuario_actual)
+                        cambiar_estado(ticket, EstadoTicket.CERRADO, usuario_actual)
+                        avisos.append((f'Ticket #{id_ticket} cerrado correctamente.', 'info'))
+                    else:
+                        avisos.append(('El ticket ya estaba cerrado.', 'warning'))
+
+                elif accion == 'reabrir':
+                    if ticket.estado == EstadoTicket.CERRADO:
+                        registrar_reapertura(ticket)
+                        cambiar_estado(ticket, EstadoTicket.ABIERTO, usuario_actual)
+                        avisos.append((f'Ticket #{id_ticket} reabierto correctamente.', 'info'))
+                    else:
+                        avisos.append(('El ticket no está cerrado para reabrirlo.', 'warning'))
 
         db.session.commit()
-        
+
+        for texto, categoria in avisos:
+            flash(texto, categoria)
         if not mensaje and not accion:
              # Este caso es solo si el usuario envía el formulario vacío
              flash('No se realizó ninguna acción (mensaje vacío o acción no reconocida).', 'warning')
-             
+
+    except (ConflictoVersion, StaleDataError):
+        avisar_conflicto(f"El ticket #{id_ticket}")
     except Exception as e:
         db.session.rollback()
         flash(f'Error al actualizar el ticket: {e}', 'danger')
@@ -603,17 +1149,27 @@ def cerrar_ticket(id_ticket):
         flash('No tienes permisos para cerrar tickets. Solo ADMIN y SOPORTE pueden hacerlo.', 'error')
         return redirect(url_for('ver_ticket', id_ticket=id_ticket))
     
-    # Verificar que el ticket no esté ya cerrado (CORREGIDO: Usa el ENUM EstadoTicket)
-    if ticket.estado == EstadoTicket.CERRADO:
-        flash('Este ticket ya está cerrado.', 'warning')
+    try:
+        # Otro agente pudo cerrarlo/reabrirlo después de que se abrió la página
+        verificar_version(ticket)
+
+        # Verificar que el ticket no esté ya cerrado (CORREGIDO: Usa el ENUM EstadoTicket)
+        if ticket.estado == EstadoTicket.CERRADO:
+            flash('Este ticket ya está cerrado.', 'warning')
+            return redirect(url_for('ver_ticket', id_ticket=id_ticket))
+
+        # Cerrar el ticket (CORREGIDO: Usa el ENUM EstadoTicket). Sin autoflush
+        # el ticket se escribe en un solo UPDATE ... WHERE version = ... al hacer
+        # commit, después de los UPDATE de contadores, SLA y cargas.
+        with db.session.no_autoflush:
+            registrar_cierre(ticket, current_user)  # fecha_cierre + agregados de SLA
+            cambiar_estado(ticket, EstadoTicket.CERRADO, current_user)
+
+        db.session.commit()
+    except (ConflictoVersion, StaleDataError):
+        avisar_conflicto(f"El ticket #{id_ticket}")
         return redirect(url_for('ver_ticket', id_ticket=id_ticket))
     
-    # Cerrar el ticket (CORREGIDO: Usa el ENUM EstadoTicket)
-    ticket.estado = EstadoTicket.CERRADO
-    ticket.fecha_cierre = datetime.now()  # Opcional: si tienes este campo
-    
-    db.session.commit()
-    
     flash('Ticket cerrado exitosamente.', 'success')
     return redirect(url_for('ver_ticket', id_ticket=id_ticket))
 
@@ -631,19 +1187,326 @@ def reabrir_ticket(id_ticket):
         flash('No tienes permisos para reabrir tickets. Solo ADMIN y SOPORTE pueden hacerlo.', 'error')
         return redirect(url_for('ver_ticket', id_ticket=id_ticket))
     
-    # Verificar que el ticket esté cerrado
-    if ticket.estado != EstadoTicket.CERRADO:
-        flash('Este ticket ya está abierto.', 'warning')
+    try:
+        verificar_version(ticket)
+
+        # Verificar que el ticket esté cerrado
+        if ticket.estado != EstadoTicket.CERRADO:
+            flash('Este ticket ya está abierto.', 'warning')
+            return redirect(url_for('ver_ticket', id_ticket=id_ticket))
+
+        # Reabrir el ticket (un solo UPDATE del ticket, como al cerrar)
+        with db.session.no_autoflush:
+            registrar_reapertura(ticket)
+            cambiar_estado(ticket, EstadoTicket.ABIERTO, current_user)
+
+        db.session.commit()
+    except (ConflictoVersion, StaleDataError):
+        avisar_conflicto(f"El ticket #{id_ticket}")
         return redirect(url_for('ver_ticket', id_ticket=id_ticket))
     
-    # Reabrir el ticket
-    ticket.estado = EstadoTicket.ABIERTO
-    
-    db.session.commit()
-    
     flash('Ticket reabierto exitosamente.', 'success')
     return redirect(url_for('ver_ticket', id_ticket=id_ticket))
 
+#==================
+## REPORTE DE SLA (solo ADMIN)
+#================
+@app.route('/admin/sla')
+@login_required
+def reporte_sla_admin():
+    if current_user.rol != RolUsuario.ADMIN:
+        abort(403)
+
+    # Filtros opcionales por rango de fechas (YYYY-MM-DD)
+    try:
+        desde = datetime.strptime(request.args['desde'], '%Y-%m-%d') if request.args.get('desde') else None
+        hasta = datetime.strptime(request.args['hasta'], '%Y-%m-%d').date() if request.args.get('hasta') else None
+    except ValueError:
+        flash("Formato de fecha inválido, usa AAAA-MM-DD.", "warning")
+        desde = hasta = None
+
+    # Solo lee los buckets precalculados de metricas_sla
+    reporte = reporte_sla(desde=desde, hasta=hasta)
+    return render_template("reporte_sla.html", reporte=reporte, desde=desde, hasta=hasta)
+
+
+#==================
+## REPORTES MUNICIPALES (solo ADMIN)
+#================
+@app.route('/admin/reportes', methods=['GET', 'POST'])
+@login_required
+def reportes_admin():
+    if current_user.rol != RolUsuario.ADMIN:
+        abort(403)
+
+    if request.method == 'POST':
+        try:
+            parametros = leer_parametros(request.form)
+        except ParametrosInvalidos as e:
+            flash(str(e), "warning")
+            return redirect(url_for('reportes_admin'))
+        # Solo calcula la clave (consulta liviana); la agregación va al pool de procesos
+        clave = solicitar_reporte(app, parametros)
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(estado_reporte(app, clave)), 202
+        flash("Reporte solicitado. Aparecerá para descargar cuando esté listo.", "info")
+        return redirect(url_for('reportes_admin'))
+
+    return render_template("reportes.html", reportes=reportes_recientes(app))
+
+
+@app.route('/admin/reportes/<string(length=32):clave>')
+@login_required
+def estado_reporte_admin(clave):
+    """Estado del trabajo en JSON (para consultar periódicamente)."""
+    if current_user.rol != RolUsuario.ADMIN:
+        abort(403)
+    estado = estado_reporte(app, clave)
+    if estado['estado'] == 'desconocido':
+        abort(404)
+    if estado['estado'] == 'listo':
+        estado['url'] = url_for('descargar_reporte', clave=clave)
+    return jsonify(estado)
+
+
+@app.route('/admin/reportes/<string(length=32):clave>/archivo')
+@login_required
+def descargar_reporte(clave):
+    if current_user.rol != RolUsuario.ADMIN:
+        abort(403)
+    estado = estado_reporte(app, clave)
+    if estado['estado'] == 'desconocido':
+        abort(404)
+    if estado['estado'] != 'listo':
+        return jsonify(estado), 202
+    parametros = estado['parametros']
+    formato = parametros['formato']
+    nombre = f"reporte_{parametros['tipo']}_{parametros['desde']}.{formato}"
+    return send_file(ruta_artefacto(app.config["REPORTES_DIR"], clave, formato),
+                     mimetype=FORMATOS[formato], as_attachment=formato == 'csv', download_name=nombre)
+
+
+#==================
+## PERFILES CAPTURADOS (solo ADMIN)
+#================
+@app.route('/admin/perfiles')
+@login_required
+def perfiles_admin():
+    if current_user.rol != RolUsuario.ADMIN:
+        abort(403)
+    return render_template("perfiles.html", perfiles=listar_perfiles(app.config["PERFIL_DIR"]),
+                           muestreo_n=app.config["PERFIL_MUESTREO_N"])
+
+
+@app.route('/admin/perfiles/<nombre>.<any(folded, json):formato>')
+@login_required
+def descargar_perfil(nombre, formato):
+    if current_user.rol != RolUsuario.ADMIN:
+        abort(403)
+    # send_from_directory rechaza nombres que salgan de PERFIL_DIR
+    return send_from_directory(app.config["PERFIL_DIR"], f"{nombre}.{formato}",
+                               mimetype='text/plain' if formato == 'folded' else 'application/json',
+                               as_attachment=formato == 'folded')
+
+
+#==================
+## HISTORIAL DE ESTADOS (bitácora de eventos)
+#================
+@app.route('/historial/<entidad>/<int:id_entidad>')
+@login_required
+def historial_estados(entidad, id_entidad):
+    codigo_entidad = ENTIDADES.get(entidad)
+    if codigo_entidad is None:
+        abort(404)
+
+    # Permisos: el dueño de la solicitud/ticket, o ADMIN/SOPORTE
+    if not is_soporte(current_user):
+        modelo = SolicitudAyuda if entidad == 'solicitud' else TicketSoporte
+        obj = db.session.get(modelo, id_entidad)
+        if not obj or obj.id_usuario != current_user.id_usuario:
+            abort(404)
+
+    eventos = [
+        {
+            "fecha": ev.fecha.isoformat(),
+            "estado_anterior": getattr(decodificar_estado(codigo_entidad, ev.estado_anterior), 'name', None),
+            "estado_nuevo": getattr(decodificar_estado(codigo_entidad, ev.estado_nuevo), 'name', 'ELIMINADO'),
+            "id_usuario": ev.id_usuario,
+        }
+        for ev in historial(codigo_entidad, id_entidad)
+    ]
+    return jsonify(entidad=entidad, id=id_entidad, eventos=eventos)
+
+
+@app.cli.command("eventos-replay")
+@click.option("--entidad", type=click.Choice(list(ENTIDADES)), default="ticket")
+@click.option("--hasta", default=None, help="Foto del estado en esta fecha (AAAA-MM-DD HH:MM)")
+@click.option("--verificar", is_flag=True, help="Compara la bitácora con el estado actual de la tabla")
+def eventos_replay(entidad, hasta, verificar):
+    """Reconstruye los estados desde la bitácora eventos_estado."""
+    codigo_entidad = ENTIDADES[entidad]
+    if verificar:
+        diferencias = diferencias_con_tablas(codigo_entidad)
+        for id_entidad, en_bitacora, en_tabla in diferencias:
+            print(f"{entidad} #{id_entidad}: bitácora={getattr(en_bitacora, 'name', None)} tabla={getattr(en_tabla, 'name', None)}")
+        print(f"Diferencias: {len(diferencias)}")
+        return
+
+    fecha = datetime.strptime(hasta, '%Y-%m-%d %H:%M') if hasta else None
+    estados = reproducir(codigo_entidad, hasta=fecha)
+    for id_entidad in sorted(estados):
+        print(f"{id_entidad}\t{estados[id_entidad].name}")
+
+
+@app.cli.command("tickets-rebalancear")
+def tickets_rebalancear():
+    """Redistribuye los tickets abiertos entre los agentes de soporte disponibles."""
+    resumen = rebalancear()
+    print(f"Liberados: {resumen['liberados']}  Asignados: {resumen['asignados']}  Movidos: {resumen['movidos']}")
+
+
+@app.cli.command("agente-configurar")
+@click.argument("cedula")
+@click.option("--especialidades", default=None, help="Tipos de desastre separados por comas ('' para ninguno)")
+@click.option("--disponible/--no-disponible", default=None, help="Incluir o sacar al agente del reparto")
+def agente_configurar(cedula, especialidades, disponible):
+    """Cambia la disponibilidad y las especialidades de un agente de soporte."""
+    agente = Usuario.query.filter_by(cedula=cedula).first()
+    if agente is None or agente.rol != RolUsuario.SOPORTE:
+        raise click.ClickException(f"No existe un usuario SOPORTE con cédula {cedula}")
+    if especialidades is not None:
+        agente.especialidades = especialidades or None
+    if disponible is not None:
+        agente.disponible = disponible
+    db.session.commit()
+    print(f"{agente.nombre_completo}: disponible={agente.disponible} especialidades={agente.especialidades or '-'}")
+
+
+def _usuario_cli(cedula):
+    usuario = Usuario.query.filter_by(cedula=cedula).first()
+    if usuario is None:
+        raise click.ClickException(f"No existe un usuario con cédula {cedula}")
+    return usuario
+
+
+def _ids_cli(texto):
+    try:
+        return [int(parte) for parte in texto.split(',') if parte.strip()] if texto else None
+    except ValueError:
+        raise click.ClickException("--ids debe ser una lista de números separados por comas")
+
+
+@app.cli.command("solicitudes-estado")
+@click.argument("estado", type=click.Choice([e.name for e in ESTADOS_MASIVOS_SOLICITUD]))
+@click.option("--por", "cedula", required=True, help="Cédula del ADMIN que ejecuta la acción")
+@click.option("--ids", default=None, help="Ids separados por comas")
+@click.option("--estado-actual", default=None, help="Filtro: estado actual")
+@click.option("--tipo-desastre", default=None, help="Filtro: tipo de desastre")
+@click.option("--municipio", default=None, help="Filtro: municipio del solicitante")
+@click.option("--creada-hasta", default=None, help="Filtro: creadas hasta AAAA-MM-DD")
+def solicitudes_estado(estado, cedula, ids, estado_actual, tipo_desastre, municipio, creada_hasta):
+    """Cambia en bloque el estado de solicitudes (por ids y/o filtros del dashboard)."""
+    filtros = leer_filtros({
+        'estado': estado_actual, 'tipo_desastre': tipo_desastre,
+        'municipio': municipio, 'fecha_creacion_hasta': creada_hasta,
+    })
+    try:
+        total = cambiar_estado_solicitudes(_usuario_cli(cedula), EstadoSolicitud[estado],
+                                           filtros=filtros, ids=_ids_cli(ids))
+    except AccionNoPermitida as e:
+        raise click.ClickException(str(e))
+    print(f"Solicitudes actualizadas: {total}")
+
+
+@app.cli.command("tickets-cerrar")
+@click.option("--por", "cedula", required=True, help="Cédula del ADMIN/SOPORTE que ejecuta la acción")
+@click.option("--ids", default=None, help="Ids separados por comas")
+@click.option("--inactivos-dias", type=int, default=None, help="Solo tickets sin actividad en N días")
+def tickets_cerrar(cedula, ids, inactivos_dias):
+    """Cierra tickets en bloque."""
+    ids = _ids_cli(ids)
+    if ids is None and not inactivos_dias:
+        raise click.ClickException("Indica --ids o --inactivos-dias")
+    condiciones = condicion_tickets_inactivos(inactivos_dias) if inactivos_dias else ()
+    try:
+        total = cerrar_tickets(_usuario_cli(cedula), ids=ids, condiciones=condiciones)
+    except AccionNoPermitida as e:
+        raise click.ClickException(str(e))
+    print(f"Tickets cerrados: {total}")
+
+
+@app.cli.command("tickets-reasignar")
+@click.option("--por", "cedula", required=True, help="Cédula del ADMIN que ejecuta la acción")
+@click.option("--a", "cedula_destino", default=None, help="Cédula del agente destino (sin valor = pool compartido)")
+@click.option("--de", "cedula_origen", default=None, help="Solo los tickets de este agente")
+@click.option("--ids", default=None, help="Ids separados por comas")
+def tickets_reasignar(cedula, cedula_destino, cedula_origen, ids):
+    """Reasigna en bloque tickets abiertos o en proceso."""
+    ids = _ids_cli(ids)
+    if ids is None and cedula_origen is None:
+        raise click.ClickException("Indica --ids o --de")
+    try:
+        total = reasignar_tickets(
+            _usuario_cli(cedula),
+            _usuario_cli(cedula_destino).id_usuario if cedula_destino else None,
+            ids=ids,
+            id_origen=_usuario_cli(cedula_origen).id_usuario if cedula_origen else None,
+        )
+    except (AccionNoPermitida, ValueError) as e:
+        raise click.ClickException(str(e))
+    print(f"Tickets reasignados: {total}")
+
+
+@app.cli.command("contadores-reparar")
+def contadores_reparar():
+    """Recalcula la tabla contadores_usuario desde solicitudes y tickets."""
+    total = reparar_contadores()
+    print(f"Contadores reparados para {total} usuario(s)")
+
+
+@app.cli.command("rellenos-listar")
+def rellenos_listar():
+    """Muestra los rellenos de datos registrados y su avance."""
+    for nombre, relleno in RELLENOS.items():
+        progreso = progreso_relleno(nombre)
+        if progreso is None:
+            estado = "sin iniciar"
+        elif progreso.terminado:
+            estado = f"terminado ({progreso.filas} filas)"
+        else:
+            estado = f"en curso hasta id {progreso.ultimo_id} ({progreso.filas} filas)"
+        print(f"{nombre}: {relleno.descripcion} [{estado}]")
+
+
+@app.cli.command("rellenos-ejecutar")
+@click.argument("nombre")
+@click.option("--lote", type=int, default=TAMANO_LOTE, show_default=True, help="Filas (rango de clave primaria) por lote")
+@click.option("--pausa", type=float, default=PAUSA_SEGUNDOS, show_default=True, help="Segundos de espera entre lotes")
+@click.option("--reiniciar", is_flag=True, help="Empieza desde el principio aunque haya avance guardado")
+def rellenos_ejecutar(nombre, lote, pausa, reiniciar):
+    """Ejecuta (o retoma) un relleno de datos por lotes, ver migracion_online.py."""
+    if nombre not in RELLENOS:
+        raise click.ClickException(f"No existe el relleno '{nombre}'. Disponibles: {', '.join(RELLENOS)}")
+
+    def informar(progreso, maximo):
+        porcentaje = min(100.0, 100.0 * progreso.ultimo_id / maximo) if maximo else 100.0
+        print(f"  {nombre}: hasta id {progreso.ultimo_id} de {maximo} ({porcentaje:.1f}%), {progreso.filas} filas")
+
+    try:
+        progreso = ejecutar_relleno(nombre, tamano_lote=lote, pausa=pausa, reiniciar=reiniciar, informar=informar)
+    except KeyboardInterrupt:
+        db.session.rollback()
+        progreso = progreso_relleno(nombre)
+        raise click.ClickException(f"Interrumpido en id {progreso.ultimo_id}; vuelve a ejecutar el comando para continuar")
+    print(f"Relleno '{nombre}' terminado: {progreso.filas} filas procesadas")
+
+
+@app.cli.command("sla-reconstruir")
+def sla_reconstruir():
+    """Recalcula la tabla metricas_sla a partir de los tiempos guardados en los tickets."""
+    total = reconstruir_metricas()
+    print(f"Buckets de SLA reconstruidos: {total}")
+
 #======================================================================================================================
 # ======================
 #   CERRAR SESIÓN
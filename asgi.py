@@ -0,0 +1,361 @@
+# asgi.py
+# Modo de servicio ASGI:
+#
+#     uvicorn asgi:asgi_app --workers 4
+#
+# Las rutas de solo lectura más usadas (dashboard, mis_tickets, ver_ticket,
+# ver_solicitud), el long-polling de /live/ticket y el login/registro (bcrypt)
+# se atienden aquí con SQLAlchemy async, sin ocupar un hilo mientras esperan a
+# MySQL. Todo lo demás (formularios que escriben, admin, etc.) pasa sin cambios
+# a la app Flask de app.py a través de WsgiToAsgi.
+#
+# Las vistas async reutilizan las plantillas, la sesión de Flask, Flask-Login
+# y los mismos helpers de app.py, así que el HTML es idéntico en ambos modos.
+# dashboard y mis_tickets también se envían en streaming, como en WSGI: la
+# plantilla se renderiza en modo async mientras se lee el cursor (listas.py).
+
+import asyncio
+import io
+import re
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import abort, flash, g, jsonify, redirect, render_template, request, session, url_for
+from flask_login import login_user
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+
+from app import (app, bcrypt, is_soporte, fila_dashboard, detalle_solicitud_para_html, ticket_para_html,
+                 novedades_ticket, consulta_mis_tickets, consulta_agentes_para_reasignar)
+from contadores import marcar_leido
+from db_async import init_async, sesion_async, en_executor, cerrar_async, calentar_pool_async
+from acciones_masivas import ESTADOS_MASIVOS_SOLICITUD
+from filtros import leer_filtros, consulta_pagina, ORDENES_SOLICITUD, PRIORIDADES, POR_PAGINA
+from listas import FILAS_POR_LOTE, FilasPerezosasAsync, render_lista_async
+from forms import ResponderForm
+from perfilado import empezar_perfil, terminar_perfil
+from models import Usuario, SolicitudAyuda, TicketSoporte, Respuesta, EstadoSolicitud, RolUsuario
+
+# Long-polling de /live/ticket
+ESPERA_MAXIMA = 25
+INTERVALO_SONDEO = 2
+
+# (método, regex, requiere_login, vista)
+RUTAS = []
+
+
+def ruta(metodo, patron, requiere_login=True):
+    """Registra una vista async para (método, ruta)."""
+    def decorador(vista):
+        RUTAS.append((metodo, re.compile(f"^{patron}$"), requiere_login, vista))
+        return vista
+    return decorador
+
+
+def _buscar_ruta(metodo, path):
+    for metodo_ruta, patron, requiere_login, vista in RUTAS:
+        if metodo_ruta == metodo:
+            coincidencia = patron.match(path)
+            if coincidencia:
+                return vista, requiere_login, {k: int(v) for k, v in coincidencia.groupdict().items()}
+    return None, False, {}
+
+
+def sesion_del_request():
+    """
+    AsyncSession que sigue abierta mientras se envía el cuerpo (listas en
+    streaming). La cierra RenaceASGI._atender al terminar la respuesta.
+    """
+    if 'sesion_async' not in g:
+        g.sesion_async = sesion_async()
+    return g.sesion_async
+
+
+# ======================
+#   VISTAS ASYNC
+# ======================
+@ruta('GET', r'/dashboard')
+async def dashboard(usuario):
+    filtros = leer_filtros(request.args)
+    id_usuario = None if usuario.rol == RolUsuario.ADMIN else usuario.id_usuario
+
+    # Las filas se leen del cursor mientras se envía la página (listas.py)
+    s = sesion_del_request()
+    solicitudes = FilasPerezosasAsync(lambda: s.stream(consulta_pagina(filtros, id_usuario)),
+                                      fila_dashboard(filtros), limite=POR_PAGINA, invertir=bool(filtros['antes']))
+    await solicitudes.asomar()
+
+    return render_lista_async(
+        app,
+        "dashboard.html",
+        nombre=usuario.nombre,
+        solicitudes=solicitudes,
+        filtros=filtros,
+        estados=list(EstadoSolicitud),
+        estados_masivos=ESTADOS_MASIVOS_SOLICITUD,
+        prioridades=PRIORIDADES,
+        ordenes=list(ORDENES_SOLICITUD)
+    )
+
+
+@ruta('GET', r'/ver_solicitud/(?P<id>\d+)')
+async def ver_solicitud(usuario, id):
+    consulta = select(SolicitudAyuda).where(SolicitudAyuda.id_solicitud == id)
+    if usuario.rol != RolUsuario.ADMIN:
+        consulta = consulta.where(SolicitudAyuda.id_usuario == usuario.id_usuario)
+
+    async with sesion_async() as s:
+        solicitud = (await s.execute(consulta.options(selectinload(SolicitudAyuda.adjuntos)))).scalars().first()
+    if solicitud is None:
+        abort(404)
+    return render_template("ver_solicitud.html", solicitud=detalle_solicitud_para_html(solicitud),
+                           adjuntos=solicitud.adjuntos)
+
+
+@ruta('GET', r'/tickets')
+async def mis_tickets(usuario):
+    # La misma consulta que app.mis_tickets (current_user es 'usuario'), leída por lotes
+    consulta = consulta_mis_tickets().options(
+        joinedload(TicketSoporte.creador_ticket), joinedload(TicketSoporte.asignado_a)
+    ).execution_options(yield_per=FILAS_POR_LOTE)
+
+    s = sesion_del_request()
+    # Selector de la reasignación masiva (solo lo ve el ADMIN)
+    agentes = []
+    if usuario.rol == RolUsuario.ADMIN:
+        agentes = (await s.scalars(consulta_agentes_para_reasignar())).all()
+    tickets = FilasPerezosasAsync(lambda: s.stream_scalars(consulta), ticket_para_html)
+    await tickets.asomar()
+    return render_lista_async(app, "mis_tickets.html", tickets=tickets, agentes=agentes)
+
+
+@ruta('GET', r'/ticket/(?P<id_ticket>\d+)')
+async def ver_ticket(usuario, id_ticket):
+    # La plantilla recorre respuestas y creador: se cargan aquí (no hay lazy load en async)
+    async with sesion_async() as s:
+        ticket = await s.get(
+            TicketSoporte, id_ticket,
+            options=[selectinload(TicketSoporte.respuestas), selectinload(TicketSoporte.adjuntos),
+                     joinedload(TicketSoporte.creador_ticket), joinedload(TicketSoporte.asignado_a)],
+        )
+        # El creador ve el ticket: sus respuestas sin leer pasan a leídas (badge)
+        if ticket and await s.run_sync(lambda sesion: marcar_leido(ticket, usuario.id_usuario, sesion)):
+            await s.commit()
+    if not ticket:
+        flash('Ticket no encontrado.', 'danger')
+        return redirect(url_for('dashboard', tab='tickets'))
+
+    # El POST de la respuesta lo sigue atendiendo app.ver_ticket (WSGI)
+    return render_template('ver_ticket.html', ticket=ticket, form=ResponderForm())
+
+
+@ruta('GET', r'/live/ticket/(?P<id_ticket>\d+)')
+async def live_ticket(usuario, id_ticket):
+    desde = request.args.get('desde', 0, type=int)
+    espera = min(max(request.args.get('espera', 0, type=int), 0), ESPERA_MAXIMA)
+    estado_cliente = request.args.get('estado')
+
+    limite = asyncio.get_running_loop().time() + espera
+    while True:
+        async with sesion_async() as s:
+            ticket = await s.get(TicketSoporte, id_ticket)
+            if not ticket or (ticket.id_usuario != usuario.id_usuario and not is_soporte(usuario)):
+                abort(404)
+            nuevas = (await s.execute(
+                select(Respuesta)
+                .where(Respuesta.id_ticket == id_ticket, Respuesta.id_respuesta > desde)
+                .order_by(Respuesta.id_respuesta)
+            )).scalars().all()
+
+        cambio_estado = estado_cliente is not None and estado_cliente != ticket.estado.name
+        if nuevas or cambio_estado or asyncio.get_running_loop().time() >= limite:
+            return jsonify(novedades_ticket(ticket, nuevas))
+        # Mientras espera no ocupa hilo ni conexión
+        await asyncio.sleep(INTERVALO_SONDEO)
+
+
+@ruta('POST', r'/login', requiere_login=False)
+async def login(usuario):
+    if usuario is not None:
+        return redirect(url_for('dashboard'))
+
+    cedula = request.form.get("cedula")
+    password = request.form.get("password")
+
+    async with sesion_async() as s:
+        candidato = (await s.execute(select(Usuario).filter_by(cedula=cedula))).scalars().first()
+
+    # bcrypt es CPU: se hace en el executor para no frenar el event loop
+    if candidato and await en_executor(bcrypt.check_password_hash, candidato.password, password):
+        login_user(candidato)
+        flash("Inicio de sesión exitoso ✅", "success")
+        return redirect(url_for("dashboard"))
+
+    flash("Cédula o contraseña incorrecta ❌", "danger")
+    return redirect(url_for("login"))
+
+
+@ruta('POST', r'/registro', requiere_login=False)
+async def registro(usuario):
+    password = request.form.get("password")
+    # 🔒 Encriptar la contraseña en el executor (bcrypt es CPU)
+    hashed = await en_executor(bcrypt.generate_password_hash, password)
+
+    async with sesion_async() as s:
+        s.add(Usuario(
+            cedula=request.form.get("cedula"),
+            nombre=request.form.get("nombre"),
+            apellido=request.form.get("apellido"),
+            email=request.form.get("email"),
+            telefono=request.form.get("telefono"),
+            direccion=request.form.get("direccion"),
+            municipio=request.form.get("municipio"),
+            password=hashed.decode('utf-8'),
+            rol=RolUsuario.USUARIO
+        ))
+        await s.commit()
+
+    flash("Usuario registrado correctamente ✅", "success")
+    return redirect(url_for('login'))
+
+
+# ======================
+#   ADAPTADOR ASGI
+# ======================
+def _environ(scope, cuerpo):
+    """Construye el environ WSGI que necesita Flask para el request context."""
+    servidor = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': servidor[0],
+        'SERVER_PORT': str(servidor[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(cuerpo),
+        'CONTENT_LENGTH': str(len(cuerpo)),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for nombre, valor in scope.get('headers', []):
+        nombre = nombre.decode('latin-1')
+        valor = valor.decode('latin-1')
+        if nombre == 'content-type':
+            environ['CONTENT_TYPE'] = valor
+        elif nombre == 'content-length':
+            continue  # ya se leyó el cuerpo completo
+        else:
+            clave = 'HTTP_' + nombre.upper().replace('-', '_')
+            environ[clave] = f"{environ[clave]},{valor}" if clave in environ else valor
+    return environ
+
+
+async def _leer_cuerpo(receive):
+    partes = []
+    while True:
+        mensaje = await receive()
+        partes.append(mensaje.get('body', b''))
+        if not mensaje.get('more_body'):
+            return b''.join(partes)
+
+
+async def _usuario_de_sesion():
+    """Carga el usuario de Flask-Login (cookie de sesión) con la sesión async."""
+    id_usuario = session.get('_user_id')
+    if not id_usuario:
+        return None
+    async with sesion_async() as s:
+        return await s.get(Usuario, int(id_usuario))
+
+
+class RenaceASGI:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self._calentamiento = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http':
+            vista, requiere_login, parametros = _buscar_ruta(scope['method'], scope['path'])
+            if vista is not None:
+                return await self._atender(vista, requiere_login, parametros, scope, receive, send)
+        # Resto de rutas: app Flask síncrona en el pool de hilos de asgiref
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                init_async(self.flask_app)
+                # Pool async caliente sin retrasar el arranque (como db_config.init_motor)
+                self._calentamiento = asyncio.create_task(calentar_pool_async())
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                await cerrar_async()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _atender(self, vista, requiere_login, parametros, scope, receive, send):
+        init_async(self.flask_app)  # por si el servidor no envía 'lifespan'
+        environ = _environ(scope, await _leer_cuerpo(receive))
+
+        with self.flask_app.request_context(environ):
+            try:
+                usuario = await _usuario_de_sesion()
+                # Flask-Login toma current_user de g._login_user: así no consulta la BD en sync
+                g._login_user = usuario if usuario is not None else self.flask_app.login_manager.anonymous_user()
+                # Muestreo de esta tarea y línea de tiempo SQL (los eventos del motor leen g.perfil)
+                g.perfil = empezar_perfil(self.flask_app, vista.__name__, asyncio.current_task())
+                if requiere_login and usuario is None:
+                    respuesta = self.flask_app.login_manager.unauthorized()
+                else:
+                    respuesta = await vista(usuario, **parametros)
+                respuesta = self.flask_app.make_response(respuesta)
+            except Exception as e:
+                try:
+                    respuesta = self.flask_app.make_response(self.flask_app.handle_user_exception(e))
+                except Exception as e_no_manejada:
+                    respuesta = self.flask_app.handle_exception(e_no_manejada)
+            # after_request (add_header) y guardado de la cookie de sesión
+            respuesta = self.flask_app.process_response(respuesta)
+
+            cabeceras = [
+                (nombre.lower().encode('latin-1'), valor.encode('latin-1'))
+                for nombre, valor in respuesta.get_wsgi_headers(environ).to_wsgi_list()
+            ]
+            try:
+                if hasattr(respuesta.response, '__aiter__'):
+                    # Lista en streaming (listas.render_lista_async): la plantilla
+                    # sigue usando el request context mientras se genera
+                    await send({'type': 'http.response.start', 'status': respuesta.status_code,
+                                'headers': cabeceras})
+                    try:
+                        async for bloque in respuesta.response:
+                            await send({'type': 'http.response.body', 'body': bloque.encode('utf-8'),
+                                        'more_body': True})
+                    finally:
+                        # Cierra el cursor aunque el cliente se haya desconectado
+                        await respuesta.response.aclose()
+                    await send({'type': 'http.response.body', 'body': b''})
+                    return
+                cuerpo = respuesta.get_data()
+            finally:
+                sesion = g.pop('sesion_async', None)
+                if sesion is not None:
+                    await sesion.close()
+                terminar_perfil(self.flask_app, g.pop('perfil', None), respuesta.status_code)
+
+        await send({'type': 'http.response.start', 'status': respuesta.status_code, 'headers': cabeceras})
+        await send({'type': 'http.response.body', 'body': cuerpo})
+
+
+asgi_app = RenaceASGI(app)
@@ -0,0 +1,244 @@
+# asignacion.py
+# Asignación automática de tickets a los agentes de SOPORTE.
+#
+# Cada ticket nuevo se asigna al agente disponible con MENOS tickets abiertos
+# o en proceso. Si el ticket viene de una solicitud, se prefieren los agentes
+# con esa especialidad (Usuario.especialidades = tipos de desastre).
+#
+# La carga de cada agente es la columna usuarios.tickets_asignados, que se
+# actualiza en SQL (columna = columna + delta) en la MISMA transacción que el
+# cambio que la afecta: si la transacción se revierte, la carga también.
+# Para elegir, las filas de los agentes disponibles se leen con
+# SELECT ... FOR UPDATE: dos asignaciones simultáneas, de cualquier worker,
+# se hacen una detrás de otra y la segunda ve la carga que dejó la primera.
+# 'flask tickets-rebalancear' recalcula las cargas y redistribuye los
+# tickets ya asignados.
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import joinedload
+
+from models import db, Usuario, TicketSoporte, SolicitudAyuda, RolUsuario, EstadoTicket
+
+# Estados que cuentan como carga de trabajo del agente
+ESTADOS_CON_CARGA = (EstadoTicket.ABIERTO, EstadoTicket.EN_PROCESO)
+
+# Tickets por UPDATE ... WHERE id_ticket IN (...) al rebalancear
+TAMANO_LOTE = 500
+
+
+def leer_especialidades(texto):
+    """'Inundación, Terremoto' -> frozenset({'Inundación', 'Terremoto'})."""
+    return frozenset(parte.strip() for parte in (texto or '').split(',') if parte.strip())
+
+
+def tipo_del_ticket(ticket):
+    """Tipo de desastre de la solicitud de origen (None si el ticket no tiene)."""
+    # Por la relación: en un ticket nuevo id_solicitud recién se llena al hacer flush
+    solicitud = ticket.solicitud_origen
+    return solicitud.tipo_desastre if solicitud is not None else None
+
+
+def agentes_disponibles(bloquear=True):
+    """
+    (id_usuario, especialidades, tickets_asignados) de los agentes que entran
+    en el reparto. Con 'bloquear' las filas quedan bloqueadas hasta el commit
+    (siempre en orden de id, para que dos procesos no se bloqueen en cruz).
+    """
+    consulta = (
+        select(Usuario.id_usuario, Usuario.especialidades, Usuario.tickets_asignados)
+        .where(Usuario.rol == RolUsuario.SOPORTE, Usuario.disponible.is_(True))
+        .order_by(Usuario.id_usuario)
+    )
+    if bloquear:
+        consulta = consulta.with_for_update()
+    return db.session.execute(consulta).all()
+
+
+def _menos_cargado(agentes, cargas, tipo_desastre):
+    """Especialistas en 'tipo_desastre' si hay; si no, cualquiera. Desempate por id."""
+    especialistas = [a for a, especialidades in agentes.items() if tipo_desastre and tipo_desastre in especialidades]
+    candidatos = especialistas or list(agentes)
+    if not candidatos:
+        return None
+    return min(candidatos, key=lambda a: (cargas.get(a, 0), a))
+
+
+def elegir_agente(tipo_desastre=None):
+    """Agente disponible con menos carga; None si no hay ninguno."""
+    filas = agentes_disponibles()
+    return _menos_cargado(
+        {fila.id_usuario: leer_especialidades(fila.especialidades) for fila in filas},
+        {fila.id_usuario: fila.tickets_asignados for fila in filas},
+        tipo_desastre,
+    )
+
+
+def ajustar_cargas(deltas):
+    """Suma {id_agente: delta} a la carga; un UPDATE por cada delta distinto."""
+    por_delta = {}
+    for id_agente, delta in deltas.items():
+        if id_agente is not None and delta:
+            por_delta.setdefault(delta, []).append(id_agente)
+    for delta, ids in por_delta.items():
+        db.session.execute(
+            update(Usuario)
+            .where(Usuario.id_usuario.in_(ids))
+            .values(tickets_asignados=Usuario.tickets_asignados + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def asignar_ticket(ticket):
+    """Asigna un ticket nuevo (sin commit). Devuelve el id del agente o None."""
+    id_agente = elegir_agente(tipo_del_ticket(ticket))
+    ticket.id_asignado_a = id_agente
+    ajustar_cargas({id_agente: 1})
+    return id_agente
+
+
+def _delta(anterior, nuevo):
+    return (nuevo in ESTADOS_CON_CARGA) - (anterior in ESTADOS_CON_CARGA)
+
+
+def registrar_transicion(ticket, anterior, nuevo):
+    """Llamado por eventos.py: cerrar/reabrir cambia la carga del agente asignado."""
+    ajustar_cargas({ticket.id_asignado_a: _delta(anterior, nuevo)})
+
+
+def registrar_transiciones(filas, nuevo):
+    """Versión por lotes: 'filas' son (id_asignado_a, estado_anterior)."""
+    deltas = {}
+    for id_agente, anterior in filas:
+        deltas[id_agente] = deltas.get(id_agente, 0) + _delta(anterior, nuevo)
+    ajustar_cargas(deltas)
+
+
+def recalcular_cargas():
+    """Recalcula usuarios.tickets_asignados desde tickets_soporte."""
+    abiertos = (
+        select(func.count())
+        .where(TicketSoporte.id_asignado_a == Usuario.id_usuario, TicketSoporte.estado.in_(ESTADOS_CON_CARGA))
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(Usuario)
+        .where((Usuario.rol == RolUsuario.SOPORTE) | (Usuario.tickets_asignados != 0))
+        .values(tickets_asignados=abiertos)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def consulta_cola(id_agente):
+    """
+    SELECT (sin ejecutar) de los tickets abiertos/en proceso del agente, los
+    más antiguos primero (usa ix_tickets_asignado_estado), con creador y
+    agente en la misma fila.
+    """
+    return (
+        select(TicketSoporte)
+        .options(joinedload(TicketSoporte.creador_ticket), joinedload(TicketSoporte.asignado_a))
+        .where(TicketSoporte.id_asignado_a == id_agente, TicketSoporte.estado.in_(ESTADOS_CON_CARGA))
+        .order_by(TicketSoporte.fecha_creacion, TicketSoporte.id_ticket)
+    )
+
+
+def _acepta(especialidades, tipo_desastre):
+    """Un agente sin especialidades atiende todo; uno con especialidades, solo esas."""
+    return not especialidades or tipo_desastre is None or tipo_desastre in especialidades
+
+
+def _mover(destinos, tamano_lote=TAMANO_LOTE):
+    """Aplica {id_agente: [id_ticket, ...]} con UPDATE ... IN por lotes."""
+    for id_agente, ids in destinos.items():
+        for desde in range(0, len(ids), tamano_lote):
+            db.session.execute(
+                update(TicketSoporte)
+                .where(TicketSoporte.id_ticket.in_(ids[desde:desde + tamano_lote]))
+                .values(id_asignado_a=id_agente, version=TicketSoporte.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def _tickets_con_tipo(*condiciones):
+    """(id_ticket, id_asignado_a, tipo de desastre de la solicitud de origen) sin cargar objetos."""
+    return (
+        select(TicketSoporte.id_ticket, TicketSoporte.id_asignado_a, SolicitudAyuda.tipo_desastre)
+        .outerjoin(SolicitudAyuda, SolicitudAyuda.id_solicitud == TicketSoporte.id_solicitud)
+        .where(*condiciones)
+    )
+
+
+def rebalancear(max_movimientos=500):
+    """
+    Redistribuye los tickets con carga (hace commit). Devuelve un dict con
+    cuántos tickets se liberaron, asignaron y movieron.
+    1. Los tickets de agentes que ya no están disponibles vuelven al pool.
+    2. Los tickets del pool se asignan al agente con menos carga.
+    3. Mientras la diferencia entre el más y el menos cargado sea mayor que 1,
+       se mueve un ticket ABIERTO (aún no atendido) del primero al segundo.
+    El plan se arma en memoria con columnas sueltas y se escribe con UPDATE
+    por conjuntos; las filas de los agentes quedan bloqueadas hasta el
+    commit, así ninguna asignación nueva se cruza con el reparto.
+    """
+    agentes = {fila.id_usuario: leer_especialidades(fila.especialidades) for fila in agentes_disponibles()}
+    con_carga = TicketSoporte.estado.in_(ESTADOS_CON_CARGA)
+    resumen = {'liberados': 0, 'asignados': 0, 'movidos': 0}
+
+    liberar = update(TicketSoporte).where(con_carga, TicketSoporte.id_asignado_a.isnot(None))
+    if agentes:
+        liberar = liberar.where(TicketSoporte.id_asignado_a.notin_(agentes))
+    resumen['liberados'] = db.session.execute(
+        liberar.values(id_asignado_a=None, version=TicketSoporte.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    cargas = {a: 0 for a in agentes}
+    cargas.update(db.session.execute(
+        select(TicketSoporte.id_asignado_a, func.count())
+        .where(con_carga, TicketSoporte.id_asignado_a.in_(agentes))
+        .group_by(TicketSoporte.id_asignado_a)
+    ).all())
+
+    destinos = {}
+    if agentes:
+        pool = db.session.execute(
+            _tickets_con_tipo(con_carga, TicketSoporte.id_asignado_a.is_(None))
+            .order_by(TicketSoporte.fecha_creacion, TicketSoporte.id_ticket)
+        )
+        for id_ticket, _, tipo_desastre in pool:
+            elegido = _menos_cargado(agentes, cargas, tipo_desastre)
+            cargas[elegido] += 1
+            destinos.setdefault(elegido, []).append(id_ticket)
+            resumen['asignados'] += 1
+    _mover(destinos)
+
+    # Tickets ABIERTOS de cada agente, los más nuevos primero (los que se mueven)
+    movibles = {a: [] for a in agentes}
+    for id_ticket, id_agente, tipo_desastre in db.session.execute(
+        _tickets_con_tipo(TicketSoporte.estado == EstadoTicket.ABIERTO, TicketSoporte.id_asignado_a.in_(agentes))
+        .order_by(TicketSoporte.fecha_creacion.desc(), TicketSoporte.id_ticket.desc())
+    ):
+        movibles[id_agente].append((id_ticket, tipo_desastre))
+
+    destinos = {}
+    en_calculo = dict(cargas)
+    while en_calculo and resumen['movidos'] < max_movimientos:
+        origen = max(en_calculo, key=lambda a: (en_calculo[a], a))
+        destino = min(en_calculo, key=lambda a: (en_calculo[a], a))
+        if en_calculo[origen] - en_calculo[destino] <= 1:
+            break
+        indice = next((i for i, (_, tipo) in enumerate(movibles[origen]) if _acepta(agentes[destino], tipo)), None)
+        if indice is None:
+            # El más cargado no tiene nada movible hacia el destino: sacarlo del cálculo
+            en_calculo.pop(origen)
+            continue
+        id_ticket, _ = movibles[origen].pop(indice)
+        destinos.setdefault(destino, []).append(id_ticket)
+        en_calculo[origen] -= 1
+        en_calculo[destino] += 1
+        resumen['movidos'] += 1
+    _mover(destinos)
+
+    recalcular_cargas()
+    db.session.commit()
+    return resumen
@@ -0,0 +1,102 @@
+# benchmarks/concurrencia.py
+# Compara cuántas conexiones concurrentes aguanta el despliegue síncrono
+# (p. ej. gunicorn app:app -w 4) frente al modo ASGI (uvicorn asgi:asgi_app -w 4).
+#
+# Uso:
+#   python benchmarks/concurrencia.py --url http://localhost:8000 --url http://localhost:8001 \
+#       --cedula admin --password secreto --ruta /dashboard --concurrencia 10,50,200,500
+#
+# Para cada URL y nivel de concurrencia abre N clientes simultáneos que piden
+# la ruta en bucle durante --segundos, y reporta peticiones/s, latencias p50/p95
+# y errores. Solo usa la librería estándar.
+
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlencode, urlsplit
+
+
+async def _http(host, puerto, metodo, ruta, cookie=None, cuerpo=b''):
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    try:
+        cabeceras = [f"{metodo} {ruta} HTTP/1.1", f"Host: {host}", "Connection: close"]
+        if cookie:
+            cabeceras.append(f"Cookie: {cookie}")
+        if cuerpo:
+            cabeceras.append("Content-Type: application/x-www-form-urlencoded")
+            cabeceras.append(f"Content-Length: {len(cuerpo)}")
+        escritor.write(("\r\n".join(cabeceras) + "\r\n\r\n").encode() + cuerpo)
+        await escritor.drain()
+        respuesta = await lector.read()
+    finally:
+        escritor.close()
+    cabecera, _, _ = respuesta.partition(b"\r\n\r\n")
+    lineas = cabecera.decode('latin-1').split("\r\n")
+    estado = int(lineas[0].split()[1])
+    return estado, lineas[1:]
+
+
+async def iniciar_sesion(host, puerto, cedula, password):
+    cuerpo = urlencode({'cedula': cedula, 'password': password}).encode()
+    _, cabeceras = await _http(host, puerto, 'POST', '/login', cuerpo=cuerpo)
+    for linea in cabeceras:
+        if linea.lower().startswith('set-cookie:'):
+            return linea.split(':', 1)[1].strip().split(';')[0]
+    raise SystemExit("No se pudo iniciar sesión (¿cédula/contraseña?)")
+
+
+async def _cliente(host, puerto, ruta, cookie, fin, latencias, errores):
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        try:
+            estado, _ = await asyncio.wait_for(_http(host, puerto, 'GET', ruta, cookie), timeout=30)
+            if estado != 200:
+                errores.append(estado)
+            else:
+                latencias.append(time.perf_counter() - inicio)
+        except (OSError, asyncio.TimeoutError) as e:
+            errores.append(type(e).__name__)
+
+
+async def medir(url, ruta, cookie, concurrencia, segundos):
+    partes = urlsplit(url)
+    latencias, errores = [], []
+    fin = time.perf_counter() + segundos
+    await asyncio.gather(*[
+        _cliente(partes.hostname, partes.port or 80, ruta, cookie, fin, latencias, errores)
+        for _ in range(concurrencia)
+    ])
+    ordenadas = sorted(latencias)
+    return {
+        'rps': len(latencias) / segundos,
+        'p50': statistics.median(ordenadas) * 1000 if ordenadas else None,
+        'p95': ordenadas[int(len(ordenadas) * 0.95) - 1] * 1000 if ordenadas else None,
+        'errores': len(errores),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrencia: despliegue síncrono vs ASGI")
+    parser.add_argument('--url', action='append', required=True, help="Despliegue a medir (repetible)")
+    parser.add_argument('--ruta', default='/dashboard')
+    parser.add_argument('--cedula', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrencia', default='10,50,200,500')
+    parser.add_argument('--segundos', type=int, default=15)
+    args = parser.parse_args()
+
+    niveles = [int(n) for n in args.concurrencia.split(',')]
+    print(f"{'url':30} {'conc':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errores':>8}")
+    for url in args.url:
+        partes = urlsplit(url)
+        cookie = await iniciar_sesion(partes.hostname, partes.port or 80, args.cedula, args.password)
+        for n in niveles:
+            r = await medir(url, args.ruta, cookie, n, args.segundos)
+            p50 = f"{r['p50']:.1f}" if r['p50'] is not None else '-'
+            p95 = f"{r['p95']:.1f}" if r['p95'] is not None else '-'
+            print(f"{url:30} {n:>6} {r['rps']:>9.1f} {p50:>9} {p95:>9} {r['errores']:>8}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
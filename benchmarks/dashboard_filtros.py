@@ -0,0 +1,120 @@
+# benchmarks/dashboard_filtros.py
+# Mide cuánto tarda la consulta del dashboard (filtros.consulta_pagina) en
+# devolver la primera página y una página profunda (por cursor y, para
+# comparar, con OFFSET) para cada filtro y orden.
+#
+# Uso:
+#   python benchmarks/dashboard_filtros.py --filas 1000000
+#   DATABASE_URI=mysql://root:@localhost/bench python benchmarks/dashboard_filtros.py --filas 1000000
+#
+# Crea las tablas (con los índices de models.py) y las llena con --filas
+# solicitudes al azar si tienen menos; sin DATABASE_URI usa un SQLite en
+# /tmp. ¡No apuntar a la base de producción!
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('DATABASE_URI', 'sqlite:////tmp/renace_bench_dashboard.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select, text  # noqa: E402
+
+from app import app  # noqa: E402
+from filtros import leer_filtros, consulta_pagina, cursor_de, ORDENES_SOLICITUD, POR_PAGINA  # noqa: E402
+from models import db, Usuario, SolicitudAyuda, EstadoSolicitud, RolUsuario  # noqa: E402
+
+TIPOS = ['Inundación', 'Deslizamiento', 'Terremoto', 'Vendaval', 'Incendio', 'Otro']
+MUNICIPIOS = ['Caucasia', 'Nechí', 'Cáceres', 'Zaragoza', 'El Bagre', 'Tarazá']
+
+CASOS = [
+    {},
+    {'estado': 'PENDIENTE'},
+    {'prioridad': 'Alta'},
+    {'tipo_desastre': 'Vendaval'},
+    {'estado': 'EN_PROCESO', 'fecha_creacion_desde': '2025-01-01'},
+    {'prioridad': 'Baja', 'orden': 'fecha_desastre'},
+    {'tipo_desastre': 'Incendio', 'orden': 'fecha_desastre'},
+    {'dir': 'asc'},
+    {'municipio': 'Nechí'},
+]
+
+
+def sembrar(filas, lote=10000):
+    db.create_all()
+    if db.session.scalar(select(func.count()).select_from(Usuario)) == 0:
+        db.session.execute(insert(Usuario), [
+            {'cedula': f'bench{i}', 'nombre': f'N{i}', 'apellido': 'A', 'email': f'bench{i}@x', 'telefono': '1',
+             'direccion': 'd', 'municipio': MUNICIPIOS[i % len(MUNICIPIOS)], 'password': 'x',
+             'rol': RolUsuario.USUARIO}
+            for i in range(600)
+        ])
+        db.session.commit()
+    ids_usuario = db.session.scalars(select(Usuario.id_usuario)).all()
+    existentes = db.session.scalar(select(func.count()).select_from(SolicitudAyuda))
+    inicio = datetime(2024, 1, 1)
+    rnd = random.Random(42)
+    for desde in range(existentes, filas, lote):
+        db.session.execute(insert(SolicitudAyuda), [
+            {'id_usuario': rnd.choice(ids_usuario), 'tipo_desastre': rnd.choice(TIPOS),
+             'fecha_desastre': (inicio + timedelta(days=rnd.randrange(900))).date(),
+             'personas_afectadas': rnd.randrange(1, 20),
+             'prioridad': rnd.choices(['Alta', 'Media', 'Baja'], weights=[1, 3, 6])[0],
+             'descripcion': 'bench', 'ubicacion': 'vereda',
+             'fecha_creacion': inicio + timedelta(seconds=(desde + i) * 60),
+             # Como en producción: casi todas resueltas, pocas pendientes
+             'estado': rnd.choices(list(EstadoSolicitud), weights=[5, 10, 85])[0], 'version': 1}
+            for i in range(min(lote, filas - desde))
+        ])
+        db.session.commit()
+    if db.engine.url.get_backend_name() == 'sqlite':
+        # MySQL mantiene solo las estadísticas del planificador; SQLite no
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+
+def _medir(consulta, repeticiones):
+    tiempos, filas = [], []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        filas = db.session.execute(consulta).all()
+        tiempos.append(time.perf_counter() - inicio)
+        db.session.expunge_all()
+    return statistics.median(tiempos) * 1000, filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de la consulta del dashboard")
+    parser.add_argument('--filas', type=int, default=1000000)
+    parser.add_argument('--profundidad', type=int, default=2000, help="Página profunda a medir")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        sembrar(args.filas)
+        print(f"{'caso':48} {'1ª pág ms':>10} {'cursor ms':>10} {'OFFSET ms':>10}")
+        for caso in CASOS:
+            filtros = leer_filtros(caso)
+            primera, _ = _medir(consulta_pagina(filtros), args.repeticiones)
+
+            # Cursor de la última fila de la página anterior a la profunda
+            desplazamiento = (args.profundidad - 1) * POR_PAGINA
+            con_offset = consulta_pagina(filtros).offset(desplazamiento)
+            offset_ms, filas = _medir(con_offset, 1)
+            cursor_ms = None
+            if filas:
+                columna = ORDENES_SOLICITUD[filtros['orden']]
+                anterior = db.session.execute(consulta_pagina(filtros).offset(desplazamiento - 1).limit(1)).first()
+                cursor = cursor_de(filtros, getattr(anterior[0], columna.key), anterior[0].id_solicitud)
+                cursor_ms, _ = _medir(consulta_pagina(leer_filtros({**caso, 'despues': cursor})), args.repeticiones)
+            nombre = ' '.join(f"{k}={v}" for k, v in caso.items()) or '(sin filtros)'
+            cursor_txt = f"{cursor_ms:.1f}" if cursor_ms is not None else '-'
+            print(f"{nombre:48} {primera:>10.1f} {cursor_txt:>10} {offset_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# benchmarks/motor_bd.py
+# Compara drivers MySQL (mysqlclient en C vs pymysql en Python puro) y
+# configuraciones del pool de conexiones, con las mismas opciones que arma
+# db_config.py para la app.
+#
+# Uso:
+#   python benchmarks/motor_bd.py --uri mysql://root:@localhost/proyecto_ayuda \
+#       --drivers mysqlclient,pymysql --pools 5:0:1,10:10:1,10:10:0 --hilos 1,20
+#
+# Cada pool se escribe tamaño:desborde:pre_ping. Para cada driver y pool
+# reporta:
+#   - latencia de obtener una conexión del pool (p50/p95) con --hilos hilos
+#     pidiendo conexiones a la vez durante --segundos;
+#   - filas decodificadas por segundo al leer --filas filas de
+#     solicitudes_ayuda (o de --consulta) con fetchall.
+# Los drivers no instalados se saltan.
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_config import DRIVERS_MYSQL, driver_instalado, uri_base_de_datos, opciones_motor  # noqa: E402
+
+CONSULTA = "SELECT * FROM solicitudes_ayuda LIMIT :filas"
+
+
+def _percentil(ordenadas, p):
+    return ordenadas[max(int(len(ordenadas) * p) - 1, 0)] * 1000 if ordenadas else None
+
+
+def medir_adquisicion(engine, hilos, segundos):
+    """Latencia de engine.connect() (incluye el pre-ping, si está activo)."""
+    latencias, errores = [], []
+    fin = time.perf_counter() + segundos
+
+    def cliente():
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            try:
+                conexion = engine.connect()
+            except Exception as e:
+                errores.append(type(e).__name__)
+                continue
+            latencias.append(time.perf_counter() - inicio)
+            conexion.exec_driver_sql('SELECT 1')
+            conexion.close()
+
+    trabajadores = [threading.Thread(target=cliente) for _ in range(hilos)]
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    ordenadas = sorted(latencias)
+    return {
+        'p50': statistics.median(ordenadas) * 1000 if ordenadas else None,
+        'p95': _percentil(ordenadas, 0.95),
+        'errores': len(errores),
+    }
+
+
+def medir_decodificacion(engine, consulta, filas, repeticiones):
+    """Filas por segundo leídas y convertidas a objetos Python por el driver."""
+    total, tiempo = 0, 0.0
+    with engine.connect() as conexion:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            leidas = conexion.execute(text(consulta), {'filas': filas}).fetchall()
+            tiempo += time.perf_counter() - inicio
+            total += len(leidas)
+    return total / tiempo if tiempo else 0.0
+
+
+def _pool(texto):
+    tamano, desborde, pre_ping = texto.split(':')
+    return {'DB_POOL_SIZE': tamano, 'DB_MAX_OVERFLOW': desborde, 'DB_POOL_PRE_PING': pre_ping}
+
+
+def _ms(valor):
+    return f"{valor:.2f}" if valor is not None else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drivers MySQL y configuraciones del pool")
+    parser.add_argument('--uri', default=os.environ.get('DATABASE_URI', 'mysql://root:@localhost/proyecto_ayuda'))
+    parser.add_argument('--drivers', default=','.join(DRIVERS_MYSQL))
+    parser.add_argument('--pools', default='5:0:1,10:10:1,10:10:0')
+    parser.add_argument('--hilos', default='1,20')
+    parser.add_argument('--segundos', type=int, default=5)
+    parser.add_argument('--filas', type=int, default=5000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--consulta', default=CONSULTA, help="SQL a leer; puede usar :filas")
+    args = parser.parse_args()
+
+    niveles = [int(n) for n in args.hilos.split(',')]
+    print(f"{'driver':12} {'pool':>9} {'hilos':>6} {'p50 ms':>9} {'p95 ms':>9} {'errores':>8} {'filas/s':>10}")
+    for driver in args.drivers.split(','):
+        if not driver_instalado(driver):
+            print(f"{driver:12} (no instalado, se salta)")
+            continue
+        for texto_pool in args.pools.split(','):
+            entorno = {'DATABASE_URI': args.uri, 'DB_DRIVER': driver, **_pool(texto_pool)}
+            uri = uri_base_de_datos(args.uri, entorno)
+            engine = create_engine(uri, **opciones_motor(uri, entorno))
+            try:
+                filas_s = medir_decodificacion(engine, args.consulta, args.filas, args.repeticiones)
+                for hilos in niveles:
+                    r = medir_adquisicion(engine, hilos, args.segundos)
+                    print(f"{driver:12} {texto_pool:>9} {hilos:>6} {_ms(r['p50']):>9} {_ms(r['p95']):>9} "
+                          f"{r['errores']:>8} {filas_s:>10.0f}")
+            finally:
+                engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# contadores.py
+# Contadores precalculados por usuario (tabla contadores_usuario) para los
+# badges de la barra de navegación y el perfil.
+#
+# Se mantienen en la MISMA transacción que el cambio que los afecta:
+#   - creación / cambio de estado / eliminación: desde eventos.py, que es el
+#     punto por el que pasan todas las transiciones;
+#   - respuestas nuevas y lectura del ticket: desde las rutas de app.py/asgi.py.
+# Los incrementos se hacen en SQL (columna = columna + delta) para no perder
+# actualizaciones concurrentes; la fila se crea con un upsert
+# (models.sumar_en_fila) para que dos transacciones no choquen al crearla.
+# 'flask contadores-reparar' los recalcula.
+
+from sqlalchemy import func
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import db, sumar_en_fila, ContadoresUsuario, SolicitudAyuda, TicketSoporte, EstadoSolicitud, EstadoTicket
+
+# Estado -> columna del contador que lo cuenta (los demás estados no cuentan)
+COLUMNA_POR_ESTADO = {
+    EstadoSolicitud.PENDIENTE: 'solicitudes_pendientes',
+    EstadoSolicitud.EN_PROCESO: 'solicitudes_en_proceso',
+    EstadoTicket.ABIERTO: 'tickets_abiertos',
+    EstadoTicket.EN_PROCESO: 'tickets_abiertos',
+}
+
+
+def ajustar(id_usuario, sesion=None, **deltas):
+    """Suma los deltas a los contadores del usuario (crea la fila si no existe)."""
+    sesion = sesion or db.session
+    deltas = {campo: delta for campo, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # Una sola sentencia (sin flush de la sesión: la ruta guarda sus objetos en
+    # el commit) y sin choque si otra transacción crea la fila a la vez
+    sumar_en_fila(sesion, ContadoresUsuario, {'id_usuario': id_usuario}, deltas,
+                  iniciales={c: max(d, 0) for c, d in deltas.items()})
+
+
+def registrar_transicion(obj, anterior, nuevo):
+    """Llamado por eventos.py: 'anterior'/'nuevo' son ENUMs o None (creación/eliminación)."""
+    ajustar(obj.id_usuario, **_deltas_transicion(anterior, nuevo))
+
+
+def _deltas_transicion(anterior, nuevo):
+    deltas = {}
+    if anterior in COLUMNA_POR_ESTADO:
+        deltas[COLUMNA_POR_ESTADO[anterior]] = deltas.get(COLUMNA_POR_ESTADO[anterior], 0) - 1
+    if nuevo in COLUMNA_POR_ESTADO:
+        deltas[COLUMNA_POR_ESTADO[nuevo]] = deltas.get(COLUMNA_POR_ESTADO[nuevo], 0) + 1
+    return {campo: delta for campo, delta in deltas.items() if delta}
+
+
+def registrar_transiciones(filas, nuevo):
+    """
+    Versión por lotes para las acciones masivas: 'filas' son (id_usuario,
+    estado_anterior). Los usuarios con los mismos deltas se actualizan con un
+    solo UPDATE ... WHERE id_usuario IN (...).
+    """
+    por_usuario = {}
+    for id_usuario, anterior in filas:
+        acumulado = por_usuario.setdefault(id_usuario, {})
+        for campo, delta in _deltas_transicion(anterior, nuevo).items():
+            acumulado[campo] = acumulado.get(campo, 0) + delta
+
+    grupos = {}
+    for id_usuario, deltas in por_usuario.items():
+        deltas = tuple(sorted((c, d) for c, d in deltas.items() if d))
+        if deltas:
+            grupos.setdefault(deltas, []).append(id_usuario)
+
+    for deltas, ids in grupos.items():
+        db.session.query(ContadoresUsuario).filter(ContadoresUsuario.id_usuario.in_(ids)).update(
+            {getattr(ContadoresUsuario, campo): getattr(ContadoresUsuario, campo) + delta for campo, delta in deltas},
+            synchronize_session=False,
+        )
+        existentes = {
+            id_usuario for (id_usuario,) in
+            db.session.query(ContadoresUsuario.id_usuario).filter(ContadoresUsuario.id_usuario.in_(ids))
+        }
+        # Los que no tenían fila (pocos): upsert, por si otra transacción la
+        # crea entre la consulta anterior y este INSERT
+        for id_usuario in sorted(set(ids) - existentes):
+            ajustar(id_usuario, **dict(deltas))
+
+
+def registrar_respuesta(ticket, id_autor, sesion=None):
+    """Una respuesta de otra persona queda sin leer para el creador del ticket."""
+    if id_autor == ticket.id_usuario:
+        return
+    sesion = sesion or db.session
+    # Incremento en SQL y sin tocar TicketSoporte.version: una respuesta nueva
+    # no debe invalidar el formulario que otro agente tiene abierto.
+    sesion.query(TicketSoporte).filter(TicketSoporte.id_ticket == ticket.id_ticket).update(
+        {TicketSoporte.respuestas_sin_leer: TicketSoporte.respuestas_sin_leer + 1},
+        synchronize_session=False,
+    )
+    set_committed_value(ticket, 'respuestas_sin_leer', (ticket.respuestas_sin_leer or 0) + 1)
+    ajustar(ticket.id_usuario, sesion=sesion, respuestas_sin_leer=1)
+
+
+def marcar_leido(ticket, id_lector, sesion=None):
+    """El creador abrió el ticket: sus respuestas pendientes pasan a leídas."""
+    pendientes = ticket.respuestas_sin_leer or 0
+    if id_lector != ticket.id_usuario or pendientes <= 0:
+        return False
+    sesion = sesion or db.session
+    # UPDATE condicionado: si dos pestañas abren el ticket a la vez solo una descuenta
+    filas = (
+        sesion.query(TicketSoporte)
+        .filter(TicketSoporte.id_ticket == ticket.id_ticket, TicketSoporte.respuestas_sin_leer == pendientes)
+        .update({TicketSoporte.respuestas_sin_leer: 0}, synchronize_session=False)
+    )
+    if filas:
+        ajustar(ticket.id_usuario, sesion=sesion, respuestas_sin_leer=-pendientes)
+    # Ya quedó en 0 en la BD: no generar otro UPDATE al hacer flush
+    set_committed_value(ticket, 'respuestas_sin_leer', 0)
+    return bool(filas)
+
+
+def reparar_contadores():
+    """Recalcula todos los contadores desde las tablas. Devuelve cuántos usuarios tocó."""
+    valores = {}
+
+    def fila(id_usuario):
+        return valores.setdefault(id_usuario, {
+            'solicitudes_pendientes': 0,
+            'solicitudes_en_proceso': 0,
+            'tickets_abiertos': 0,
+            'respuestas_sin_leer': 0,
+        })
+
+    for id_usuario, estado, total in (
+        db.session.query(SolicitudAyuda.id_usuario, SolicitudAyuda.estado, func.count())
+        .group_by(SolicitudAyuda.id_usuario, SolicitudAyuda.estado)
+    ):
+        if estado in COLUMNA_POR_ESTADO:
+            fila(id_usuario)[COLUMNA_POR_ESTADO[estado]] += total
+
+    for id_usuario, estado, total, sin_leer in (
+        db.session.query(TicketSoporte.id_usuario, TicketSoporte.estado, func.count(),
+                         func.coalesce(func.sum(TicketSoporte.respuestas_sin_leer), 0))
+        .group_by(TicketSoporte.id_usuario, TicketSoporte.estado)
+    ):
+        if estado in COLUMNA_POR_ESTADO:
+            fila(id_usuario)[COLUMNA_POR_ESTADO[estado]] += total
+        fila(id_usuario)['respuestas_sin_leer'] += int(sin_leer)
+
+    ContadoresUsuario.query.delete(synchronize_session=False)
+    for id_usuario, campos in valores.items():
+        db.session.add(ContadoresUsuario(id_usuario=id_usuario, **campos))
+    db.session.commit()
+    return len(valores)
@@ -0,0 +1,104 @@
+# db_async.py
+# Motor y sesiones ASÍNCRONAS de SQLAlchemy para el modo ASGI (asgi.py).
+#
+# Se usa el mismo esquema (models.py) que la app síncrona; solo cambia el
+# driver: aiomysql en lugar de pymysql/mysqlclient. La URL se puede fijar con
+# la variable de entorno ASYNC_DATABASE_URI; si no existe se deriva de
+# SQLALCHEMY_DATABASE_URI cambiando el driver. El pool se configura con las
+# mismas variables DB_POOL_* que el motor síncrono (db_config.py), se descarta
+# en los procesos hijos creados con fork y se calienta al arrancar (lifespan).
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from db_config import opciones_motor, conexiones_a_calentar
+
+log = logging.getLogger(__name__)
+
+# Drivers async equivalentes a cada backend síncrono
+DRIVERS_ASYNC = {
+    'mysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+# Pool para trabajo de CPU (bcrypt) fuera del event loop
+executor_cpu = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("ASYNC_CPU_WORKERS", "4")),
+    thread_name_prefix="renace-cpu",
+)
+
+_engine = None
+_sesiones = None
+
+
+def url_async(url_sincrona):
+    """Convierte 'mysql+pymysql://...' en 'mysql+aiomysql://...' (idem sqlite)."""
+    url = make_url(url_sincrona)
+    backend = url.get_backend_name()
+    if backend not in DRIVERS_ASYNC:
+        raise ValueError(f"No hay driver async configurado para '{backend}'")
+    return url.set(drivername=DRIVERS_ASYNC[backend])
+
+
+def init_async(app):
+    """Crea el motor async a partir de la configuración de la app (una vez por proceso)."""
+    global _engine, _sesiones
+    if _engine is not None:
+        return _engine
+    url = make_url(os.environ.get("ASYNC_DATABASE_URI") or url_async(app.config["SQLALCHEMY_DATABASE_URI"]))
+    _engine = create_async_engine(url, **opciones_motor(url))
+    if url.get_backend_name() != 'sqlite' and hasattr(os, 'register_at_fork'):
+        # Igual que db_config.init_motor: un hijo no reutiliza los sockets del padre
+        motor = _engine.sync_engine
+        os.register_at_fork(after_in_child=lambda: motor.dispose(close=False))
+    # expire_on_commit=False: los objetos se siguen leyendo al renderizar la plantilla
+    _sesiones = async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+    return _engine
+
+
+def sesion_async():
+    """Nueva AsyncSession; usar con 'async with sesion_async() as s:'."""
+    if _sesiones is None:
+        raise RuntimeError("init_async(app) no se ha llamado")
+    return _sesiones()
+
+
+async def calentar_pool_async(cantidad=None):
+    """
+    Versión async de db_config.calentar_pool: abre 'cantidad' conexiones a la
+    vez (DB_POOL_CALENTAR) y las devuelve al pool.
+    """
+    cantidad = conexiones_a_calentar() if cantidad is None else cantidad
+    if _engine is None or cantidad <= 0 or _engine.url.get_backend_name() == 'sqlite':
+        return 0
+    conexiones = []
+    try:
+        for _ in range(min(cantidad, _engine.pool.size())):
+            conexion = await _engine.connect()
+            conexiones.append(conexion)
+            await conexion.exec_driver_sql('SELECT 1')
+    except Exception as e:  # el worker arranca igual; el pool conecta cuando haga falta
+        log.warning("No se pudo calentar el pool async: %s", e)
+    finally:
+        for conexion in conexiones:
+            await conexion.close()
+    return len(conexiones)
+
+
+async def en_executor(funcion, *args):
+    """Ejecuta trabajo de CPU (p. ej. bcrypt) en el pool de hilos sin bloquear el loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor_cpu, funcion, *args)
+
+
+async def cerrar_async():
+    global _engine, _sesiones
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _sesiones = None
@@ -0,0 +1,124 @@
+# db_config.py
+# Motor SÍNCRONO de SQLAlchemy configurado por variables de entorno.
+#
+#   DATABASE_URI          URL completa (si no, la predeterminada de app.py)
+#   DB_DRIVER             auto | mysqlclient | pymysql. 'auto' usa mysqlclient
+#                         (en C, decodifica filas mucho más rápido) si está
+#                         instalado y si no pymysql.
+#   DB_POOL_SIZE          conexiones que el pool mantiene abiertas (10)
+#   DB_MAX_OVERFLOW       conexiones extra en picos, se cierran al devolverse (10)
+#   DB_POOL_TIMEOUT       segundos esperando una conexión libre antes de fallar (30)
+#   DB_POOL_RECYCLE       segundos tras los que se reabre una conexión; menor que
+#                         el wait_timeout de MySQL para no usar sockets muertos (280)
+#   DB_POOL_PRE_PING      1/0: prueba la conexión al sacarla del pool (1)
+#   DB_POOL_CALENTAR      conexiones que cada worker abre al arrancar (2)
+#
+# SQLite (entorno de desarrollo) ignora las opciones del pool. El motor async
+# del modo ASGI (db_async.py) usa estas mismas opciones.
+
+import importlib.util
+import logging
+import os
+import threading
+
+from sqlalchemy.engine import make_url
+
+log = logging.getLogger(__name__)
+
+# Nombre en DB_DRIVER -> (drivername de SQLAlchemy, módulo que debe existir)
+DRIVERS_MYSQL = {
+    'mysqlclient': ('mysql+mysqldb', 'MySQLdb'),
+    'pymysql': ('mysql+pymysql', 'pymysql'),
+}
+
+
+def _entero(entorno, nombre, predeterminado):
+    return int(entorno.get(nombre, predeterminado))
+
+
+def driver_instalado(nombre):
+    return importlib.util.find_spec(DRIVERS_MYSQL[nombre][1]) is not None
+
+
+def elegir_driver(entorno=os.environ):
+    """Nombre del driver MySQL según DB_DRIVER ('auto' prefiere el driver en C)."""
+    pedido = entorno.get('DB_DRIVER', 'auto').strip().lower()
+    if pedido == 'auto':
+        return 'mysqlclient' if driver_instalado('mysqlclient') else 'pymysql'
+    if pedido not in DRIVERS_MYSQL:
+        raise ValueError(f"DB_DRIVER desconocido: '{pedido}' (usa auto, {', '.join(DRIVERS_MYSQL)})")
+    return pedido
+
+
+def uri_base_de_datos(predeterminada, entorno=os.environ):
+    """URL de la BD con el driver MySQL elegido (las URLs que no son MySQL pasan igual)."""
+    url = make_url(entorno.get('DATABASE_URI') or predeterminada)
+    if url.get_backend_name() != 'mysql':
+        return url.render_as_string(hide_password=False)
+    drivername = DRIVERS_MYSQL[elegir_driver(entorno)][0]
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def opciones_motor(uri, entorno=os.environ):
+    """SQLALCHEMY_ENGINE_OPTIONS para 'uri'."""
+    if make_url(uri).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'pool_size': _entero(entorno, 'DB_POOL_SIZE', 10),
+        'max_overflow': _entero(entorno, 'DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _entero(entorno, 'DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _entero(entorno, 'DB_POOL_RECYCLE', 280),
+        'pool_pre_ping': entorno.get('DB_POOL_PRE_PING', '1') not in ('0', 'false', 'no'),
+    }
+
+
+def conexiones_a_calentar(entorno=os.environ):
+    """DB_POOL_CALENTAR: conexiones que cada worker abre al arrancar (también el motor async)."""
+    return _entero(entorno, 'DB_POOL_CALENTAR', 2)
+
+
+def calentar_pool(engine, cantidad):
+    """
+    Abre 'cantidad' conexiones (todas a la vez, para que sean distintas) y
+    las devuelve al pool: las primeras peticiones del worker no pagan el
+    handshake con MySQL.
+    """
+    if cantidad <= 0 or engine.url.get_backend_name() == 'sqlite':
+        return 0
+    conexiones = []
+    try:
+        # Más que pool_size no sirve: las de desborde se cierran al devolverse
+        for _ in range(min(cantidad, engine.pool.size())):
+            conexion = engine.connect()
+            conexiones.append(conexion)
+            conexion.exec_driver_sql('SELECT 1')
+    except Exception as e:  # la app arranca igual; el pool conecta cuando haga falta
+        log.warning("No se pudo calentar el pool de conexiones: %s", e)
+    finally:
+        for conexion in conexiones:
+            conexion.close()
+    return len(conexiones)
+
+
+def init_motor(app, db, entorno=os.environ):
+    """
+    Después de db.init_app: calienta el pool en un hilo (no retrasa el
+    arranque) y registra que un proceso hijo creado con fork (workers de
+    gunicorn con --preload, pools de reportes y adjuntos) descarte las
+    conexiones heredadas: un socket de MySQL no se puede compartir entre
+    procesos. Con --preload, el calentamiento por worker se hace llamando a
+    calentar_pool desde el hook post_fork de gunicorn.
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.url.get_backend_name() == 'sqlite':
+        return engine
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+    cantidad = conexiones_a_calentar(entorno)
+    if cantidad > 0:
+        threading.Thread(target=calentar_pool, args=(engine, cantidad),
+                         name='renace-calentar-pool', daemon=True).start()
+    return engine
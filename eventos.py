@@ -0,0 +1,201 @@
+# eventos.py
+# Bitácora append-only de cambios de estado (tabla eventos_estado).
+#
+# Cada transición de SolicitudAyuda.estado o TicketSoporte.estado debe pasar
+# por cambiar_estado(), que modifica el objeto y agrega el evento en la MISMA
+# transacción (el commit lo hace la ruta). Los eventos nunca se actualizan ni
+# se borran: con ellos se puede reconstruir el estado actual o el de cualquier
+# fecha pasada recorriendo la tabla una sola vez. También actualiza los
+# contadores por usuario (contadores.py) y la carga de los agentes de
+# soporte (asignacion.py), todo en la misma transacción.
+
+from datetime import datetime
+
+from sqlalchemy import insert
+
+import asignacion
+import contadores
+from models import db, EventoEstado, EstadoSolicitud, EstadoTicket, SolicitudAyuda, TicketSoporte
+
+# Códigos enteros compactos (NO cambiar los números ya usados: están en la BD)
+ENTIDAD_SOLICITUD = 1
+ENTIDAD_TICKET = 2
+
+ENTIDADES = {
+    'solicitud': ENTIDAD_SOLICITUD,
+    'ticket': ENTIDAD_TICKET,
+}
+
+# 0 se reserva para "eliminado"
+ESTADO_ELIMINADO = 0
+
+CODIGOS_ESTADO = {
+    ENTIDAD_SOLICITUD: {
+        EstadoSolicitud.PENDIENTE: 1,
+        EstadoSolicitud.EN_PROCESO: 2,
+        EstadoSolicitud.RESUELTO: 3,
+    },
+    ENTIDAD_TICKET: {
+        EstadoTicket.ABIERTO: 1,
+        EstadoTicket.EN_PROCESO: 2,
+        EstadoTicket.CERRADO: 3,
+    },
+}
+
+ESTADOS_POR_CODIGO = {
+    entidad: {codigo: estado for estado, codigo in codigos.items()}
+    for entidad, codigos in CODIGOS_ESTADO.items()
+}
+
+
+def _entidad_de(obj):
+    if isinstance(obj, SolicitudAyuda):
+        return ENTIDAD_SOLICITUD, obj.id_solicitud
+    if isinstance(obj, TicketSoporte):
+        return ENTIDAD_TICKET, obj.id_ticket
+    raise TypeError(f"No se registran eventos para {type(obj).__name__}")
+
+
+def _codigo(entidad, estado):
+    if estado is None:
+        return None
+    return CODIGOS_ESTADO[entidad][estado]
+
+
+def decodificar_estado(entidad, codigo):
+    """Convierte un código entero de la bitácora al ENUM (None si fue eliminado)."""
+    if codigo is None or codigo == ESTADO_ELIMINADO:
+        return None
+    return ESTADOS_POR_CODIGO[entidad][codigo]
+
+
+def _agregar_evento(obj, entidad, id_entidad, anterior, nuevo, usuario):
+    db.session.add(EventoEstado(
+        entidad=entidad,
+        id_entidad=id_entidad,
+        estado_anterior=anterior,
+        estado_nuevo=nuevo,
+        id_usuario=usuario.id_usuario if usuario is not None else None,
+        id_propietario=obj.id_usuario,
+    ))
+
+
+def registrar_creacion(obj, usuario=None):
+    """Registra el estado inicial de una solicitud o ticket recién creado."""
+    if obj.estado is None:
+        raise ValueError("El objeto debe tener estado antes de registrar su creación")
+    # Necesitamos el id autogenerado antes de escribir el evento
+    db.session.flush()
+    entidad, id_entidad = _entidad_de(obj)
+    _agregar_evento(obj, entidad, id_entidad, None, _codigo(entidad, obj.estado), usuario)
+    contadores.registrar_transicion(obj, None, obj.estado)
+
+
+def cambiar_estado(obj, nuevo_estado, usuario=None):
+    """
+    Cambia el estado del objeto y registra el evento. Si el estado no cambia
+    no se escribe nada. Devuelve True si hubo transición.
+    """
+    anterior = obj.estado
+    if anterior == nuevo_estado:
+        return False
+    entidad, id_entidad = _entidad_de(obj)
+    obj.estado = nuevo_estado
+    _agregar_evento(obj, entidad, id_entidad, _codigo(entidad, anterior), _codigo(entidad, nuevo_estado), usuario)
+    contadores.registrar_transicion(obj, anterior, nuevo_estado)
+    if entidad == ENTIDAD_TICKET:
+        asignacion.registrar_transicion(obj, anterior, nuevo_estado)
+    return True
+
+
+def registrar_transiciones(entidad, filas, nuevo_estado, usuario=None):
+    """
+    Versión por lotes de cambiar_estado() para las acciones masivas: el UPDATE
+    de la tabla lo hace quien llama. 'filas' trae (id, id_usuario, estado
+    anterior[, id_asignado_a]) de cada fila ya actualizada. Un solo INSERT
+    multi-fila para la bitácora.
+    """
+    if not filas:
+        return
+    fecha = datetime.utcnow()
+    id_usuario = usuario.id_usuario if usuario is not None else None
+    db.session.execute(insert(EventoEstado), [
+        {
+            'entidad': entidad,
+            'id_entidad': fila[0],
+            'estado_anterior': _codigo(entidad, fila[2]),
+            'estado_nuevo': _codigo(entidad, nuevo_estado),
+            'id_usuario': id_usuario,
+            'id_propietario': fila[1],
+            'fecha': fecha,
+        }
+        for fila in filas
+    ])
+    contadores.registrar_transiciones([(fila[1], fila[2]) for fila in filas], nuevo_estado)
+    if entidad == ENTIDAD_TICKET:
+        asignacion.registrar_transiciones([(fila[3], fila[2]) for fila in filas], nuevo_estado)
+
+
+def registrar_eliminacion(obj, usuario=None):
+    """Registra que la entidad fue eliminada (llamar antes de db.session.delete)."""
+    entidad, id_entidad = _entidad_de(obj)
+    _agregar_evento(obj, entidad, id_entidad, _codigo(entidad, obj.estado), ESTADO_ELIMINADO, usuario)
+    contadores.registrar_transicion(obj, obj.estado, None)
+    if entidad == ENTIDAD_TICKET:
+        asignacion.registrar_transicion(obj, obj.estado, None)
+
+
+def historial(entidad, id_entidad):
+    """Eventos de una entidad en orden cronológico (usa el índice entidad/id/fecha)."""
+    return (
+        EventoEstado.query
+        .filter_by(entidad=entidad, id_entidad=id_entidad)
+        .order_by(EventoEstado.fecha, EventoEstado.id_evento)
+        .all()
+    )
+
+
+def reproducir(entidad, hasta=None, tamano_lote=5000):
+    """
+    Reconstruye {id_entidad: estado} a partir de la bitácora en una sola
+    pasada en streaming. Si se indica 'hasta' (datetime), devuelve la foto
+    del estado en ese momento. Las entidades eliminadas no aparecen.
+    """
+    consulta = (
+        db.session.query(EventoEstado.id_entidad, EventoEstado.estado_nuevo)
+        .filter(EventoEstado.entidad == entidad)
+    )
+    if hasta is not None:
+        consulta = consulta.filter(EventoEstado.fecha <= hasta)
+    consulta = consulta.order_by(EventoEstado.fecha, EventoEstado.id_evento).yield_per(tamano_lote)
+
+    estados = {}
+    for id_entidad, codigo in consulta:
+        if codigo == ESTADO_ELIMINADO:
+            estados.pop(id_entidad, None)
+        else:
+            estados[id_entidad] = codigo
+
+    return {id_entidad: decodificar_estado(entidad, codigo) for id_entidad, codigo in estados.items()}
+
+
+def diferencias_con_tablas(entidad):
+    """
+    Compara el estado reconstruido desde la bitácora con el guardado en la
+    tabla. Devuelve una lista de (id, estado_bitacora, estado_tabla).
+    """
+    modelo, pk = (
+        (SolicitudAyuda, SolicitudAyuda.id_solicitud) if entidad == ENTIDAD_SOLICITUD
+        else (TicketSoporte, TicketSoporte.id_ticket)
+    )
+    reconstruido = reproducir(entidad)
+    diferencias = []
+    vistos = set()
+    for id_entidad, estado in db.session.query(pk, modelo.estado).yield_per(5000):
+        vistos.add(id_entidad)
+        if reconstruido.get(id_entidad) != estado:
+            diferencias.append((id_entidad, reconstruido.get(id_entidad), estado))
+    for id_entidad, estado in reconstruido.items():
+        if id_entidad not in vistos:
+            diferencias.append((id_entidad, estado, None))
+    return diferencias
@@ -0,0 +1,161 @@
+# filtros.py
+# Filtros y orden del dashboard de solicitudes compilados a UNA sola consulta SQL.
+#
+# Los parámetros llegan por query string (request.args). Solo se aceptan los
+# valores conocidos: el ORDER BY sale de una lista blanca, nunca del texto
+# enviado por el usuario.
+#
+# Paginación por clave (keyset), no por OFFSET: '?despues=<cursor>' pide las
+# filas que siguen a la última fila mostrada y '?antes=<cursor>' las que
+# preceden a la primera. El cursor es 'valor,id' de esa fila (solo 'id' en
+# 'recientes'), así que cualquier página cuesta lo mismo que la primera.
+# Cada orden (con o sin filtro de estado/prioridad/tipo) tiene un índice que
+# lo recorre ya ordenado (ver SolicitudAyuda.__table_args__).
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, tuple_
+
+from models import SolicitudAyuda, Usuario, EstadoSolicitud
+
+POR_PAGINA = 50
+
+# Clave del parámetro 'orden' -> columna. Cada orden termina con id_solicitud
+# como desempate para que la paginación sea estable. Solo columnas con índice
+# (ordenar 1M de filas sin índice es un filesort) y NOT NULL (un cursor sobre
+# NULL obliga a un 'OR ... IS NULL' que no usa el índice). El id crece con
+# la fecha de creación: 'recientes' es el orden por fecha_creacion.
+ORDENES_SOLICITUD = {
+    'recientes': SolicitudAyuda.id_solicitud,
+    'fecha_desastre': SolicitudAyuda.fecha_desastre,
+}
+
+PRIORIDADES = ['Alta', 'Media', 'Baja']
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def leer_cursor(texto, orden):
+    """'valor,id' (o 'id' en 'recientes') -> (valor, id); None si no es válido para 'orden'."""
+    if not texto:
+        return None
+    columna = ORDENES_SOLICITUD[orden]
+    valor, _, id_texto = texto.rpartition(',')
+    try:
+        id_cursor = int(id_texto)
+        if columna is SolicitudAyuda.id_solicitud:
+            return None if valor else (id_cursor, id_cursor)
+        return columna.type.python_type.fromisoformat(valor), id_cursor
+    except ValueError:
+        return None
+
+
+def cursor_de(filtros, valor, id_solicitud):
+    """Texto del cursor de una fila ('valor' es su columna de orden)."""
+    if filtros['orden'] == 'recientes':
+        return str(id_solicitud)
+    return f"{valor.isoformat()},{id_solicitud}"
+
+
+def leer_filtros(args):
+    """Normaliza los parámetros del dashboard; los valores inválidos se ignoran."""
+    estado = args.get('estado')
+    orden = args.get('orden', 'recientes')
+    orden = orden if orden in ORDENES_SOLICITUD else 'recientes'
+    direccion = args.get('dir', 'desc')
+    despues = leer_cursor(args.get('despues'), orden)
+    antes = leer_cursor(args.get('antes'), orden) if despues is None else None
+
+    return {
+        'estado': estado if estado in EstadoSolicitud.__members__ else None,
+        'prioridad': args.get('prioridad') if args.get('prioridad') in PRIORIDADES else None,
+        'tipo_desastre': (args.get('tipo_desastre') or '').strip() or None,
+        'municipio': (args.get('municipio') or '').strip() or None,
+        'fecha_desastre_desde': _fecha(args.get('fecha_desastre_desde')),
+        'fecha_desastre_hasta': _fecha(args.get('fecha_desastre_hasta')),
+        'fecha_creacion_desde': _fecha(args.get('fecha_creacion_desde')),
+        'fecha_creacion_hasta': _fecha(args.get('fecha_creacion_hasta')),
+        'orden': orden,
+        'dir': 'asc' if direccion == 'asc' else 'desc',
+        'despues': despues,
+        'antes': antes,
+    }
+
+
+def consulta_solicitudes(filtros, id_usuario=None):
+    """
+    Devuelve la sentencia SELECT (sin ejecutar) de solicitudes con el nombre
+    del creador en la misma fila, ya filtrada y ordenada. Si 'id_usuario'
+    viene, se limita a las solicitudes de ese usuario. Sirve tanto para la
+    sesión síncrona como para la async (asgi.py).
+    """
+    consulta = (
+        select(SolicitudAyuda, Usuario.nombre, Usuario.apellido)
+        .outerjoin(Usuario, Usuario.id_usuario == SolicitudAyuda.id_usuario)
+    )
+
+    if id_usuario is not None:
+        consulta = consulta.where(SolicitudAyuda.id_usuario == id_usuario)
+    if filtros['estado']:
+        consulta = consulta.where(SolicitudAyuda.estado == EstadoSolicitud[filtros['estado']])
+    if filtros['prioridad']:
+        consulta = consulta.where(SolicitudAyuda.prioridad == filtros['prioridad'])
+    if filtros['tipo_desastre']:
+        consulta = consulta.where(SolicitudAyuda.tipo_desastre == filtros['tipo_desastre'])
+    if filtros['municipio']:
+        consulta = consulta.where(Usuario.municipio == filtros['municipio'])
+    if filtros['fecha_desastre_desde']:
+        consulta = consulta.where(SolicitudAyuda.fecha_desastre >= filtros['fecha_desastre_desde'].date())
+    if filtros['fecha_desastre_hasta']:
+        consulta = consulta.where(SolicitudAyuda.fecha_desastre <= filtros['fecha_desastre_hasta'].date())
+    if filtros['fecha_creacion_desde']:
+        consulta = consulta.where(SolicitudAyuda.fecha_creacion >= filtros['fecha_creacion_desde'])
+    if filtros['fecha_creacion_hasta']:
+        # Incluye todo el día indicado
+        consulta = consulta.where(SolicitudAyuda.fecha_creacion < filtros['fecha_creacion_hasta'] + timedelta(days=1))
+
+    columna = ORDENES_SOLICITUD[filtros['orden']]
+    if filtros['dir'] == 'asc':
+        consulta = consulta.order_by(columna.asc(), SolicitudAyuda.id_solicitud.asc())
+    else:
+        consulta = consulta.order_by(columna.desc(), SolicitudAyuda.id_solicitud.desc())
+    return consulta
+
+
+def _posteriores(columna, cursor, descendente):
+    """Filas que van después de 'cursor' en el orden (columna, id_solicitud)."""
+    valor, id_cursor = cursor
+    pk = SolicitudAyuda.id_solicitud
+    if columna is pk:
+        return pk < id_cursor if descendente else pk > id_cursor
+    if descendente:
+        return tuple_(columna, pk) < tuple_(valor, id_cursor)
+    return tuple_(columna, pk) > tuple_(valor, id_cursor)
+
+
+def consulta_pagina(filtros, id_usuario=None, por_pagina=POR_PAGINA):
+    """
+    SELECT de la página pedida. Se trae una fila de más para saber si hay
+    otra página sin hacer un COUNT(*) sobre toda la tabla. Con 'antes' la
+    consulta recorre el orden al revés (de la fila del cursor hacia atrás):
+    quien la ejecuta invierte las filas (FilasPerezosas(..., invertir=True)).
+    """
+    consulta = consulta_solicitudes(filtros, id_usuario)
+    columna = ORDENES_SOLICITUD[filtros['orden']]
+    descendente = filtros['dir'] == 'desc'
+    if filtros['despues']:
+        consulta = consulta.where(_posteriores(columna, filtros['despues'], descendente))
+    elif filtros['antes']:
+        consulta = consulta.where(_posteriores(columna, filtros['antes'], not descendente))
+        if descendente:
+            consulta = consulta.order_by(None).order_by(columna.asc(), SolicitudAyuda.id_solicitud.asc())
+        else:
+            consulta = consulta.order_by(None).order_by(columna.desc(), SolicitudAyuda.id_solicitud.desc())
+    return consulta.limit(por_pagina + 1)
@@ -1,7 +1,12 @@
+from datetime import datetime
+
 from flask_wtf import FlaskForm
 from wtforms import TextAreaField, SubmitField
 from wtforms.validators import DataRequired, Length
 
+from filtros import PRIORIDADES
+from models import SolicitudAyuda, TicketSoporte
+
 # Formulario usado para responder tickets
 class ResponderForm(FlaskForm):
     # El campo 'mensaje' debe coincidir con el usado en ver_ticket.html
@@ -9,4 +14,136 @@ class ResponderForm(FlaskForm):
         DataRequired(message="El mensaje no puede estar vacío."),
         Length(min=5, max=500, message="El mensaje debe tener entre 5 y 500 caracteres.")
     ])
-    submit = SubmitField('Enviar Respuesta')
\ No newline at end of file
+    submit = SubmitField('Enviar Respuesta')
+
+
+def normalizar_prioridad(valor):
+    """' alta' / 'MEDIA' -> 'Alta' / 'Media'; lo irreconocible se deja igual.
+    Es la misma regla que el relleno 'normalizar_prioridad' (migracion_online.py)."""
+    if valor is None:
+        return None
+    limpio = str(valor).strip().lower()
+    for prioridad in PRIORIDADES:
+        if prioridad.lower() == limpio:
+            return prioridad
+    return valor
+
+
+# Límite de una columna Text (TEXT de MySQL), en bytes
+LARGO_MAXIMO_TEXTO = 65535
+
+
+class CampoInvalido(ValueError):
+    """Un campo no es texto o no cabe en su columna."""
+
+
+def leer_texto(datos, campo, columna=None):
+    """
+    Valor de 'campo' sin espacios a los lados ('' si falta). Los clientes JSON
+    pueden mandar números, listas u objetos: si no es texto, o no cabe en
+    'columna' (String(n) o Text), lanza CampoInvalido.
+    """
+    valor = datos.get(campo)
+    if valor is None:
+        return ''
+    if not isinstance(valor, str):
+        raise CampoInvalido(f"El campo '{campo}' debe ser texto.")
+    valor = valor.strip()
+    if columna is not None:
+        largo = columna.type.length
+        if largo is not None and len(valor) > largo:
+            raise CampoInvalido(f"El campo '{campo}' admite como máximo {largo} caracteres.")
+        if largo is None and len(valor.encode('utf-8')) > LARGO_MAXIMO_TEXTO:
+            raise CampoInvalido(f"El campo '{campo}' es demasiado largo.")
+    return valor
+
+
+# Reglas de validación de una nueva solicitud. Las usan el formulario HTML
+# (nueva_solicitud en app.py) y la API de sincronización (sincronizacion.py),
+# así ambos caminos aceptan y rechazan exactamente lo mismo.
+def validar_solicitud(datos):
+    """
+    'datos' es request.form o un dict con los mismos nombres de campo.
+    Devuelve (campos, None) con los kwargs para SolicitudAyuda, o (None, mensaje).
+    """
+    try:
+        tipo_desastre = leer_texto(datos, "tipo_desastre", SolicitudAyuda.tipo_desastre)
+        fecha_desastre_str = leer_texto(datos, "fecha_desastre")
+        direccion_afectada = leer_texto(datos, "direccion_afectada", SolicitudAyuda.ubicacion)
+        prioridad = leer_texto(datos, "prioridad", SolicitudAyuda.prioridad)
+        descripcion_danos = leer_texto(datos, "descripcion_danos", SolicitudAyuda.descripcion)
+    except CampoInvalido as e:
+        return None, str(e)
+    personas_afectadas_str = datos.get("personas_afectadas")
+    if isinstance(personas_afectadas_str, int) and not isinstance(personas_afectadas_str, bool):
+        personas_afectadas_str = str(personas_afectadas_str)
+    elif personas_afectadas_str is not None and not isinstance(personas_afectadas_str, str):
+        return None, "El campo 'personas_afectadas' debe ser un número entero."
+
+    # Validación de campos obligatorios
+    if not tipo_desastre or not fecha_desastre_str or not direccion_afectada or not descripcion_danos:
+        return None, "Por favor completa los campos obligatorios marcados (*)."
+
+    try:
+        # Conversión de fecha
+        fecha_desastre_obj = datetime.strptime(fecha_desastre_str, '%Y-%m-%d').date()
+
+        # Conversión de enteros
+        personas_afectadas_str = personas_afectadas_str.strip() if personas_afectadas_str is not None else None
+        personas_afectadas = int(personas_afectadas_str) if personas_afectadas_str and personas_afectadas_str.isdigit() else None
+
+    except ValueError:
+        return None, ("Error en el formato de la fecha o el número de personas. "
+                      "Asegúrate de que las personas afectadas sea un número entero.")
+
+    # Nombres del formulario -> columnas de SolicitudAyuda
+    return {
+        "descripcion": descripcion_danos,
+        "ubicacion": direccion_afectada,
+        "tipo_desastre": tipo_desastre,
+        "fecha_desastre": fecha_desastre_obj,
+        "personas_afectadas": personas_afectadas,
+        "prioridad": normalizar_prioridad(prioridad) if prioridad else None,
+    }, None
+
+
+def leer_id(datos, campo):
+    """Id opcional: número JSON o texto con dígitos; None si falta. CampoInvalido si es otra cosa."""
+    valor = datos.get(campo)
+    if isinstance(valor, str):
+        valor = valor.strip()
+        if not valor:
+            return None
+        if not valor.isdigit():
+            raise CampoInvalido(f"El campo '{campo}' debe ser un número entero.")
+        return int(valor)
+    if valor is None or (isinstance(valor, int) and not isinstance(valor, bool)):
+        return valor
+    raise CampoInvalido(f"El campo '{campo}' debe ser un número entero.")
+
+
+# Igual que validar_solicitud, para un ticket nuevo: lo usan crear_ticket
+# (app.py) y la API de sincronización.
+def validar_ticket(datos, id_usuario):
+    """
+    Devuelve (campos, None) con los kwargs para TicketSoporte, o (None, mensaje).
+    'id_solicitud' es opcional y debe ser una solicitud del mismo usuario: su
+    tipo de desastre elige un agente especialista (asignacion.py).
+    """
+    try:
+        asunto = leer_texto(datos, 'asunto', TicketSoporte.asunto)
+        descripcion = leer_texto(datos, 'descripcion', TicketSoporte.descripcion)
+        id_solicitud = leer_id(datos, 'id_solicitud')
+    except CampoInvalido as e:
+        return None, str(e)
+    if not asunto or not descripcion:
+        return None, "El ticket necesita asunto y descripción."
+
+    campos = {'asunto': asunto, 'descripcion': descripcion}
+    if id_solicitud is not None:
+        solicitud = SolicitudAyuda.query.filter_by(id_solicitud=id_solicitud, id_usuario=id_usuario).first()
+        if solicitud is None:
+            return None, f"La solicitud #{id_solicitud} no existe o no es tuya."
+        # La relación (no solo el id): asignar_ticket la lee antes del flush
+        campos['solicitud_origen'] = solicitud
+    return campos, None
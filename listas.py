@@ -0,0 +1,203 @@
+# listas.py
+# Páginas de listas (dashboard, mis_tickets, mi_cola) enviadas en streaming.
+#
+# En vez de armar la lista completa de dicts y renderizar la plantilla de una
+# vez, la vista entrega un FilasPerezosas sobre un cursor del servidor
+# (yield_per) y la plantilla se envía por partes: el navegador recibe la
+# cabecera y las primeras filas mientras el resto se sigue leyendo, y el
+# worker solo tiene en memoria un lote de filas a la vez.
+#
+# Flask termina el request (teardown: se cierra la sesión de SQLAlchemy)
+# ANTES de generar el cuerpo y vuelve a abrir el contexto mientras lo
+# genera. Por eso la consulta se pasa como función y se ejecuta recién
+# cuando la plantilla pide la primera fila, con la sesión de ese contexto.
+#
+# Las vistas async de asgi.py hacen lo mismo con FilasPerezosasAsync (un
+# AsyncResult de AsyncSession.stream) y render_lista_async, que renderiza la
+# plantilla con un entorno de Jinja en modo async: cada lote del cursor se
+# espera sin bloquear el event loop y asgi.RenaceASGI envía los bloques a
+# medida que salen.
+
+from itertools import chain, islice
+
+from flask import get_flashed_messages, stream_template
+
+# Filas que el driver trae del cursor por cada viaje a la BD
+FILAS_POR_LOTE = 200
+
+# Bytes de HTML que se juntan antes de escribir al socket (Jinja genera
+# pedazos muy pequeños; uno por etiqueta)
+TAMANO_BLOQUE = 8192
+
+_SIN_LEER = object()
+
+
+class FilasPerezosas:
+    """
+    Iterable de un solo recorrido que convierte cada fila con 'convertir'
+    recién cuando la plantilla la pide. 'filas' es un iterable o una función
+    sin argumentos que lo devuelve (se llama en el primer acceso). bool()
+    solo lee la primera fila, así '{% if filas %}' funciona igual que con una
+    lista. Si se indica 'limite', se entregan a lo sumo 'limite' filas y
+    'hay_siguiente' indica (al terminar el recorrido) si el cursor traía
+    alguna más. Con 'invertir' (páginas pedidas con '?antes=', que la
+    consulta recorre al revés) se leen las 'limite' + 1 filas de una vez y se
+    entregan en orden inverso; 'hay_siguiente' indica entonces si hay más
+    filas antes de la primera.
+    """
+
+    def __init__(self, filas, convertir, limite=None, invertir=False):
+        if invertir and limite is None:
+            raise ValueError("invertir necesita un limite")
+        self._leer = filas if callable(filas) else (lambda: filas)
+        self._fuente = None
+        self._filas = None
+        self._convertir = convertir
+        self._limite = limite
+        self._invertir = invertir
+        self._primera = _SIN_LEER
+        self.hay_siguiente = False
+
+    def _asomar(self):
+        if self._primera is _SIN_LEER:
+            self._fuente = self._leer()
+            self._filas = iter(self._fuente)
+            if self._invertir:
+                filas = list(islice(self._filas, self._limite + 1))
+                self.hay_siguiente = len(filas) > self._limite
+                self._filas = reversed(filas[:self._limite])
+            self._primera = next(self._filas, None)
+        return self._primera
+
+    def __bool__(self):
+        return self._asomar() is not None
+
+    def __iter__(self):
+        primera = self._asomar()
+        if primera is None:
+            return
+        try:
+            for indice, fila in enumerate(chain([primera], self._filas)):
+                if self._limite is not None and indice >= self._limite:
+                    self.hay_siguiente = True
+                    break
+                yield self._convertir(fila)
+        finally:
+            # Libera el cursor del servidor aunque queden filas sin leer
+            cerrar = getattr(self._fuente, 'close', None)
+            if cerrar is not None:
+                cerrar()
+
+
+class FilasPerezosasAsync(FilasPerezosas):
+    """
+    FilasPerezosas para las vistas async: 'filas' es una función sin
+    argumentos que devuelve el awaitable del resultado (p. ej.
+    lambda: sesion.stream(consulta)). La vista llama 'await asomar()' antes
+    de renderizar, para que '{% if filas %}' no tenga que esperar, y la
+    plantilla (en modo async) la recorre con 'async for'.
+    """
+
+    async def asomar(self):
+        if self._primera is _SIN_LEER:
+            self._fuente = await self._leer()
+            self._filas = aiter(self._fuente)
+            if self._invertir:
+                filas = await self._fuente.fetchmany(self._limite + 1)
+                self.hay_siguiente = len(filas) > self._limite
+                self._filas = _async_de(reversed(filas[:self._limite]))
+            self._primera = await anext(self._filas, None)
+        return self._primera
+
+    def _asomar(self):
+        if self._primera is _SIN_LEER:
+            raise RuntimeError("FilasPerezosasAsync: falta 'await asomar()' antes de renderizar")
+        return self._primera
+
+    def __iter__(self):
+        raise TypeError("FilasPerezosasAsync se recorre con 'async for'")
+
+    def __aiter__(self):
+        return self._recorrer()
+
+    async def _recorrer(self):
+        primera = self._asomar()
+        if primera is None:
+            return
+        try:
+            indice, fila = 0, primera
+            while fila is not None:
+                if self._limite is not None and indice >= self._limite:
+                    self.hay_siguiente = True
+                    break
+                yield self._convertir(fila)
+                indice += 1
+                fila = await anext(self._filas, None)
+        finally:
+            # Libera el cursor del servidor aunque queden filas sin leer
+            await self._fuente.close()
+
+
+async def _async_de(filas):
+    for fila in filas:
+        yield fila
+
+
+def _en_bloques(partes, tamano=TAMANO_BLOQUE):
+    bloque, largo = [], 0
+    for parte in partes:
+        bloque.append(parte)
+        largo += len(parte)
+        if largo >= tamano:
+            yield ''.join(bloque)
+            bloque, largo = [], 0
+    if bloque:
+        yield ''.join(bloque)
+
+
+def render_lista(app, plantilla, **contexto):
+    """
+    Respuesta HTML en streaming de 'plantilla'. Los mensajes flash se leen
+    antes de empezar: las cabeceras (y la cookie de sesión) salen con el
+    primer bloque, así que lo que se cambie en la sesión durante el render ya
+    no se guardaría. base.html vuelve a pedir los mismos mensajes y los
+    recibe del request.
+    """
+    get_flashed_messages(with_categories=True)
+    return app.response_class(_en_bloques(stream_template(plantilla, **contexto)), mimetype='text/html')
+
+
+async def _en_bloques_async(partes, tamano=TAMANO_BLOQUE):
+    bloque, largo = [], 0
+    async for parte in partes:
+        bloque.append(parte)
+        largo += len(parte)
+        if largo >= tamano:
+            yield ''.join(bloque)
+            bloque, largo = [], 0
+    if bloque:
+        yield ''.join(bloque)
+
+
+def entorno_async(app):
+    """
+    Entorno de Jinja en modo async con el mismo loader, filtros y globales
+    que app.jinja_env. Tiene su propio caché: las plantillas se compilan
+    distinto en modo async.
+    """
+    entorno = app.extensions.get('jinja_async')
+    if entorno is None:
+        entorno = app.extensions['jinja_async'] = app.jinja_env.overlay(enable_async=True, cache_size=400)
+    return entorno
+
+
+def render_lista_async(app, plantilla, **contexto):
+    """
+    Como render_lista() pero para las vistas async: el cuerpo de la respuesta
+    es un generador async que asgi.RenaceASGI envía por bloques. Las
+    FilasPerezosasAsync del contexto ya deben estar asomadas.
+    """
+    get_flashed_messages(with_categories=True)
+    app.update_template_context(contexto)
+    partes = entorno_async(app).get_template(plantilla).generate_async(**contexto)
+    return app.response_class(_en_bloques_async(partes), mimetype='text/html')
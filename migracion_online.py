@@ -0,0 +1,190 @@
+# migracion_online.py
+# Cambios de esquema y rellenos de datos sin bloquear tablas grandes.
+#
+# Un batch_alter_table que cambia el tipo de una columna (p. ej. 'estado' de
+# VARCHAR a ENUM en 0188e5a3e6bb) copia o bloquea toda la tabla. Para
+# tickets_soporte y solicitudes_ayuda se usa en su lugar el patrón
+# expandir / rellenar / contraer, en tres pasos separados:
+#
+#   1. Migración que solo AGREGA: columna nullable o índice, con
+#      agregar_columna / crear_indice (migrations/ddl_online.py). En MySQL
+#      piden ALGORITHM/LOCK=NONE explícitos para que el motor falle en vez de
+#      copiar la tabla en silencio. El código de la app ya escribe la columna
+#      nueva en las filas nuevas.
+#   2. 'flask rellenos-ejecutar NOMBRE': UPDATE por rangos de clave primaria,
+#      un commit por lote y una pausa entre lotes. El avance se guarda en
+#      progreso_rellenos, así que se puede cortar (Ctrl+C) y retomar.
+#   3. Migración que contrae: restringir_no_nulo (se niega si quedan NULL, es
+#      decir, si el relleno no terminó) e intercambiar_columnas.
+#
+# Los rellenos se registran al final de este archivo con registrar_relleno.
+# Los helpers de DDL viven aparte, en migrations/ddl_online.py, porque las
+# migraciones no deben importar la app: una migración vieja tiene que seguir
+# funcionando igual aunque cambien models.py o filtros.py.
+
+import time
+from datetime import datetime
+
+from sqlalchemy import LargeBinary, and_, case, cast, func, select, update
+
+from filtros import PRIORIDADES
+from eventos import ENTIDAD_SOLICITUD, ENTIDAD_TICKET
+from models import db, ClaveIdempotencia, EventoEstado, SolicitudAyuda, TicketSoporte, ProgresoRelleno
+
+TAMANO_LOTE = 1000
+PAUSA_SEGUNDOS = 0.1
+
+
+# ----------------------------------------------------------------------
+# Rellenos de datos por lotes (fuera de Alembic, desde la CLI)
+# ----------------------------------------------------------------------
+
+class RellenoDesconocido(Exception):
+    """No hay un relleno registrado con ese nombre."""
+
+
+class Relleno:
+    """
+    UPDATE de 'valores' sobre 'tabla' recorrida por rangos de su clave
+    primaria (entera). 'pendiente' limita cada lote a las filas que todavía
+    falta procesar, así repetir un lote no cambia nada.
+    """
+
+    def __init__(self, nombre, tabla, valores, pendiente=None, descripcion=''):
+        columnas_pk = list(tabla.primary_key.columns)
+        if len(columnas_pk) != 1:
+            raise ValueError(f"El relleno '{nombre}' necesita una clave primaria de una sola columna")
+        self.nombre = nombre
+        self.tabla = tabla
+        self.pk = columnas_pk[0]
+        self.valores = valores
+        self.pendiente = pendiente
+        self.descripcion = descripcion
+
+    def sentencia(self, desde, hasta):
+        sentencia = update(self.tabla).where(self.pk >= desde, self.pk < hasta).values(self.valores)
+        if self.pendiente is not None:
+            sentencia = sentencia.where(self.pendiente)
+        return sentencia
+
+    def limites(self):
+        return db.session.execute(select(func.min(self.pk), func.max(self.pk))).one()
+
+
+RELLENOS = {}
+
+
+def registrar_relleno(nombre, tabla, valores, pendiente=None, descripcion=''):
+    RELLENOS[nombre] = Relleno(nombre, tabla, valores, pendiente, descripcion)
+    return RELLENOS[nombre]
+
+
+def progreso_relleno(nombre):
+    return db.session.get(ProgresoRelleno, nombre)
+
+
+def ejecutar_relleno(nombre, tamano_lote=TAMANO_LOTE, pausa=PAUSA_SEGUNDOS, reiniciar=False, informar=None):
+    """
+    Aplica el relleno 'nombre' desde donde quedó la última vez. Cada lote es
+    un UPDATE sobre un rango [desde, desde + tamano_lote) de la clave primaria
+    seguido de commit; entre lotes duerme 'pausa' segundos para no saturar la
+    base ni la replicación. 'informar(progreso, maximo)' se llama tras cada lote.
+    El máximo se relee en cada vuelta para alcanzar también las filas
+    insertadas durante el relleno.
+    """
+    relleno = RELLENOS.get(nombre)
+    if relleno is None:
+        raise RellenoDesconocido(f"No existe el relleno '{nombre}'")
+
+    progreso = progreso_relleno(nombre)
+    if progreso is None:
+        progreso = ProgresoRelleno(nombre=nombre, ultimo_id=0, filas=0, terminado=False)
+        db.session.add(progreso)
+    elif reiniciar:
+        progreso.ultimo_id, progreso.filas, progreso.terminado = 0, 0, False
+        progreso.fecha_inicio = datetime.utcnow()
+    elif progreso.terminado:
+        return progreso
+    db.session.commit()
+
+    minimo, maximo = relleno.limites()
+    desde = max(progreso.ultimo_id + 1, minimo or 0)
+    while maximo is not None and desde <= maximo:
+        hasta = desde + tamano_lote
+        resultado = db.session.execute(relleno.sentencia(desde, hasta))
+        progreso.ultimo_id = hasta - 1
+        progreso.filas += max(resultado.rowcount, 0)
+        progreso.fecha_actualizacion = datetime.utcnow()
+        db.session.commit()
+        if informar:
+            informar(progreso, maximo)
+        desde = hasta
+        maximo = relleno.limites()[1]
+        if pausa and desde <= maximo:
+            time.sleep(pausa)
+
+    progreso.terminado = True
+    progreso.fecha_actualizacion = datetime.utcnow()
+    db.session.commit()
+    return progreso
+
+
+# ----------------------------------------------------------------------
+# Rellenos registrados
+# ----------------------------------------------------------------------
+
+# 'prioridad' llega como texto libre desde la app de campo: ' alta', 'MEDIA'...
+# Se lleva a los valores de PRIORIDADES; lo irreconocible se deja como está.
+# Como cualquier edición, sube 'version' (de ella dependen los ETag de la API
+# y la marca de agua de los reportes), así que solo se tocan las filas cuyo
+# valor cambia de verdad. La comparación es binaria: con la collation por
+# defecto de MySQL 'alta' = 'Alta' y la fila se saltaría.
+_prioridad_normalizada = case(
+    {prioridad.lower(): prioridad for prioridad in PRIORIDADES},
+    value=func.lower(func.trim(SolicitudAyuda.prioridad)),
+    else_=SolicitudAyuda.prioridad,
+)
+registrar_relleno(
+    'normalizar_prioridad',
+    SolicitudAyuda.__table__,
+    valores={'prioridad': _prioridad_normalizada, 'version': SolicitudAyuda.version + 1},
+    pendiente=and_(
+        SolicitudAyuda.prioridad.isnot(None),
+        cast(SolicitudAyuda.prioridad, LargeBinary) != cast(_prioridad_normalizada, LargeBinary),
+    ),
+    descripcion="Normaliza solicitudes_ayuda.prioridad a Alta / Media / Baja",
+)
+
+# Dueño de la entidad en los eventos escritos antes de la columna
+# eventos_estado.id_propietario (490b53f7941b). Si la solicitud o el ticket ya
+# se borró se busca en las claves de idempotencia (los creados por la
+# sincronización); si tampoco está ahí, el evento queda en NULL.
+_propietario_solicitud = (
+    select(SolicitudAyuda.id_usuario)
+    .where(SolicitudAyuda.id_solicitud == EventoEstado.id_entidad)
+    .scalar_subquery()
+)
+_propietario_ticket = (
+    select(TicketSoporte.id_usuario)
+    .where(TicketSoporte.id_ticket == EventoEstado.id_entidad)
+    .scalar_subquery()
+)
+_propietario_por_clave = (
+    select(func.min(ClaveIdempotencia.id_usuario))
+    .where(ClaveIdempotencia.entidad == EventoEstado.entidad,
+           ClaveIdempotencia.id_entidad == EventoEstado.id_entidad)
+    .scalar_subquery()
+)
+registrar_relleno(
+    'propietario_eventos',
+    EventoEstado.__table__,
+    valores={'id_propietario': func.coalesce(
+        case(
+            (EventoEstado.entidad == ENTIDAD_SOLICITUD, _propietario_solicitud),
+            (EventoEstado.entidad == ENTIDAD_TICKET, _propietario_ticket),
+        ),
+        _propietario_por_clave,
+    )},
+    pendiente=EventoEstado.id_propietario.is_(None),
+    descripcion="Completa eventos_estado.id_propietario con el dueño de cada solicitud o ticket",
+)
@@ -0,0 +1,119 @@
+# migrations/ddl_online.py
+# DDL para las migraciones de tablas grandes (patrón expandir / rellenar /
+# contraer, ver migracion_online.py). Solo importa alembic y sqlalchemy:
+# nada de la app, para que las migraciones ya escritas no cambien cuando
+# cambian los modelos. Uso desde migrations/versions/:
+#
+#   from migrations.ddl_online import crear_indice
+
+from alembic import op
+from sqlalchemy import literal, text
+from sqlalchemy.schema import CreateColumn
+
+
+def _dialecto():
+    return op.get_bind().dialect
+
+
+def _es_mysql():
+    return _dialecto().name in ('mysql', 'mariadb')
+
+
+def _q(nombre):
+    return _dialecto().identifier_preparer.quote(nombre)
+
+
+def _algoritmo_agregar_columna():
+    # ADD COLUMN instantáneo (solo metadatos) desde MySQL 8.0.12 / MariaDB 10.3;
+    # antes, INPLACE reconstruye la tabla pero sin bloquear escrituras.
+    dialecto = _dialecto()
+    version = dialecto.server_version_info or ()
+    if getattr(dialecto, 'is_mariadb', False):
+        return 'INSTANT' if version >= (10, 3) else 'INPLACE'
+    return 'INSTANT' if version >= (8, 0, 12) else 'INPLACE'
+
+
+def agregar_columna(tabla, columna):
+    """
+    ALTER TABLE ... ADD COLUMN sin copiar la tabla. La columna debe ser
+    nullable o tener server_default: el relleno viene después, por lotes.
+    """
+    if not columna.nullable and columna.server_default is None:
+        raise ValueError(f"'{columna.name}' debe ser nullable o tener server_default; "
+                         "usa restringir_no_nulo después del relleno")
+    if not _es_mysql():
+        op.add_column(tabla, columna)
+        return
+    definicion = CreateColumn(columna).compile(dialect=_dialecto())
+    algoritmo = _algoritmo_agregar_columna()
+    bloqueo = '' if algoritmo == 'INSTANT' else ', LOCK=NONE'
+    op.execute(f"ALTER TABLE {_q(tabla)} ADD COLUMN {definicion}, ALGORITHM={algoritmo}{bloqueo}")
+
+
+def crear_indice(nombre, tabla, columnas, unico=False):
+    """CREATE INDEX que deja seguir leyendo y escribiendo mientras se construye."""
+    if not _es_mysql():
+        op.create_index(nombre, tabla, columnas, unique=unico)
+        return
+    lista = ', '.join(_q(columna) for columna in columnas)
+    op.execute(f"CREATE {'UNIQUE ' if unico else ''}INDEX {_q(nombre)} ON {_q(tabla)} ({lista}) "
+               "ALGORITHM=INPLACE LOCK=NONE")
+
+
+def _definicion(tipo, nullable, server_default):
+    """'<tipo> [NOT] NULL [DEFAULT ...]' para CHANGE / MODIFY COLUMN de MySQL,
+    que reemplazan la definición entera: lo que no se repita aquí se pierde."""
+    dialecto = _dialecto()
+    partes = [tipo.compile(dialect=dialecto), 'NULL' if nullable else 'NOT NULL']
+    if server_default is not None:
+        if isinstance(server_default, str):
+            valor = literal(server_default).compile(dialect=dialecto, compile_kwargs={'literal_binds': True})
+        else:
+            valor = server_default.text  # text('CURRENT_TIMESTAMP'), etc.
+        partes.append(f'DEFAULT {valor}')
+    return ' '.join(str(parte) for parte in partes)
+
+
+def restringir_no_nulo(tabla, columna, tipo, existing_server_default=None):
+    """Pasa 'columna' a NOT NULL; falla si el relleno dejó filas en NULL."""
+    pendiente = op.get_bind().execute(
+        text(f"SELECT 1 FROM {_q(tabla)} WHERE {_q(columna)} IS NULL LIMIT 1")
+    ).first()
+    if pendiente is not None:
+        raise RuntimeError(f"{tabla}.{columna} todavía tiene NULL: ejecuta 'flask rellenos-ejecutar' "
+                           "hasta el final antes de esta migración")
+    if not _es_mysql():
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.alter_column(columna, existing_type=tipo, nullable=False,
+                                  existing_server_default=existing_server_default)
+        return
+    definicion = _definicion(tipo, False, existing_server_default)
+    op.execute(f"ALTER TABLE {_q(tabla)} MODIFY COLUMN {_q(columna)} {definicion}, "
+               "ALGORITHM=INPLACE, LOCK=NONE")
+
+
+def intercambiar_columnas(tabla, actual, nueva, tipo_actual, tipo_nuevo, *,
+                          nullable_actual, nullable_nuevo, default_actual, default_nuevo):
+    """
+    Deja la columna rellenada 'nueva' con el nombre de 'actual' y conserva la
+    vieja como '<actual>_anterior' (se borra en una migración posterior, cuando
+    ya nada la lea). Hay que pasar la definición que cada columna ya tiene
+    (tipo, nullable y server_default, None si no tiene): en MySQL el renombre
+    reescribe la definición completa, y si cambia algo (p. ej. se pierde el
+    NOT NULL de restringir_no_nulo) deja de ser un cambio solo de metadatos.
+    En MySQL ambos renombres van en un mismo ALTER, así 'actual' nunca falta.
+    """
+    anterior = f'{actual}_anterior'
+    if not _es_mysql():
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.alter_column(actual, new_column_name=anterior, existing_type=tipo_actual,
+                                  existing_nullable=nullable_actual, existing_server_default=default_actual)
+            batch_op.alter_column(nueva, new_column_name=actual, existing_type=tipo_nuevo,
+                                  existing_nullable=nullable_nuevo, existing_server_default=default_nuevo)
+        return
+    op.execute(
+        f"ALTER TABLE {_q(tabla)} "
+        f"CHANGE {_q(actual)} {_q(anterior)} {_definicion(tipo_actual, nullable_actual, default_actual)}, "
+        f"CHANGE {_q(nueva)} {_q(actual)} {_definicion(tipo_nuevo, nullable_nuevo, default_nuevo)}, "
+        "ALGORITHM=INPLACE, LOCK=NONE"
+    )
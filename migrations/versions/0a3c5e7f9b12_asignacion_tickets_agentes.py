@@ -0,0 +1,40 @@
+"""asignación automática de tickets a agentes de soporte
+
+Revision ID: 0a3c5e7f9b12
+Revises: f1a6d3e8b259
+Create Date: 2026-10-19 18:41:12.334906
+
+Después de aplicar: 'flask tickets-rebalancear' asigna los tickets abiertos
+que hoy están en el pool compartido.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a3c5e7f9b12'
+down_revision = 'f1a6d3e8b259'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('disponible', sa.Boolean(), nullable=False, server_default=sa.true()))
+        batch_op.add_column(sa.Column('especialidades', sa.String(length=255), nullable=True))
+
+    with op.batch_alter_table('tickets_soporte', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('id_asignado_a', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_tickets_asignado_a', 'usuarios', ['id_asignado_a'], ['id_usuario'])
+        batch_op.create_index('ix_tickets_asignado_estado', ['id_asignado_a', 'estado', 'fecha_creacion', 'id_ticket'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tickets_soporte', schema=None) as batch_op:
+        batch_op.drop_index('ix_tickets_asignado_estado')
+        batch_op.drop_constraint('fk_tickets_asignado_a', type_='foreignkey')
+        batch_op.drop_column('id_asignado_a')
+
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.drop_column('especialidades')
+        batch_op.drop_column('disponible')
@@ -0,0 +1,58 @@
+"""tiempos de SLA en TicketSoporte y tabla metricas_sla
+
+Revision ID: 3b7e1c9a5d20
+Revises: ea89db3d850e
+Create Date: 2026-10-19 09:12:04.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1c9a5d20'
+down_revision = 'ea89db3d850e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('metricas_sla',
+    sa.Column('id_metrica', sa.Integer(), nullable=False),
+    sa.Column('id_agente', sa.Integer(), nullable=False),
+    sa.Column('semana', sa.Date(), nullable=False),
+    sa.Column('total_primera_respuesta', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('segundos_primera_respuesta', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('total_cierres', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('segundos_cierre', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.ForeignKeyConstraint(['id_agente'], ['usuarios.id_usuario'], ),
+    sa.PrimaryKeyConstraint('id_metrica'),
+    sa.UniqueConstraint('id_agente', 'semana', name='uq_metricas_sla_agente_semana')
+    )
+    with op.batch_alter_table('metricas_sla', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_metricas_sla_semana'), ['semana'], unique=False)
+
+    with op.batch_alter_table('tickets_soporte', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fecha_primera_respuesta', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('id_primera_respuesta_por', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('fecha_cierre', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('id_cerrado_por', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('veces_reabierto', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_foreign_key('fk_tickets_primera_respuesta_por', 'usuarios', ['id_primera_respuesta_por'], ['id_usuario'])
+        batch_op.create_foreign_key('fk_tickets_cerrado_por', 'usuarios', ['id_cerrado_por'], ['id_usuario'])
+
+
+def downgrade():
+    with op.batch_alter_table('tickets_soporte', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_tickets_cerrado_por', type_='foreignkey')
+        batch_op.drop_constraint('fk_tickets_primera_respuesta_por', type_='foreignkey')
+        batch_op.drop_column('veces_reabierto')
+        batch_op.drop_column('id_cerrado_por')
+        batch_op.drop_column('fecha_cierre')
+        batch_op.drop_column('id_primera_respuesta_por')
+        batch_op.drop_column('fecha_primera_respuesta')
+
+    with op.batch_alter_table('metricas_sla', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_metricas_sla_semana'))
+
+    op.drop_table('metricas_sla')
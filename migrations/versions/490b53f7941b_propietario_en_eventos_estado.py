@@ -0,0 +1,31 @@
+"""dueño de la entidad en eventos_estado para la sincronización
+
+Revision ID: 490b53f7941b
+Revises: b6e9d2a4f813
+Create Date: 2026-10-20 12:41:18.207355
+
+Después de aplicar: 'flask rellenos-ejecutar propietario_eventos' para
+completar id_propietario en los eventos existentes (tabla grande: por lotes).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.ddl_online import agregar_columna, crear_indice
+
+
+# revision identifiers, used by Alembic.
+revision = '490b53f7941b'
+down_revision = 'b6e9d2a4f813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    agregar_columna('eventos_estado', sa.Column('id_propietario', sa.Integer(), nullable=True))
+    crear_indice('ix_eventos_estado_propietario_id', 'eventos_estado', ['id_propietario', 'id_evento'])
+
+
+def downgrade():
+    with op.batch_alter_table('eventos_estado', schema=None) as batch_op:
+        batch_op.drop_index('ix_eventos_estado_propietario_id')
+        batch_op.drop_column('id_propietario')
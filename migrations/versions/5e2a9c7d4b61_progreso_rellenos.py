@@ -0,0 +1,32 @@
+"""tabla progreso_rellenos para rellenos de datos por lotes
+
+Revision ID: 5e2a9c7d4b61
+Revises: 0a3c5e7f9b12
+Create Date: 2026-10-19 20:05:47.912640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2a9c7d4b61'
+down_revision = '0a3c5e7f9b12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('progreso_rellenos',
+    sa.Column('nombre', sa.String(length=100), nullable=False),
+    sa.Column('ultimo_id', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('filas', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('terminado', sa.Boolean(), nullable=False, server_default=sa.false()),
+    sa.Column('fecha_inicio', sa.DateTime(), nullable=True),
+    sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('nombre')
+    )
+
+
+def downgrade():
+    op.drop_table('progreso_rellenos')
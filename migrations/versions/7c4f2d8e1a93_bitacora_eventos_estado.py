@@ -0,0 +1,59 @@
+"""bitácora append-only de cambios de estado (eventos_estado)
+
+Revision ID: 7c4f2d8e1a93
+Revises: 3b7e1c9a5d20
+Create Date: 2026-10-19 11:40:27.504913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4f2d8e1a93'
+down_revision = '3b7e1c9a5d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('eventos_estado',
+    sa.Column('id_evento', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False, autoincrement=True),
+    sa.Column('entidad', sa.SmallInteger(), nullable=False),
+    sa.Column('id_entidad', sa.Integer(), nullable=False),
+    sa.Column('estado_anterior', sa.SmallInteger(), nullable=True),
+    sa.Column('estado_nuevo', sa.SmallInteger(), nullable=False),
+    sa.Column('id_usuario', sa.Integer(), nullable=True),
+    sa.Column('fecha', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['id_usuario'], ['usuarios.id_usuario'], ),
+    sa.PrimaryKeyConstraint('id_evento')
+    )
+    with op.batch_alter_table('eventos_estado', schema=None) as batch_op:
+        batch_op.create_index('ix_eventos_estado_entidad_fecha', ['entidad', 'fecha'], unique=False)
+        batch_op.create_index('ix_eventos_estado_entidad_id_fecha', ['entidad', 'id_entidad', 'fecha'], unique=False)
+
+    # Evento inicial (estado_anterior NULL) con el estado actual de las filas
+    # que ya existen, para que eventos.reproducir() y la sincronización las
+    # incluyan. Códigos copiados de eventos.py (no importar la app aquí).
+    op.execute(
+        "INSERT INTO eventos_estado (entidad, id_entidad, estado_anterior, estado_nuevo, fecha) "
+        "SELECT 1, id_solicitud, NULL, "
+        "CASE estado WHEN 'PENDIENTE' THEN 1 WHEN 'EN_PROCESO' THEN 2 WHEN 'RESUELTO' THEN 3 END, "
+        "COALESCE(fecha_creacion, CURRENT_TIMESTAMP) "
+        "FROM solicitudes_ayuda WHERE estado IS NOT NULL"
+    )
+    op.execute(
+        "INSERT INTO eventos_estado (entidad, id_entidad, estado_anterior, estado_nuevo, fecha) "
+        "SELECT 2, id_ticket, NULL, "
+        "CASE estado WHEN 'ABIERTO' THEN 1 WHEN 'EN_PROCESO' THEN 2 WHEN 'CERRADO' THEN 3 END, "
+        "COALESCE(fecha_creacion, CURRENT_TIMESTAMP) "
+        "FROM tickets_soporte WHERE estado IS NOT NULL"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('eventos_estado', schema=None) as batch_op:
+        batch_op.drop_index('ix_eventos_estado_entidad_id_fecha')
+        batch_op.drop_index('ix_eventos_estado_entidad_fecha')
+
+    op.drop_table('eventos_estado')
@@ -0,0 +1,42 @@
+"""índices para cada combinación de filtro y orden del dashboard
+
+Revision ID: 8d3f1b6a2c47
+Revises: 5e2a9c7d4b61
+Create Date: 2026-10-20 09:12:33.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.ddl_online import crear_indice
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3f1b6a2c47'
+down_revision = '5e2a9c7d4b61'
+branch_labels = None
+depends_on = None
+
+
+# El orden por defecto ('recientes') es id_solicitud DESC: con un filtro de
+# estado, prioridad o tipo, los índices (filtro, fecha, id) no lo recorren
+# en orden y MySQL terminaba ordenando todas las filas que coinciden. Lo
+# mismo con el orden por fecha_desastre filtrando por estado o prioridad.
+INDICES_SOLICITUDES = [
+    ('ix_solicitudes_estado_id', ['estado', 'id_solicitud']),
+    ('ix_solicitudes_prioridad_id', ['prioridad', 'id_solicitud']),
+    ('ix_solicitudes_tipo_id', ['tipo_desastre', 'id_solicitud']),
+    ('ix_solicitudes_estado_desastre', ['estado', 'fecha_desastre', 'id_solicitud']),
+    ('ix_solicitudes_prioridad_desastre', ['prioridad', 'fecha_desastre', 'id_solicitud']),
+]
+
+
+def upgrade():
+    for nombre, columnas in INDICES_SOLICITUDES:
+        crear_indice(nombre, 'solicitudes_ayuda', columnas)
+
+
+def downgrade():
+    with op.batch_alter_table('solicitudes_ayuda', schema=None) as batch_op:
+        for nombre, _ in reversed(INDICES_SOLICITUDES):
+            batch_op.drop_index(nombre)
@@ -0,0 +1,44 @@
+"""índices para filtros y orden del dashboard de solicitudes
+
+Revision ID: a51d6e0f3c84
+Revises: 7c4f2d8e1a93
+Create Date: 2026-10-19 13:05:51.772046
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a51d6e0f3c84'
+down_revision = '7c4f2d8e1a93'
+branch_labels = None
+depends_on = None
+
+
+INDICES_SOLICITUDES = [
+    ('ix_solicitudes_estado_creacion', ['estado', 'fecha_creacion', 'id_solicitud']),
+    ('ix_solicitudes_prioridad_creacion', ['prioridad', 'fecha_creacion', 'id_solicitud']),
+    ('ix_solicitudes_tipo_fecha_desastre', ['tipo_desastre', 'fecha_desastre', 'id_solicitud']),
+    ('ix_solicitudes_fecha_creacion', ['fecha_creacion', 'id_solicitud']),
+    ('ix_solicitudes_fecha_desastre', ['fecha_desastre', 'id_solicitud']),
+    ('ix_solicitudes_usuario_id', ['id_usuario', 'id_solicitud']),
+]
+
+
+def upgrade():
+    with op.batch_alter_table('solicitudes_ayuda', schema=None) as batch_op:
+        for nombre, columnas in INDICES_SOLICITUDES:
+            batch_op.create_index(nombre, columnas, unique=False)
+
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.create_index('ix_usuarios_municipio_id', ['municipio', 'id_usuario'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.drop_index('ix_usuarios_municipio_id')
+
+    with op.batch_alter_table('solicitudes_ayuda', schema=None) as batch_op:
+        for nombre, _ in reversed(INDICES_SOLICITUDES):
+            batch_op.drop_index(nombre)
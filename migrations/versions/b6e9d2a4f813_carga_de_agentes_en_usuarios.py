@@ -0,0 +1,34 @@
+"""carga de tickets de cada agente en usuarios.tickets_asignados
+
+Revision ID: b6e9d2a4f813
+Revises: 8d3f1b6a2c47
+Create Date: 2026-10-20 10:27:05.661920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.ddl_online import agregar_columna
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e9d2a4f813'
+down_revision = '8d3f1b6a2c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    agregar_columna('usuarios', sa.Column('tickets_asignados', sa.Integer(), nullable=False, server_default='0'))
+    # 'usuarios' es chica: la carga inicial va en un solo UPDATE
+    op.execute(
+        "UPDATE usuarios SET tickets_asignados = ("
+        "SELECT COUNT(*) FROM tickets_soporte "
+        "WHERE tickets_soporte.id_asignado_a = usuarios.id_usuario "
+        "AND tickets_soporte.estado IN ('ABIERTO', 'EN_PROCESO'))"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.drop_column('tickets_asignados')
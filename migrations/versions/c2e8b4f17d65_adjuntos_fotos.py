@@ -0,0 +1,47 @@
+"""tabla adjuntos (fotos de solicitudes y tickets)
+
+Revision ID: c2e8b4f17d65
+Revises: a51d6e0f3c84
+Create Date: 2026-10-19 15:22:10.903317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e8b4f17d65'
+down_revision = 'a51d6e0f3c84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('adjuntos',
+    sa.Column('id_adjunto', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('id_solicitud', sa.Integer(), nullable=True),
+    sa.Column('id_ticket', sa.Integer(), nullable=True),
+    sa.Column('id_usuario', sa.Integer(), nullable=False),
+    sa.Column('nombre_original', sa.String(length=255), nullable=True),
+    sa.Column('tipo_mime', sa.String(length=50), nullable=False),
+    sa.Column('tamano', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['id_solicitud'], ['solicitudes_ayuda.id_solicitud'], ),
+    sa.ForeignKeyConstraint(['id_ticket'], ['tickets_soporte.id_ticket'], ),
+    sa.ForeignKeyConstraint(['id_usuario'], ['usuarios.id_usuario'], ),
+    sa.PrimaryKeyConstraint('id_adjunto')
+    )
+    with op.batch_alter_table('adjuntos', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_adjuntos_sha256'), ['sha256'], unique=False)
+        batch_op.create_index(batch_op.f('ix_adjuntos_id_solicitud'), ['id_solicitud'], unique=False)
+        batch_op.create_index(batch_op.f('ix_adjuntos_id_ticket'), ['id_ticket'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('adjuntos', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_adjuntos_id_ticket'))
+        batch_op.drop_index(batch_op.f('ix_adjuntos_id_solicitud'))
+        batch_op.drop_index(batch_op.f('ix_adjuntos_sha256'))
+
+    op.drop_table('adjuntos')
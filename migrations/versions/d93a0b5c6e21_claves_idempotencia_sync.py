@@ -0,0 +1,34 @@
+"""claves de idempotencia para la API de sincronización
+
+Revision ID: d93a0b5c6e21
+Revises: c2e8b4f17d65
+Create Date: 2026-10-19 16:48:33.210954
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93a0b5c6e21'
+down_revision = 'c2e8b4f17d65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('claves_idempotencia',
+    sa.Column('id_clave', sa.Integer(), nullable=False),
+    sa.Column('id_usuario', sa.Integer(), nullable=False),
+    sa.Column('clave', sa.String(length=64), nullable=False),
+    sa.Column('entidad', sa.SmallInteger(), nullable=False),
+    sa.Column('id_entidad', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['id_usuario'], ['usuarios.id_usuario'], ),
+    sa.PrimaryKeyConstraint('id_clave'),
+    sa.UniqueConstraint('id_usuario', 'clave', name='uq_claves_idempotencia_usuario_clave')
+    )
+
+
+def downgrade():
+    op.drop_table('claves_idempotencia')
@@ -0,0 +1,58 @@
+"""contadores precalculados por usuario
+
+Revision ID: e4b7c1d09a36
+Revises: d93a0b5c6e21
+Create Date: 2026-10-19 17:22:05.418337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c1d09a36'
+down_revision = 'd93a0b5c6e21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('contadores_usuario',
+    sa.Column('id_usuario', sa.Integer(), nullable=False),
+    sa.Column('solicitudes_pendientes', sa.Integer(), nullable=False),
+    sa.Column('solicitudes_en_proceso', sa.Integer(), nullable=False),
+    sa.Column('tickets_abiertos', sa.Integer(), nullable=False),
+    sa.Column('respuestas_sin_leer', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['id_usuario'], ['usuarios.id_usuario'], ),
+    sa.PrimaryKeyConstraint('id_usuario')
+    )
+    with op.batch_alter_table('tickets_soporte', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('respuestas_sin_leer', sa.Integer(), nullable=False, server_default='0'))
+
+    # Contadores de los usuarios que ya tienen solicitudes o tickets, para que
+    # los badges no arranquen en 0 y los ajustes posteriores (que suman deltas
+    # sobre la fila) partan del valor correcto. Misma cuenta que
+    # contadores.reparar_contadores(), con los estados copiados de
+    # COLUMNA_POR_ESTADO (no importar la app aquí). Aún no hay respuestas sin
+    # leer: la columna de tickets_soporte se acaba de crear en 0.
+    op.execute(
+        "INSERT INTO contadores_usuario (id_usuario, solicitudes_pendientes, solicitudes_en_proceso, "
+        "tickets_abiertos, respuestas_sin_leer) "
+        "SELECT id_usuario, SUM(pendientes), SUM(en_proceso), SUM(abiertos), 0 FROM ("
+        "SELECT id_usuario, "
+        "CASE WHEN estado = 'PENDIENTE' THEN 1 ELSE 0 END AS pendientes, "
+        "CASE WHEN estado = 'EN_PROCESO' THEN 1 ELSE 0 END AS en_proceso, "
+        "0 AS abiertos "
+        "FROM solicitudes_ayuda "
+        "UNION ALL "
+        "SELECT id_usuario, 0, 0, CASE WHEN estado IN ('ABIERTO', 'EN_PROCESO') THEN 1 ELSE 0 END "
+        "FROM tickets_soporte"
+        ") AS por_usuario GROUP BY id_usuario"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('tickets_soporte', schema=None) as batch_op:
+        batch_op.drop_column('respuestas_sin_leer')
+
+    op.drop_table('contadores_usuario')
@@ -0,0 +1,32 @@
+"""columna version para concurrencia optimista
+
+Revision ID: f1a6d3e8b259
+Revises: e4b7c1d09a36
+Create Date: 2026-10-19 18:05:47.902113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a6d3e8b259'
+down_revision = 'e4b7c1d09a36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('solicitudes_ayuda', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    with op.batch_alter_table('tickets_soporte', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('tickets_soporte', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('solicitudes_ayuda', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -5,6 +5,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from flask_login import UserMixin
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import enum
 
 # Inicializa el objeto de base de datos. 
@@ -38,6 +40,11 @@ class Usuario(UserMixin, db.Model): # AÑADIDO: UserMixin
     # Mapea a la tabla 'usuarios' en la base de datos
     __tablename__ = 'usuarios'
 
+    # Índice para filtrar solicitudes por municipio del creador (dashboard)
+    __table_args__ = (
+        db.Index('ix_usuarios_municipio_id', 'municipio', 'id_usuario'),
+    )
+
     # Columnas
     id_usuario = db.Column(db.Integer, primary_key=True)
     cedula = db.Column(db.String(20), unique=True, nullable=False)
@@ -51,14 +58,28 @@ class Usuario(UserMixin, db.Model): # AÑADIDO: UserMixin
 
     # Campo ENUM: Usa el Enum RolUsuario con el valor por defecto USUARIO
     rol = db.Column(db.Enum(RolUsuario), default=RolUsuario.USUARIO) 
+
+    # Asignación automática de tickets (asignacion.py), solo para SOPORTE:
+    # 'disponible' lo saca del reparto; 'especialidades' son tipos de desastre
+    # separados por comas (vacío = atiende cualquier tipo).
+    disponible = db.Column(db.Boolean, nullable=False, default=True)
+    especialidades = db.Column(db.String(255), nullable=True)
+    # Tickets ABIERTO/EN_PROCESO asignados: se actualiza en la misma transacción
+    # que cada asignación o transición ('flask tickets-rebalancear' la recalcula)
+    tickets_asignados = db.Column(db.Integer, nullable=False, default=0)
     
     # TIMESTAMP 
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relaciones: permiten acceder a los datos relacionados (útil en Flask)
     solicitudes = db.relationship('SolicitudAyuda', backref='creador', lazy=True)
-    tickets = db.relationship('TicketSoporte', backref='creador_ticket', lazy=True)
+    tickets = db.relationship('TicketSoporte', backref='creador_ticket', lazy=True,
+                              foreign_keys='TicketSoporte.id_usuario')
     respuestas = db.relationship('Respuesta', backref='autor_respuesta', lazy=True)
+
+    # Contadores de los badges: se cargan en el mismo SELECT del usuario
+    # (lazy='joined'), así mostrar los badges no cuesta consultas extra.
+    contadores = db.relationship('ContadoresUsuario', uselist=False, lazy='joined')
     
     # MÉTODO REQUERIDO POR FLASK-LOGIN
     # Este método es usado por load_user, pero se requiere para la compatibilidad con UserMixin
@@ -73,6 +94,22 @@ class Usuario(UserMixin, db.Model): # AÑADIDO: UserMixin
 
 class SolicitudAyuda(db.Model):
     __tablename__ = 'solicitudes_ayuda'
+    # Índices para los filtros/orden del dashboard (filtros.py). Terminan en la
+    # clave primaria para cubrir el desempate del ORDER BY.
+    __table_args__ = (
+        db.Index('ix_solicitudes_estado_creacion', 'estado', 'fecha_creacion', 'id_solicitud'),
+        db.Index('ix_solicitudes_prioridad_creacion', 'prioridad', 'fecha_creacion', 'id_solicitud'),
+        db.Index('ix_solicitudes_tipo_fecha_desastre', 'tipo_desastre', 'fecha_desastre', 'id_solicitud'),
+        db.Index('ix_solicitudes_fecha_creacion', 'fecha_creacion', 'id_solicitud'),
+        db.Index('ix_solicitudes_fecha_desastre', 'fecha_desastre', 'id_solicitud'),
+        db.Index('ix_solicitudes_usuario_id', 'id_usuario', 'id_solicitud'),
+        # Cada orden de filtros.ORDENES_SOLICITUD con cada filtro de igualdad
+        db.Index('ix_solicitudes_estado_id', 'estado', 'id_solicitud'),
+        db.Index('ix_solicitudes_prioridad_id', 'prioridad', 'id_solicitud'),
+        db.Index('ix_solicitudes_tipo_id', 'tipo_desastre', 'id_solicitud'),
+        db.Index('ix_solicitudes_estado_desastre', 'estado', 'fecha_desastre', 'id_solicitud'),
+        db.Index('ix_solicitudes_prioridad_desastre', 'prioridad', 'fecha_desastre', 'id_solicitud'),
+    )
 
     id_solicitud = db.Column(db.Integer, primary_key=True)
     id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
@@ -85,9 +122,18 @@ class SolicitudAyuda(db.Model):
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)  # ✅ AÑADE ESTA LÍNEA
     estado = db.Column(db.Enum(EstadoSolicitud), default=EstadoSolicitud.PENDIENTE)
 
+    # Control de concurrencia optimista: cada UPDATE del ORM lleva
+    # 'WHERE version = <leída>' y la incrementa (StaleDataError si otro ganó)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    __mapper_args__ = {'version_id_col': version}
+
 
 class TicketSoporte(db.Model):
     __tablename__ = 'tickets_soporte'
+    # Cola de cada agente ("Mi cola"): una sola búsqueda por índice
+    __table_args__ = (
+        db.Index('ix_tickets_asignado_estado', 'id_asignado_a', 'estado', 'fecha_creacion', 'id_ticket'),
+    )
 
     id_ticket = db.Column(db.Integer, primary_key=True)
     id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
@@ -104,6 +150,24 @@ class TicketSoporte(db.Model):
     estado = db.Column(db.Enum(EstadoTicket), default=EstadoTicket.ABIERTO)
     
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Tiempos de SLA: se llenan desde las rutas de respuesta y cambio de estado
+    fecha_primera_respuesta = db.Column(db.DateTime, nullable=True)
+    id_primera_respuesta_por = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=True)
+    fecha_cierre = db.Column(db.DateTime, nullable=True)
+    id_cerrado_por = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=True)
+    veces_reabierto = db.Column(db.Integer, nullable=False, default=0)
+
+    # Agente de soporte responsable (asignacion.py); None = pool compartido
+    id_asignado_a = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=True)
+    asignado_a = db.relationship('Usuario', foreign_keys=[id_asignado_a])
+
+    # Respuestas de soporte que el creador aún no ha visto (ver contadores.py)
+    respuestas_sin_leer = db.Column(db.Integer, nullable=False, default=0)
+
+    # Control de concurrencia optimista (igual que en SolicitudAyuda)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    __mapper_args__ = {'version_id_col': version}
     
     # Relación con las respuestas (comentarios)
     respuestas = db.relationship('Respuesta', backref='ticket_asociado', lazy=True)
@@ -127,3 +191,137 @@ class Respuesta(db.Model):
     
     mensaje = db.Column(db.Text, nullable=False)
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class MetricaSLA(db.Model):
+    # Agregados precalculados por agente y semana (lunes de la semana).
+    # Se actualizan de forma incremental al responder, cerrar o reabrir un
+    # ticket, así el reporte de SLA no tiene que recorrer 'respuestas'.
+    __tablename__ = 'metricas_sla'
+    __table_args__ = (
+        db.UniqueConstraint('id_agente', 'semana', name='uq_metricas_sla_agente_semana'),
+    )
+
+    id_metrica = db.Column(db.Integer, primary_key=True)
+    id_agente = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
+    semana = db.Column(db.Date, nullable=False, index=True)
+
+    # Tiempo hasta la primera respuesta
+    total_primera_respuesta = db.Column(db.Integer, nullable=False, default=0)
+    segundos_primera_respuesta = db.Column(db.BigInteger, nullable=False, default=0)
+
+    # Tiempo hasta el cierre
+    total_cierres = db.Column(db.Integer, nullable=False, default=0)
+    segundos_cierre = db.Column(db.BigInteger, nullable=False, default=0)
+
+    agente = db.relationship('Usuario')
+
+
+class EventoEstado(db.Model):
+    # Bitácora append-only de cambios de estado. Columnas enteras compactas:
+    # los códigos de 'entidad' y de estado están definidos en eventos.py.
+    __tablename__ = 'eventos_estado'
+    __table_args__ = (
+        db.Index('ix_eventos_estado_entidad_fecha', 'entidad', 'fecha'),
+        db.Index('ix_eventos_estado_entidad_id_fecha', 'entidad', 'id_entidad', 'fecha'),
+        db.Index('ix_eventos_estado_propietario_id', 'id_propietario', 'id_evento'),
+    )
+
+    id_evento = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    entidad = db.Column(db.SmallInteger, nullable=False)
+    id_entidad = db.Column(db.Integer, nullable=False)
+    estado_anterior = db.Column(db.SmallInteger, nullable=True)
+    estado_nuevo = db.Column(db.SmallInteger, nullable=False)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=True)
+    # Dueño de la solicitud o ticket (no quien hizo el cambio), copiado al
+    # escribir el evento: la sincronización filtra por él y así también ve
+    # los eventos de entidades que ya se borraron. NULL en eventos anteriores
+    # a la columna hasta que corra el relleno 'propietario_eventos'.
+    id_propietario = db.Column(db.Integer, nullable=True)
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Adjunto(db.Model):
+    # Foto adjunta a una solicitud o a un ticket. El archivo se guarda por
+    # contenido (sha256) en disco; ver adjuntos.py.
+    __tablename__ = 'adjuntos'
+
+    id_adjunto = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    id_solicitud = db.Column(db.Integer, db.ForeignKey('solicitudes_ayuda.id_solicitud'), nullable=True, index=True)
+    id_ticket = db.Column(db.Integer, db.ForeignKey('tickets_soporte.id_ticket'), nullable=True, index=True)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
+    nombre_original = db.Column(db.String(255), nullable=True)
+    tipo_mime = db.Column(db.String(50), nullable=False)
+    tamano = db.Column(db.Integer, nullable=False)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+    solicitud = db.relationship('SolicitudAyuda', backref=db.backref('adjuntos', cascade='all, delete-orphan'))
+    ticket = db.relationship('TicketSoporte', backref=db.backref('adjuntos', cascade='all, delete-orphan'))
+
+
+class ClaveIdempotencia(db.Model):
+    # Claves generadas por el cliente (app de campo sin conexión) para que un
+    # reintento de sincronización no cree registros duplicados.
+    __tablename__ = 'claves_idempotencia'
+    __table_args__ = (
+        db.UniqueConstraint('id_usuario', 'clave', name='uq_claves_idempotencia_usuario_clave'),
+    )
+
+    id_clave = db.Column(db.Integer, primary_key=True)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
+    clave = db.Column(db.String(64), nullable=False)
+    # Mismos códigos de entidad que eventos_estado (eventos.py)
+    entidad = db.Column(db.SmallInteger, nullable=False)
+    id_entidad = db.Column(db.Integer, nullable=False)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ContadoresUsuario(db.Model):
+    # Contadores precalculados por usuario para badges y perfil; se mantienen
+    # en la misma transacción que cada cambio (contadores.py).
+    __tablename__ = 'contadores_usuario'
+
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), primary_key=True)
+    solicitudes_pendientes = db.Column(db.Integer, nullable=False, default=0)
+    solicitudes_en_proceso = db.Column(db.Integer, nullable=False, default=0)
+    tickets_abiertos = db.Column(db.Integer, nullable=False, default=0)  # ABIERTO + EN_PROCESO
+    respuestas_sin_leer = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ProgresoRelleno(db.Model):
+    # Avance de los rellenos de datos por lotes (migracion_online.py): permite
+    # cortar 'flask rellenos-ejecutar' y retomarlo donde quedó.
+    __tablename__ = 'progreso_rellenos'
+
+    nombre = db.Column(db.String(100), primary_key=True)
+    ultimo_id = db.Column(db.Integer, nullable=False, default=0)  # clave primaria más alta ya procesada
+    filas = db.Column(db.Integer, nullable=False, default=0)
+    terminado = db.Column(db.Boolean, nullable=False, default=False)
+    fecha_inicio = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ----------------------------------------------------------------------
+# Sumas sobre tablas de agregados (metricas_sla, contadores_usuario)
+# ----------------------------------------------------------------------
+def sumar_en_fila(sesion, modelo, claves, incrementos, iniciales=None):
+    """
+    Suma 'incrementos' (columna = columna + delta) a la fila de 'modelo'
+    identificada por 'claves' (su clave primaria o una UNIQUE), o la crea con
+    'iniciales' (por defecto los mismos incrementos). Es una sola sentencia
+    (INSERT ... ON DUPLICATE KEY UPDATE en MySQL, ON CONFLICT en SQLite): dos
+    transacciones que crean la misma fila a la vez no chocan con IntegrityError.
+    """
+    tabla = modelo.__table__
+    valores = {**claves, **(incrementos if iniciales is None else iniciales)}
+    sumas = {campo: tabla.c[campo] + delta for campo, delta in incrementos.items()}
+    dialecto = sesion.get_bind().dialect.name
+    if dialecto == 'mysql':
+        sentencia = mysql_insert(tabla).values(**valores).on_duplicate_key_update(**sumas)
+    elif dialecto == 'sqlite':
+        sentencia = sqlite_insert(tabla).values(**valores).on_conflict_do_update(
+            index_elements=list(claves), set_=sumas)
+    else:
+        raise NotImplementedError(f"sumar_en_fila no soporta el dialecto '{dialecto}'")
+    sesion.execute(sentencia)
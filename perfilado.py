@@ -0,0 +1,273 @@
+# perfilado.py
+# Perfilado bajo demanda de peticiones en producción.
+#
+# Una petición se perfila si:
+#   - un ADMIN la pide con la cabecera 'X-Perfilar: 1' o con '?_perfilar=1', o
+#   - sale sorteada 1 de cada PERFIL_MUESTREO_N peticiones (0 = desactivado).
+# Mientras dura, un hilo aparte toma muestras de la pila del hilo que atiende
+# la petición cada PERFIL_INTERVALO_MS (no instrumenta cada llamada, así el
+# costo es bajo) y se anota la línea de tiempo de las consultas SQL.
+#
+# Por cada petición se escriben en PERFIL_DIR:
+#   <nombre>.folded  pilas "a;b;c N" (entrada de flamegraph.pl / speedscope)
+#   <nombre>.json    ruta, duración, estado y consultas SQL con su inicio/duración
+#
+# Las rutas de Flask (WSGI) se perfilan con before_request/after_request; las
+# vistas async de asgi.py llaman a empezar_perfil/terminar_perfil desde
+# RenaceASGI._atender. En ese caso el hilo es el event loop, que atiende
+# muchas peticiones a la vez, así que se muestrea la tarea de asyncio de la
+# petición (MuestreadorTarea) en lugar del hilo completo.
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from models import RolUsuario
+
+CABECERA = 'X-Perfilar'
+PARAMETRO = '_perfilar'
+MAX_SQL_POR_PETICION = 2000
+LARGO_MAXIMO_SQL = 500
+
+
+class Muestreador(threading.Thread):
+    """Toma muestras de la pila de un hilo hasta que se llama a detener()."""
+
+    def __init__(self, id_hilo, intervalo):
+        super().__init__(name='renace-perfilador', daemon=True)
+        self.id_hilo = id_hilo
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self.muestras = 0
+        self._fin = threading.Event()
+
+    def run(self):
+        while not self._fin.wait(self.intervalo):
+            pila = self._pila()
+            if not pila:
+                continue
+            self.pilas[';'.join(_texto(frame) for frame in pila)] += 1
+            self.muestras += 1
+
+    def _pila(self):
+        """Frames del hilo, del más externo al más interno."""
+        frame = sys._current_frames().get(self.id_hilo)
+        pila = []
+        while frame is not None:
+            pila.append(frame)
+            frame = frame.f_back
+        return pila[::-1]
+
+    def detener(self):
+        self._fin.set()
+        self.join()
+
+
+class MuestreadorTarea(Muestreador):
+    """
+    Muestrea una tarea de asyncio. Si en ese instante el event loop está
+    ejecutando la tarea, se toma la pila del hilo desde la raíz de la tarea;
+    si la tarea está suspendida (esperando a la BD, long-polling) se toma la
+    cadena de awaits que la mantiene suspendida. Las demás peticiones que
+    corren en el mismo hilo no se mezclan en el perfil.
+    """
+
+    def __init__(self, id_hilo, intervalo, tarea):
+        super().__init__(id_hilo, intervalo)
+        self.tarea = tarea
+
+    def _pila(self):
+        corrutina = self.tarea.get_coro()
+        raiz = getattr(corrutina, 'cr_frame', None)
+        if raiz is None:  # la tarea terminó
+            return []
+        pila = super()._pila()
+        for indice, frame in enumerate(pila):
+            if frame is raiz:
+                return pila[indice:]
+        pila = []
+        objeto = corrutina
+        while objeto is not None:
+            frame = getattr(objeto, 'cr_frame', None) or getattr(objeto, 'gi_frame', None) or getattr(objeto, 'ag_frame', None)
+            if frame is None:
+                break
+            pila.append(frame)
+            objeto = (getattr(objeto, 'cr_await', None) or getattr(objeto, 'gi_yieldfrom', None)
+                      or getattr(objeto, 'ag_await', None))
+        return pila
+
+
+def _texto(frame):
+    codigo = frame.f_code
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})"
+
+
+class Perfil:
+    """Estado del perfilado de UNA petición (vive en flask.g)."""
+
+    def __init__(self, intervalo, motivo, tarea=None):
+        self.motivo = motivo
+        self.inicio = time.perf_counter()
+        self.fecha = datetime.utcnow()
+        self.consultas = []
+        if tarea is None:
+            self.muestreador = Muestreador(threading.get_ident(), intervalo)
+        else:
+            self.muestreador = MuestreadorTarea(threading.get_ident(), intervalo, tarea)
+        self.muestreador.start()
+
+    def ms_desde_inicio(self, instante=None):
+        return round(((instante or time.perf_counter()) - self.inicio) * 1000, 3)
+
+
+def _pedido_por_admin():
+    if request.headers.get(CABECERA) != '1' and request.args.get(PARAMETRO) != '1':
+        return False
+    return current_user.is_authenticated and current_user.rol == RolUsuario.ADMIN
+
+
+def _antes_de_cursor(conn, cursor, sentencia, parametros, contexto, executemany):
+    perfil = g.get('perfil') if has_request_context() else None
+    if perfil is not None:
+        conn.info.setdefault('perfil_inicios', []).append(time.perf_counter())
+
+
+def _despues_de_cursor(conn, cursor, sentencia, parametros, contexto, executemany):
+    perfil = g.get('perfil') if has_request_context() else None
+    inicios = conn.info.get('perfil_inicios')
+    if perfil is None or not inicios:
+        return
+    inicio = inicios.pop()
+    if len(perfil.consultas) < MAX_SQL_POR_PETICION:
+        perfil.consultas.append({
+            'inicio_ms': perfil.ms_desde_inicio(inicio),
+            'duracion_ms': round((time.perf_counter() - inicio) * 1000, 3),
+            'sql': ' '.join(sentencia.split())[:LARGO_MAXIMO_SQL],
+        })
+
+
+def _nombre_archivo(perfil, endpoint):
+    return f"{perfil.fecha:%Y%m%d-%H%M%S-%f}_{endpoint or 'sin_ruta'}"
+
+
+def listar_perfiles(directorio, limite=200):
+    """Metadatos de los perfiles guardados, los más recientes primero."""
+    if not os.path.isdir(directorio):
+        return []
+    nombres = sorted((n for n in os.listdir(directorio) if n.endswith('.json')), reverse=True)[:limite]
+    perfiles = []
+    for nombre in nombres:
+        try:
+            with open(os.path.join(directorio, nombre), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta['nombre'] = nombre[:-len('.json')]
+        meta.pop('consultas', None)
+        perfiles.append(meta)
+    return perfiles
+
+
+def _guardar(app, perfil, error=None):
+    """Escribe el .folded y el .json del perfil en PERFIL_DIR."""
+    if perfil is None:
+        return
+    perfil.muestreador.detener()
+    metodo, ruta, endpoint = perfil.peticion
+    directorio = app.config["PERFIL_DIR"]
+    nombre = _nombre_archivo(perfil, endpoint)
+    meta = {
+        'fecha': perfil.fecha.isoformat(),
+        'metodo': metodo,
+        'ruta': ruta,
+        'endpoint': endpoint,
+        'estado': getattr(perfil, 'estado', 500 if error else None),
+        'motivo': perfil.motivo,
+        'duracion_ms': perfil.ms_desde_inicio(),
+        'muestras': perfil.muestreador.muestras,
+        'total_sql': len(perfil.consultas),
+        'ms_sql': round(sum(c['duracion_ms'] for c in perfil.consultas), 3),
+        'consultas': perfil.consultas,
+    }
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        with open(os.path.join(directorio, nombre + '.folded'), 'w', encoding='utf-8') as f:
+            for pila, cantidad in perfil.muestreador.pilas.most_common():
+                f.write(f"{pila} {cantidad}\n")
+        with open(os.path.join(directorio, nombre + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+    except OSError as e:
+        app.logger.warning("No se pudo guardar el perfil %s: %s", nombre, e)
+
+
+def empezar_perfil(app, endpoint, tarea=None):
+    """
+    Perfil de la petición actual si sale sorteada o la pide un ADMIN; si no,
+    None. 'tarea' es la tarea de asyncio de las vistas async (asgi.py).
+    """
+    muestreo = app.config["PERFIL_MUESTREO_N"]
+    sorteada = muestreo > 0 and random.randrange(muestreo) == 0
+    if not (sorteada or _pedido_por_admin()):
+        return None
+    perfil = Perfil(app.config["PERFIL_INTERVALO_MS"] / 1000, 'muestreo' if sorteada else 'admin', tarea)
+    perfil.peticion = (request.method, request.full_path.rstrip('?'), endpoint)
+    return perfil
+
+
+def terminar_perfil(app, perfil, estado, error=None):
+    """Detiene el muestreo y guarda el perfil (para asgi.py, al terminar de enviar la respuesta)."""
+    if perfil is None:
+        return
+    perfil.estado = estado
+    _guardar(app, perfil, error)
+
+
+def init_perfilado(app):
+    """Registra los hooks de la app. La configuración sale de variables de entorno."""
+    app.config.setdefault("PERFIL_DIR", os.environ.get("PERFIL_DIR", os.path.join(app.root_path, "perfiles")))
+    app.config.setdefault("PERFIL_MUESTREO_N", int(os.environ.get("PERFIL_MUESTREO_N", "0")))
+    app.config.setdefault("PERFIL_INTERVALO_MS", float(os.environ.get("PERFIL_INTERVALO_MS", "5")))
+
+    if not event.contains(Engine, 'before_cursor_execute', _antes_de_cursor):
+        event.listen(Engine, 'before_cursor_execute', _antes_de_cursor)
+        event.listen(Engine, 'after_cursor_execute', _despues_de_cursor)
+
+    @app.before_request
+    def iniciar_perfil():
+        if request.endpoint == 'static':
+            return
+        perfil = empezar_perfil(app, request.endpoint)
+        if perfil is not None:
+            g.perfil = perfil
+
+    @app.after_request
+    def anotar_estado(response):
+        perfil = g.get('perfil')
+        if perfil is None:
+            return response
+        perfil.estado = response.status_code
+        if response.is_streamed:
+            # El cuerpo se genera después del teardown (listas.py): el perfil
+            # sigue en g y se guarda cuando el servidor termina de enviarlo.
+            perfil.en_streaming = True
+            contexto_g = g._get_current_object()
+            response.call_on_close(lambda: _guardar(app, contexto_g.pop('perfil', None)))
+        return response
+
+    @app.teardown_request
+    def guardar_perfil(error=None):
+        perfil = g.get('perfil')
+        if perfil is None or getattr(perfil, 'en_streaming', False):
+            return
+        _guardar(app, g.pop('perfil'), error)
+
@@ -0,0 +1,406 @@
+# reportes.py
+# Reportes semanales y mensuales para las autoridades municipales:
+# solicitudes por tipo de desastre y municipio, personas afectadas y tiempos
+# de resolución de tickets.
+#
+# - La agregación corre en un pool de PROCESOS, nunca en el worker web. El
+#   proceso hijo abre su propio motor de SQLAlchemy y recorre las filas por
+#   bloques (yield_per), sin cargar la tabla completa en memoria.
+# - El resultado se guarda en disco (REPORTES_DIR) con una clave que combina
+#   los parámetros y una "marca de agua" de los datos del período. Si los datos
+#   no cambiaron, la misma petición devuelve el archivo ya generado.
+# - El estado de cada trabajo también vive en disco (<clave>.estado), no en la
+#   memoria del worker que lo lanzó: cualquier worker, o el mismo después de
+#   reiniciar, puede consultarlo. El proceso hijo toca el archivo de estado
+#   por cada bloque que agrega; si deja de hacerlo (el worker o el hijo se
+#   cayeron) el trabajo se informa como interrumpido y se puede volver a pedir.
+# - Formatos: 'html' (listo para imprimir o convertir a PDF desde el
+#   navegador) y 'csv'.
+
+import csv
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from statistics import mean, median
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from models import db, SolicitudAyuda, TicketSoporte, Usuario, EstadoTicket
+
+TIPOS = ('semanal', 'mensual')
+FORMATOS = {'html': 'text/html', 'csv': 'text/csv'}
+TAMANO_BLOQUE = 2000
+
+# Estados del archivo <clave>.estado mientras no existe el artefacto
+EN_COLA = 'en_cola'
+EN_PROCESO = 'en_proceso'
+ERROR = 'error'
+
+_pool = None
+_lock = threading.Lock()
+
+
+class ParametrosInvalidos(ValueError):
+    """Tipo, fecha, municipio o formato de reporte no válidos."""
+
+
+def periodo(tipo, fecha):
+    """(desde, hasta) del período que contiene 'fecha'; 'hasta' es exclusivo."""
+    if tipo == 'semanal':
+        desde = fecha - timedelta(days=fecha.weekday())
+        return desde, desde + timedelta(days=7)
+    desde = fecha.replace(day=1)
+    hasta = (desde + timedelta(days=32)).replace(day=1)
+    return desde, hasta
+
+
+def leer_parametros(datos):
+    """Valida request.form/args y devuelve un dict normalizado (lanza ParametrosInvalidos)."""
+    tipo = datos.get('tipo', 'semanal')
+    formato = datos.get('formato', 'html')
+    if tipo not in TIPOS:
+        raise ParametrosInvalidos(f"Tipo de reporte desconocido: {tipo}")
+    if formato not in FORMATOS:
+        raise ParametrosInvalidos(f"Formato desconocido: {formato}")
+    try:
+        fecha = datetime.strptime(datos['fecha'], '%Y-%m-%d').date() if datos.get('fecha') else date.today()
+    except ValueError:
+        raise ParametrosInvalidos("Formato de fecha inválido, usa AAAA-MM-DD.")
+    desde, hasta = periodo(tipo, fecha)
+    municipio = (datos.get('municipio') or '').strip() or None
+    return {
+        'tipo': tipo,
+        'formato': formato,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'municipio': municipio,
+    }
+
+
+def _rango(parametros):
+    return (datetime.fromisoformat(parametros['desde']), datetime.fromisoformat(parametros['hasta']))
+
+
+def _filtrar(consulta, modelo, parametros):
+    desde, hasta = _rango(parametros)
+    consulta = consulta.where(modelo.fecha_creacion >= desde, modelo.fecha_creacion < hasta)
+    if parametros['municipio']:
+        consulta = consulta.where(Usuario.municipio == parametros['municipio'])
+    return consulta
+
+
+def marca_de_agua(parametros):
+    """
+    Resumen barato de los datos del período y municipio: cantidad, máximo id
+    y suma de versiones de solicitudes y tickets. Toda edición o cambio de
+    estado (también los masivos) incrementa 'version', así que si cualquiera
+    cambia el reporte se regenera; los cambios de otros períodos no lo afectan.
+    """
+    partes = []
+    for modelo, pk in ((SolicitudAyuda, SolicitudAyuda.id_solicitud), (TicketSoporte, TicketSoporte.id_ticket)):
+        consulta = select(func.count(), func.max(pk), func.sum(modelo.version)).join(
+            Usuario, Usuario.id_usuario == modelo.id_usuario)
+        partes.extend(db.session.execute(_filtrar(consulta, modelo, parametros)).one())
+    return ':'.join(str(p or 0) for p in partes)
+
+
+def clave_reporte(parametros, marca):
+    texto = json.dumps(parametros, sort_keys=True) + '|' + marca
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:32]
+
+
+def ruta_artefacto(directorio, clave, formato):
+    return os.path.join(directorio, f"{clave}.{formato}")
+
+
+def ruta_meta(directorio, clave):
+    return os.path.join(directorio, f"{clave}.json")
+
+
+def ruta_estado(directorio, clave):
+    return os.path.join(directorio, f"{clave}.estado")
+
+
+def escribir_estado(archivo_estado, estado, **datos):
+    """Reemplaza el archivo de estado de forma atómica (lo leen otros procesos)."""
+    fd, ruta_tmp = tempfile.mkstemp(dir=os.path.dirname(archivo_estado), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'estado': estado, **datos}, f)
+    os.replace(ruta_tmp, archivo_estado)
+
+
+def leer_estado(archivo_estado):
+    """(dict del estado, segundos desde el último latido) o (None, None)."""
+    try:
+        with open(archivo_estado, encoding='utf-8') as f:
+            estado = json.load(f)
+        return estado, time.time() - os.path.getmtime(archivo_estado)
+    except (OSError, ValueError):
+        return None, None
+
+
+def latido(archivo_estado):
+    """El proceso hijo sigue vivo: actualiza la fecha de modificación."""
+    try:
+        os.utime(archivo_estado)
+    except OSError:
+        pass
+
+
+# ----------------------------------------------------------------------
+# Lo que sigue corre en el proceso hijo
+# ----------------------------------------------------------------------
+def _horas(segundos):
+    return round(segundos / 3600, 2) if segundos is not None else None
+
+
+def _fila_municipio():
+    return {'solicitudes': 0, 'personas': 0, 'estados': {}, 'tickets': 0, 'cerrados': 0, 'resolucion': []}
+
+
+def _agregar(sesion, parametros, al_avanzar=lambda: None):
+    """
+    Recorre solicitudes y tickets del período por bloques y arma los totales.
+    'al_avanzar' se llama una vez por bloque (latido del trabajo).
+    """
+    por_tipo = {}
+    por_municipio = {}
+    total_solicitudes = total_personas = 0
+
+    consulta = _filtrar(
+        select(SolicitudAyuda.tipo_desastre, SolicitudAyuda.personas_afectadas, SolicitudAyuda.estado, Usuario.municipio)
+        .join(Usuario, Usuario.id_usuario == SolicitudAyuda.id_usuario),
+        SolicitudAyuda, parametros,
+    ).execution_options(yield_per=TAMANO_BLOQUE)
+    for tipo_desastre, personas, estado, municipio in sesion.execute(consulta):
+        personas = personas or 0
+        total_solicitudes += 1
+        if total_solicitudes % TAMANO_BLOQUE == 0:
+            al_avanzar()
+        total_personas += personas
+        fila = por_tipo.setdefault(tipo_desastre, {'solicitudes': 0, 'personas': 0})
+        fila['solicitudes'] += 1
+        fila['personas'] += personas
+        fila = por_municipio.setdefault(municipio, _fila_municipio())
+        fila['solicitudes'] += 1
+        fila['personas'] += personas
+        fila['estados'][estado.name] = fila['estados'].get(estado.name, 0) + 1
+
+    primera_respuesta = []
+    resolucion = []
+    total_tickets = 0
+    consulta = _filtrar(
+        select(TicketSoporte.fecha_creacion, TicketSoporte.fecha_primera_respuesta,
+               TicketSoporte.fecha_cierre, TicketSoporte.estado, Usuario.municipio)
+        .join(Usuario, Usuario.id_usuario == TicketSoporte.id_usuario),
+        TicketSoporte, parametros,
+    ).execution_options(yield_per=TAMANO_BLOQUE)
+    for creado, respondido, cerrado, estado, municipio in sesion.execute(consulta):
+        total_tickets += 1
+        if total_tickets % TAMANO_BLOQUE == 0:
+            al_avanzar()
+        fila = por_municipio.setdefault(municipio, _fila_municipio())
+        fila['tickets'] += 1
+        if respondido and creado:
+            primera_respuesta.append((respondido - creado).total_seconds())
+        if estado == EstadoTicket.CERRADO and cerrado and creado:
+            segundos = (cerrado - creado).total_seconds()
+            resolucion.append(segundos)
+            fila['cerrados'] += 1
+            fila['resolucion'].append(segundos)
+
+    municipios = []
+    for municipio, fila in sorted(por_municipio.items(), key=lambda item: item[0] or ''):
+        municipios.append({
+            'municipio': municipio,
+            'solicitudes': fila['solicitudes'],
+            'personas': fila['personas'],
+            'estados': fila['estados'],
+            'tickets': fila['tickets'],
+            'cerrados': fila['cerrados'],
+            'horas_resolucion': _horas(mean(fila['resolucion'])) if fila['resolucion'] else None,
+        })
+
+    return {
+        'parametros': parametros,
+        'generado': datetime.utcnow().isoformat(timespec='seconds'),
+        'total_solicitudes': total_solicitudes,
+        'total_personas': total_personas,
+        'por_tipo': sorted(({'tipo_desastre': t, **v} for t, v in por_tipo.items()),
+                           key=lambda fila: -fila['solicitudes']),
+        'por_municipio': municipios,
+        'tickets': {
+            'total': total_tickets,
+            'cerrados': len(resolucion),
+            'horas_primera_respuesta': _horas(mean(primera_respuesta)) if primera_respuesta else None,
+            'horas_resolucion_promedio': _horas(mean(resolucion)) if resolucion else None,
+            'horas_resolucion_mediana': _horas(median(resolucion)) if resolucion else None,
+        },
+    }
+
+
+def _vacio_si_none(valor):
+    return '' if valor is None else valor
+
+
+def _escribir_csv(datos, destino):
+    with open(destino, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['seccion', 'clave', 'solicitudes', 'personas', 'tickets', 'cerrados', 'horas_resolucion'])
+        for fila in datos['por_tipo']:
+            escritor.writerow(['tipo_desastre', fila['tipo_desastre'], fila['solicitudes'], fila['personas'], '', '', ''])
+        for fila in datos['por_municipio']:
+            escritor.writerow(['municipio', fila['municipio'], fila['solicitudes'], fila['personas'],
+                               fila['tickets'], fila['cerrados'], _vacio_si_none(fila['horas_resolucion'])])
+        t = datos['tickets']
+        escritor.writerow(['total', '', datos['total_solicitudes'], datos['total_personas'],
+                           t['total'], t['cerrados'], _vacio_si_none(t['horas_resolucion_promedio'])])
+
+
+def _escribir_html(datos, destino, carpeta_plantillas):
+    entorno = Environment(loader=FileSystemLoader(carpeta_plantillas), autoescape=select_autoescape(['html']))
+    html = entorno.get_template('reportes/reporte_municipal.html').render(reporte=datos)
+    with open(destino, 'w', encoding='utf-8') as f:
+        f.write(html)
+
+
+def generar_reporte(uri, parametros, destino, archivo_estado, carpeta_plantillas):
+    """
+    Se ejecuta en el pool de procesos: agrega y escribe el artefacto (atómico).
+    El avance y el error, si falla, quedan en 'archivo_estado' para que
+    cualquier proceso web pueda informarlos.
+    """
+    escribir_estado(archivo_estado, EN_PROCESO, pid=os.getpid())
+    engine = create_engine(uri, poolclass=NullPool)
+    fd, ruta_tmp = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+    os.close(fd)
+    try:
+        with Session(engine) as sesion:
+            datos = _agregar(sesion, parametros, lambda: latido(archivo_estado))
+        if parametros['formato'] == 'csv':
+            _escribir_csv(datos, ruta_tmp)
+        else:
+            _escribir_html(datos, ruta_tmp, carpeta_plantillas)
+        os.replace(ruta_tmp, destino)
+    except Exception as e:
+        escribir_estado(archivo_estado, ERROR, error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        engine.dispose()
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+    return destino
+
+
+# ----------------------------------------------------------------------
+# Lado web: encolar y consultar
+# ----------------------------------------------------------------------
+def _pool_procesos(max_workers):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max_workers)
+    return _pool
+
+
+def _vigente(app, estado, segundos):
+    """¿El trabajo sigue vivo? Si no hay latido a tiempo se da por interrumpido."""
+    if estado is None or estado['estado'] not in (EN_COLA, EN_PROCESO):
+        return False
+    limite = app.config["REPORTES_ESPERA_EN_COLA" if estado['estado'] == EN_COLA else "REPORTES_SIN_LATIDO"]
+    return segundos <= limite
+
+
+def _al_terminar(archivo_estado):
+    def avisar(futuro):
+        # El proceso hijo murió (p. ej. BrokenProcessPool) sin escribir su error
+        if futuro.exception() is not None:
+            estado, _ = leer_estado(archivo_estado)
+            if estado is None or estado['estado'] != ERROR:
+                escribir_estado(archivo_estado, ERROR, error=f"{type(futuro.exception()).__name__}: {futuro.exception()}")
+    return avisar
+
+
+def solicitar_reporte(app, parametros):
+    """
+    Devuelve la clave del reporte. Si ya existe en disco (mismos parámetros y
+    mismos datos) o algún worker lo está generando, no hace nada; si no (o si
+    el trabajo anterior falló o se interrumpió), lo encola en el pool de procesos.
+    """
+    directorio = app.config["REPORTES_DIR"]
+    clave = clave_reporte(parametros, marca_de_agua(parametros))
+    destino = ruta_artefacto(directorio, clave, parametros['formato'])
+    if os.path.exists(destino):
+        return clave
+
+    archivo_estado = ruta_estado(directorio, clave)
+    with _lock:
+        if _vigente(app, *leer_estado(archivo_estado)):
+            return clave
+        os.makedirs(directorio, exist_ok=True)
+        with open(ruta_meta(directorio, clave), 'w', encoding='utf-8') as f:
+            json.dump({**parametros, 'solicitado': datetime.utcnow().isoformat(timespec='seconds')}, f)
+        escribir_estado(archivo_estado, EN_COLA)
+        futuro = _pool_procesos(app.config["REPORTES_WORKERS"]).submit(
+            generar_reporte,
+            str(app.config["SQLALCHEMY_DATABASE_URI"]),
+            parametros,
+            destino,
+            archivo_estado,
+            os.path.join(app.root_path, app.template_folder),
+        )
+        futuro.add_done_callback(_al_terminar(archivo_estado))
+    return clave
+
+
+def estado_reporte(app, clave):
+    """
+    Dict con 'estado' ('listo', 'en_cola', 'en_proceso', 'error' o
+    'desconocido') y los parámetros. Lo resuelve cualquier worker a partir de
+    los archivos de REPORTES_DIR.
+    """
+    directorio = app.config["REPORTES_DIR"]
+    try:
+        with open(ruta_meta(directorio, clave), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {'clave': clave, 'estado': 'desconocido'}
+
+    resultado = {'clave': clave, 'parametros': meta}
+    if os.path.exists(ruta_artefacto(directorio, clave, meta['formato'])):
+        resultado['estado'] = 'listo'
+        return resultado
+    estado, segundos = leer_estado(ruta_estado(directorio, clave))
+    if _vigente(app, estado, segundos):
+        resultado['estado'] = estado['estado']
+    elif estado is not None and estado['estado'] == ERROR:
+        resultado['estado'] = ERROR
+        resultado['error'] = estado.get('error', '')
+    else:
+        # Sin latido: el worker que lo lanzó (o su proceso hijo) se reinició
+        resultado['estado'] = ERROR
+        resultado['error'] = "El trabajo se interrumpió antes de terminar; vuelve a solicitar el reporte."
+    return resultado
+
+
+def reportes_recientes(app, limite=30):
+    """Metadatos de los reportes solicitados, los más recientes primero."""
+    directorio = app.config["REPORTES_DIR"]
+    if not os.path.isdir(directorio):
+        return []
+    metas = []
+    for nombre in os.listdir(directorio):
+        if nombre.endswith('.json'):
+            clave = nombre[:-len('.json')]
+            estado = estado_reporte(app, clave)
+            if estado['estado'] != 'desconocido':
+                metas.append(estado)
+    metas.sort(key=lambda e: e['parametros'].get('solicitado', ''), reverse=True)
+    return metas[:limite]
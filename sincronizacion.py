@@ -0,0 +1,219 @@
+# sincronizacion.py
+# API de sincronización por lotes para agentes de campo sin cobertura.
+#
+# El cliente acumula solicitudes y tickets sin conexión, cada uno con una
+# clave de idempotencia generada por él (p. ej. un UUID). Al recuperar señal
+# envía TODO el lote en una sola petición:
+#   - los registros se validan con las mismas reglas que nueva_solicitud(),
+#     además del tipo (JSON admite números, listas...) y el largo de cada
+#     columna: un registro inválido da error solo para él, no para el lote;
+#   - los válidos se insertan en UNA transacción por lote;
+#   - una clave ya vista devuelve el id existente en vez de duplicar;
+#   - un ticket puede indicar su solicitud con 'id_solicitud' o, si la creó
+#     sin conexión, con 'clave_solicitud' (la asignación usa su tipo);
+#   - la respuesta incluye el delta de cambios del servidor (estados y nuevas
+#     respuestas) desde el cursor que el cliente envió.
+
+from sqlalchemy import and_, or_
+
+from asignacion import asignar_ticket
+from eventos import registrar_creacion, ENTIDAD_SOLICITUD, ENTIDAD_TICKET, decodificar_estado
+from forms import validar_solicitud, validar_ticket
+from models import (db, ClaveIdempotencia, EventoEstado, Respuesta, SolicitudAyuda,
+                    TicketSoporte, EstadoSolicitud, EstadoTicket)
+
+MAX_REGISTROS_POR_LOTE = 500
+MAX_RESPUESTAS_POR_DELTA = 500
+MAX_EVENTOS_POR_DELTA = 500
+LARGO_MAXIMO_CLAVE = 64
+
+
+class LoteInvalido(ValueError):
+    """El cuerpo de la sincronización no tiene la forma esperada."""
+
+
+def leer_cursor(cursor):
+    """'<id_evento>:<id_respuesta>' -> (int, int). Sin cursor = desde el principio."""
+    if not cursor:
+        return 0, 0
+    try:
+        evento, respuesta = str(cursor).split(':')
+        return int(evento), int(respuesta)
+    except ValueError:
+        raise LoteInvalido("Cursor inválido")
+
+
+def _clave(registro):
+    """Clave de idempotencia como texto (un UUID o un número); None si es otra cosa."""
+    clave = registro.get('clave')
+    if isinstance(clave, int) and not isinstance(clave, bool):
+        return str(clave)
+    return clave if isinstance(clave, str) else None
+
+
+def _con_id_solicitud(registro, existentes, vistas_en_lote):
+    """
+    Sin conexión el cliente no conoce el id de la solicitud que creó: el ticket
+    puede nombrarla por su 'clave_solicitud' (de este lote o de uno anterior).
+    Devuelve (registro con 'id_solicitud', None) o (registro, mensaje).
+    """
+    clave = registro.get('clave_solicitud')
+    if clave is None:
+        return registro, None
+    previa = (existentes.get(clave) or vistas_en_lote.get(clave)) if isinstance(clave, str) else None
+    if previa is None or previa.entidad != ENTIDAD_SOLICITUD:
+        return registro, f"No hay una solicitud sincronizada con la clave '{clave}'"
+    return {**registro, 'id_solicitud': previa.id_entidad}, None
+
+
+def _claves_existentes(id_usuario, claves):
+    if not claves:
+        return {}
+    filas = (
+        ClaveIdempotencia.query
+        .filter(ClaveIdempotencia.id_usuario == id_usuario, ClaveIdempotencia.clave.in_(claves))
+        .all()
+    )
+    return {fila.clave: fila for fila in filas}
+
+
+def aplicar_lote(usuario, datos):
+    """
+    Inserta las solicitudes y tickets del lote (sin commit: lo hace la ruta).
+    Devuelve la lista de resultados por registro, en el orden recibido.
+    """
+    solicitudes = datos.get('solicitudes') or []
+    tickets = datos.get('tickets') or []
+    if not isinstance(solicitudes, list) or not isinstance(tickets, list):
+        raise LoteInvalido("'solicitudes' y 'tickets' deben ser listas")
+    if len(solicitudes) + len(tickets) > MAX_REGISTROS_POR_LOTE:
+        raise LoteInvalido(f"Máximo {MAX_REGISTROS_POR_LOTE} registros por lote")
+
+    registros = [(ENTIDAD_SOLICITUD, r) for r in solicitudes] + [(ENTIDAD_TICKET, r) for r in tickets]
+    claves = [_clave(r) for _, r in registros if isinstance(r, dict) and _clave(r)]
+    claves += [r['clave_solicitud'] for r in tickets if isinstance(r, dict) and isinstance(r.get('clave_solicitud'), str)]
+    # Una sola consulta para todas las claves del lote
+    existentes = _claves_existentes(usuario.id_usuario, claves)
+    vistas_en_lote = {}
+
+    resultados = []
+    for entidad, registro in registros:
+        tipo = 'solicitud' if entidad == ENTIDAD_SOLICITUD else 'ticket'
+        if not isinstance(registro, dict):
+            resultados.append({'tipo': tipo, 'clave': None, 'resultado': 'error', 'error': "Registro inválido"})
+            continue
+
+        clave = _clave(registro)
+        if not clave or len(clave) > LARGO_MAXIMO_CLAVE:
+            resultados.append({'tipo': tipo, 'clave': registro.get('clave'), 'resultado': 'error',
+                               'error': f"Falta la clave de idempotencia (máx. {LARGO_MAXIMO_CLAVE} caracteres)"})
+            continue
+
+        # Reintento: ya se creó en una sincronización anterior (o antes en este lote)
+        previa = existentes.get(clave) or vistas_en_lote.get(clave)
+        if previa is not None:
+            resultados.append({'tipo': tipo, 'clave': clave, 'resultado': 'duplicado', 'id': previa.id_entidad})
+            continue
+
+        if entidad == ENTIDAD_SOLICITUD:
+            campos, error = validar_solicitud(registro)
+        else:
+            registro, error = _con_id_solicitud(registro, existentes, vistas_en_lote)
+            if not error:
+                campos, error = validar_ticket(registro, usuario.id_usuario)
+        if error:
+            resultados.append({'tipo': tipo, 'clave': clave, 'resultado': 'error', 'error': error})
+            continue
+
+        if entidad == ENTIDAD_SOLICITUD:
+            obj = SolicitudAyuda(id_usuario=usuario.id_usuario, estado=EstadoSolicitud.PENDIENTE, **campos)
+        else:
+            obj = TicketSoporte(id_usuario=usuario.id_usuario, estado=EstadoTicket.ABIERTO, **campos)
+            asignar_ticket(obj)
+        db.session.add(obj)
+        registrar_creacion(obj, usuario)  # hace flush: ya tenemos el id
+
+        id_entidad = obj.id_solicitud if entidad == ENTIDAD_SOLICITUD else obj.id_ticket
+        nueva_clave = ClaveIdempotencia(id_usuario=usuario.id_usuario, clave=clave,
+                                        entidad=entidad, id_entidad=id_entidad)
+        db.session.add(nueva_clave)
+        vistas_en_lote[clave] = nueva_clave
+        resultados.append({'tipo': tipo, 'clave': clave, 'resultado': 'creado', 'id': id_entidad})
+
+    return resultados
+
+
+def delta_desde(usuario, cursor):
+    """
+    Cambios del servidor sobre las solicitudes/tickets del usuario desde el
+    cursor: último estado de cada entidad que cambió y respuestas nuevas.
+    Eventos y respuestas van por páginas; si 'hay_mas' el cliente vuelve a
+    pedir con el nuevo cursor, que avanza solo hasta lo que se devolvió.
+    Devuelve (delta, nuevo_cursor).
+    """
+    ultimo_evento, ultima_respuesta = leer_cursor(cursor)
+
+    # Eventos posteriores al cursor de entidades del usuario, incluidas las ya
+    # borradas: se filtra por el dueño guardado en el propio evento (índice
+    # propietario/id), no contra las tablas actuales.
+    propios = EventoEstado.id_propietario == usuario.id_usuario
+    # Eventos viejos que el relleno 'propietario_eventos' todavía no completó
+    de_mis_solicitudes = and_(
+        EventoEstado.entidad == ENTIDAD_SOLICITUD,
+        EventoEstado.id_entidad.in_(
+            db.session.query(SolicitudAyuda.id_solicitud).filter(SolicitudAyuda.id_usuario == usuario.id_usuario)
+        ),
+    )
+    de_mis_tickets = and_(
+        EventoEstado.entidad == ENTIDAD_TICKET,
+        EventoEstado.id_entidad.in_(
+            db.session.query(TicketSoporte.id_ticket).filter(TicketSoporte.id_usuario == usuario.id_usuario)
+        ),
+    )
+    sin_propietario = and_(EventoEstado.id_propietario.is_(None), or_(de_mis_solicitudes, de_mis_tickets))
+    eventos = (
+        db.session.query(EventoEstado.id_evento, EventoEstado.entidad, EventoEstado.id_entidad, EventoEstado.estado_nuevo)
+        .filter(EventoEstado.id_evento > ultimo_evento, or_(propios, sin_propietario))
+        .order_by(EventoEstado.id_evento)
+        .limit(MAX_EVENTOS_POR_DELTA + 1)
+        .all()
+    )
+    hay_mas_eventos = len(eventos) > MAX_EVENTOS_POR_DELTA
+    eventos = eventos[:MAX_EVENTOS_POR_DELTA]
+
+    # Solo el último estado de cada entidad (delta compacto)
+    estados = {ENTIDAD_SOLICITUD: {}, ENTIDAD_TICKET: {}}
+    for id_evento, entidad, id_entidad, codigo in eventos:
+        estado = decodificar_estado(entidad, codigo)
+        estados[entidad][id_entidad] = estado.name if estado else None  # None = eliminado
+        ultimo_evento = id_evento
+
+    respuestas = (
+        Respuesta.query
+        .join(TicketSoporte, TicketSoporte.id_ticket == Respuesta.id_ticket)
+        .filter(TicketSoporte.id_usuario == usuario.id_usuario, Respuesta.id_respuesta > ultima_respuesta)
+        .order_by(Respuesta.id_respuesta)
+        .limit(MAX_RESPUESTAS_POR_DELTA + 1)
+        .all()
+    )
+    hay_mas_respuestas = len(respuestas) > MAX_RESPUESTAS_POR_DELTA
+    respuestas = respuestas[:MAX_RESPUESTAS_POR_DELTA]
+    if respuestas:
+        ultima_respuesta = respuestas[-1].id_respuesta
+
+    delta = {
+        'solicitudes': {str(k): v for k, v in estados[ENTIDAD_SOLICITUD].items()},
+        'tickets': {str(k): v for k, v in estados[ENTIDAD_TICKET].items()},
+        'respuestas': [
+            {
+                'id': r.id_respuesta,
+                'id_ticket': r.id_ticket,
+                'id_usuario': r.id_usuario,
+                'mensaje': r.mensaje,
+                'fecha': r.fecha.isoformat() if r.fecha else None,
+            }
+            for r in respuestas
+        ],
+        'hay_mas': hay_mas_eventos or hay_mas_respuestas,
+    }
+    return delta, f"{ultimo_evento}:{ultima_respuesta}"
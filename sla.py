@@ -0,0 +1,194 @@
+# sla.py
+# Registro de los tiempos de SLA de los tickets de soporte y mantenimiento
+# incremental de los agregados por agente y por semana (tabla metricas_sla).
+#
+# Las rutas de app.py llaman a estas funciones dentro de la MISMA transacción
+# en la que responden, cierran o reabren un ticket; el commit lo hace la ruta.
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from models import db, MetricaSLA, TicketSoporte, Usuario, sumar_en_fila
+
+
+def semana_de(fecha):
+    """Devuelve el lunes de la semana a la que pertenece 'fecha' (bucket semanal)."""
+    if isinstance(fecha, datetime):
+        fecha = fecha.date()
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def _segundos_desde_creacion(ticket, fecha):
+    if not ticket.fecha_creacion:
+        return 0
+    return max(int((fecha - ticket.fecha_creacion).total_seconds()), 0)
+
+
+def _sumar_metrica(id_agente, fecha, **incrementos):
+    """
+    Suma los incrementos al bucket (agente, semana) en SQL (columna = columna
+    + delta), creándolo si no existe, sin perder actualizaciones concurrentes.
+    """
+    sumar_en_fila(db.session, MetricaSLA, {'id_agente': id_agente, 'semana': semana_de(fecha)}, incrementos)
+
+
+def registrar_primera_respuesta(ticket, agente, fecha=None):
+    """Marca la primera respuesta de soporte del ticket (solo la primera cuenta)."""
+    if ticket.fecha_primera_respuesta is not None:
+        return
+    fecha = fecha or datetime.utcnow()
+    ticket.fecha_primera_respuesta = fecha
+    ticket.id_primera_respuesta_por = agente.id_usuario
+    _sumar_metrica(
+        agente.id_usuario, fecha,
+        total_primera_respuesta=1,
+        segundos_primera_respuesta=_segundos_desde_creacion(ticket, fecha),
+    )
+
+
+def registrar_cierre(ticket, agente, fecha=None):
+    """Guarda la fecha de cierre y suma el tiempo de resolución al bucket del agente."""
+    fecha = fecha or datetime.utcnow()
+    ticket.fecha_cierre = fecha
+    ticket.id_cerrado_por = agente.id_usuario
+    _sumar_metrica(
+        agente.id_usuario, fecha,
+        total_cierres=1,
+        segundos_cierre=_segundos_desde_creacion(ticket, fecha),
+    )
+
+
+def registrar_cierres(filas, agente, fecha):
+    """
+    Versión por lotes de registrar_cierre() para las acciones masivas. Quien
+    llama ya puso fecha_cierre/id_cerrado_por en su UPDATE; aquí solo se suma
+    el bucket del agente. 'filas' son las fechas de creación de los tickets.
+    """
+    segundos = sum(max(int((fecha - creado).total_seconds()), 0) for creado in filas if creado)
+    if filas:
+        _sumar_metrica(agente.id_usuario, fecha, total_cierres=len(filas), segundos_cierre=segundos)
+
+
+def registrar_reapertura(ticket):
+    """
+    Descuenta el cierre anterior de los agregados (el ticket ya no cuenta como
+    resuelto) y aumenta el contador de reaperturas.
+    """
+    if ticket.fecha_cierre is not None and ticket.id_cerrado_por is not None:
+        _sumar_metrica(
+            ticket.id_cerrado_por, ticket.fecha_cierre,
+            total_cierres=-1,
+            segundos_cierre=-_segundos_desde_creacion(ticket, ticket.fecha_cierre),
+        )
+    ticket.fecha_cierre = None
+    ticket.id_cerrado_por = None
+    ticket.veces_reabierto = (ticket.veces_reabierto or 0) + 1
+
+
+def _promedio(segundos, total):
+    return (segundos / total) if total else None
+
+
+def reporte_sla(desde=None, hasta=None):
+    """
+    Construye el reporte de SLA leyendo solo los buckets precalculados.
+    Devuelve un dict con las filas por agente y por semana.
+    """
+    filtros = []
+    if desde:
+        filtros.append(MetricaSLA.semana >= semana_de(desde))
+    if hasta:
+        filtros.append(MetricaSLA.semana <= hasta)
+
+    sumas = (
+        func.sum(MetricaSLA.total_primera_respuesta),
+        func.sum(MetricaSLA.segundos_primera_respuesta),
+        func.sum(MetricaSLA.total_cierres),
+        func.sum(MetricaSLA.segundos_cierre),
+    )
+
+    por_agente = (
+        db.session.query(Usuario.id_usuario, Usuario.nombre, Usuario.apellido, *sumas)
+        .join(MetricaSLA, MetricaSLA.id_agente == Usuario.id_usuario)
+        .filter(*filtros)
+        .group_by(Usuario.id_usuario, Usuario.nombre, Usuario.apellido)
+        .order_by(Usuario.nombre, Usuario.apellido)
+        .all()
+    )
+    por_semana = (
+        db.session.query(MetricaSLA.semana, *sumas)
+        .filter(*filtros)
+        .group_by(MetricaSLA.semana)
+        .order_by(MetricaSLA.semana.desc())
+        .all()
+    )
+
+    return {
+        "por_agente": [
+            {
+                "id_agente": id_agente,
+                "agente": f"{nombre} {apellido}",
+                "respondidos": int(n_resp or 0),
+                "promedio_primera_respuesta": _promedio(int(seg_resp or 0), int(n_resp or 0)),
+                "cerrados": int(n_cierre or 0),
+                "promedio_cierre": _promedio(int(seg_cierre or 0), int(n_cierre or 0)),
+            }
+            for id_agente, nombre, apellido, n_resp, seg_resp, n_cierre, seg_cierre in por_agente
+        ],
+        "por_semana": [
+            {
+                "semana": semana,
+                "respondidos": int(n_resp or 0),
+                "promedio_primera_respuesta": _promedio(int(seg_resp or 0), int(n_resp or 0)),
+                "cerrados": int(n_cierre or 0),
+                "promedio_cierre": _promedio(int(seg_cierre or 0), int(n_cierre or 0)),
+            }
+            for semana, n_resp, seg_resp, n_cierre, seg_cierre in por_semana
+        ],
+    }
+
+
+def reconstruir_metricas():
+    """
+    Recalcula todos los buckets desde las columnas de tiempos de los tickets.
+    Útil después de cargar datos históricos o si los agregados se desalinean.
+    """
+    MetricaSLA.query.delete(synchronize_session=False)
+
+    buckets = {}
+    tickets = (
+        db.session.query(
+            TicketSoporte.fecha_creacion,
+            TicketSoporte.fecha_primera_respuesta,
+            TicketSoporte.id_primera_respuesta_por,
+            TicketSoporte.fecha_cierre,
+            TicketSoporte.id_cerrado_por,
+        )
+        .filter(
+            (TicketSoporte.fecha_primera_respuesta.isnot(None)) |
+            (TicketSoporte.fecha_cierre.isnot(None))
+        )
+        .yield_per(1000)
+    )
+    for creado, f_resp, id_resp, f_cierre, id_cierre in tickets:
+        if f_resp is not None and id_resp is not None:
+            b = buckets.setdefault((id_resp, semana_de(f_resp)), [0, 0, 0, 0])
+            b[0] += 1
+            b[1] += max(int((f_resp - creado).total_seconds()), 0) if creado else 0
+        if f_cierre is not None and id_cierre is not None:
+            b = buckets.setdefault((id_cierre, semana_de(f_cierre)), [0, 0, 0, 0])
+            b[2] += 1
+            b[3] += max(int((f_cierre - creado).total_seconds()), 0) if creado else 0
+
+    for (id_agente, semana), (n_resp, seg_resp, n_cierre, seg_cierre) in buckets.items():
+        db.session.add(MetricaSLA(
+            id_agente=id_agente,
+            semana=semana,
+            total_primera_respuesta=n_resp,
+            segundos_primera_respuesta=seg_resp,
+            total_cierres=n_cierre,
+            segundos_cierre=seg_cierre,
+        ))
+    db.session.commit()
+    return len(buckets)